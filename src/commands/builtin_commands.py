@@ -28,6 +28,10 @@ Available Commands:
   system   - Show system information
   history  - Show command history
   alias    - Manage command aliases
+  jobs     - List background jobs (start one with a trailing &)
+  fg       - Bring a job to the foreground
+  bg       - Resume a stopped job in the background
+  wait     - Wait for background jobs to finish
   exit     - Exit the shell
 
 Use 'command --help' for more information about specific commands.
@@ -115,14 +119,19 @@ Use 'command --help' for more information about specific commands.
                     
     def echo_command(self, args):
         """Print arguments to the console"""
+        for line in self.echo_stream(args):
+            print(line, end='')
+
+    def echo_stream(self, args, stdin=None):
+        """Yield the echoed line; used when echo runs inside a pipeline"""
         if not args:
-            print()  # Print a blank line if no arguments
+            yield "\n"  # A blank line if no arguments
         else:
             # Join arguments and handle quotes
             message = " ".join(args)
             # Remove surrounding quotes if present
             message = message.strip('"\'')
-            print(message)
+            yield message + "\n"
         
     def system_command(self, args=None):
         """Display system information"""
@@ -137,35 +146,37 @@ Use 'command --help' for more information about specific commands.
 
     def history_command(self, args=None):
         """Enhanced history command with more options"""
+        history = self.shell.history
+
         # Display recent history
-        start = max(0, len(self.command_history) - 50)
-        for i, cmd in enumerate(self.command_history[start:], start+1):
+        start = max(0, len(history) - 50)
+        for i, cmd in enumerate(history.entries[start:], start+1):
             print(f"{i}: {cmd}")
 
         # Additional history management options
         if args:
             if args[0] == 'clear':
-                self.command_history.clear()
-                self.save_history()
+                history.clear()
                 print("History cleared.")
             elif args[0] == 'save':
                 # Option to manually save history
-                self.save_history()
+                history.flush()
                 print("History saved.")
 
     def alias_command(self, args=None):
         """Manage command aliases"""
         if not args:
             # Display current aliases
-            for alias, command in self.aliases.items():
+            for alias, command in self.shell.aliases.items():
                 print(f"{alias}='{command}'")
             return
         
         if len(args) == 1:
-            print(f"Current alias: {args[0]} = '{self.aliases.get(args[0], 'Not defined')}'")
+            print(f"Current alias: {args[0]} = '{self.shell.aliases.get(args[0], 'Not defined')}'")
         elif len(args) >= 2:
             # Set or update alias
             alias = args[0]
             command = " ".join(args[1:])
-            self.aliases[alias] = command
+            self.shell.aliases[alias] = command
+            self.shell.command_index.invalidate()
             print(f"Alias set: {alias}='{command}'")
\ No newline at end of file
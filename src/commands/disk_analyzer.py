@@ -1,19 +1,69 @@
 import os
+import re
+import sys
+import time
 import psutil
 from pathlib import Path
 import humanize
+from src.utils.ignore_rules import IgnoreRules
+from src.utils.dir_size_cache import DirSizeCache, allocated_bytes
+from src.utils.disk_scanner import DiskScanner
+from src.utils.scan_tree import ScanTree, walk_entries
+from src.utils.disk_explorer import DiskExplorer
+from src.utils.dupe_finder import DupeFinder, HashCache
+from src.config.settings import DEFAULT_CONFIG
 
 class DiskAnalyzer:
     def __init__(self, shell):
         self.shell = shell
+        self.size_cache = DirSizeCache(self.shell.config_dir / "disk_cache.db")
+        self.hash_cache = HashCache(self.shell.config_dir / "hash_cache.db")
 
     def disk_usage_command(self, args):
         """Analyze disk usage of directories and files"""
-        if not args:
+        ignore = DEFAULT_CONFIG['disk_respect_ignore_files']
+        one_filesystem = False
+        explore = False
+        export_file = load_file = None
+        paths = []
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            if arg == '--ignore':
+                ignore = True
+            elif arg == '--no-ignore':
+                ignore = False
+            elif arg in ['-x', '--one-file-system']:
+                one_filesystem = True
+            elif arg == '--explore':
+                explore = True
+            elif arg in ['--export', '--load'] and i + 1 < len(args):
+                if arg == '--export':
+                    export_file = args[i + 1]
+                else:
+                    load_file = args[i + 1]
+                i += 1
+            else:
+                paths.append(arg)
+            i += 1
+
+        if load_file or explore or export_file:
+            return self._explore(paths[0] if paths else '.', ignore, one_filesystem,
+                                 export_file, load_file, show=explore or bool(load_file))
+
+        if not paths:
             # Show overall disk usage
             return self._show_system_disk_usage()
+
+        if paths[0] == 'dupes':
+            return self._find_duplicates(paths[1:], ignore, one_filesystem)
+
+        if paths[0] == '--clear-cache':
+            self.size_cache.clear()
+            print("Directory size cache cleared")
+            return
         
-        path = args[0]
+        path = paths[0]
         if not os.path.exists(path):
             print(f"Error: Path '{path}' does not exist")
             return
@@ -21,7 +71,74 @@ class DiskAnalyzer:
         if os.path.isfile(path):
             self._show_file_size(path)
         else:
-            self._analyze_directory(path)
+            self._analyze_directory(path, rules=IgnoreRules(path) if ignore else None,
+                                    one_filesystem=one_filesystem)
+
+    def _find_duplicates(self, args, ignore, one_filesystem):
+        """Report sets of files with identical contents under a directory"""
+        min_size = 1
+        if '--min-size' in args:
+            index = args.index('--min-size')
+            match = re.match(r'^(\d+)([KMG])?$', args[index + 1] if index + 1 < len(args) else '')
+            if not match:
+                print("Invalid size format for --min-size (e.g., 100K, 1M)")
+                return
+            min_size = int(match.group(1)) * {'K': 1024, 'M': 1024**2, 'G': 1024**3}.get(match.group(2), 1)
+            args = args[:index] + args[index + 2:]
+
+        path = args[0] if args else '.'
+        if not os.path.isdir(path):
+            print(f"Error: '{path}' is not a directory")
+            return
+
+        finder = DupeFinder(self.hash_cache, workers=DEFAULT_CONFIG['disk_scan_workers'], min_size=min_size)
+        start = time.time()
+        groups = finder.find(walk_entries(path, DEFAULT_CONFIG['disk_scan_workers'], one_filesystem,
+                                          IgnoreRules(path) if ignore else None))
+        elapsed = time.time() - start
+
+        if not groups:
+            print("No duplicate files found")
+        wasted = 0
+        for size, files in groups:
+            wasted += size * (len(files) - 1)
+            print(f"\n{humanize.naturalsize(size)} x {len(files)}")
+            for file_path in files:
+                print(f"  {file_path}")
+
+        print("-" * 60)
+        print(f"{len(groups)} duplicate sets, {humanize.naturalsize(wasted)} reclaimable")
+        print(f"Hashed {humanize.naturalsize(finder.bytes_hashed)} in {elapsed:.2f}s"
+              + (f"; skipped {finder.hard_links} hard links" if finder.hard_links else ""))
+
+    def _explore(self, path, ignore, one_filesystem, export_file, load_file, show):
+        """Scan once (or load an exported scan) and browse it interactively"""
+        try:
+            if load_file:
+                tree = ScanTree.load(load_file)
+            else:
+                if not os.path.isdir(path):
+                    print(f"Error: '{path}' is not a directory")
+                    return
+                start = time.time()
+                try:
+                    tree = ScanTree.scan(path, workers=DEFAULT_CONFIG['disk_scan_workers'],
+                                         one_filesystem=one_filesystem,
+                                         rules=IgnoreRules(path) if ignore else None,
+                                         progress=self._show_progress if sys.stderr.isatty() else None)
+                finally:
+                    if sys.stderr.isatty():
+                        sys.stderr.write("\r\033[K")
+                print(f"Scanned {len(tree):,} entries under {tree.root} in {time.time() - start:.2f}s")
+            if export_file:
+                tree.save(export_file)
+                print(f"Scan exported to {export_file}")
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            return
+
+        if show:
+            DiskExplorer(tree).run()
 
     def _show_system_disk_usage(self):
         """Display system-wide disk usage"""
@@ -50,22 +167,39 @@ class DiskAnalyzer:
         print(f"\nFile: {path}")
         print(f"Size: {humanize.naturalsize(size)}")
 
-    def _analyze_directory(self, path, depth=1):
-        """Analyze directory size recursively"""
-        total_size = 0
-        entries = []
-        
+    def _analyze_directory(self, path, rules=None, one_filesystem=False):
+        """Analyze directory size with a parallel scan"""
+        scanner = DiskScanner(self.size_cache, workers=DEFAULT_CONFIG['disk_scan_workers'],
+                              one_filesystem=one_filesystem, rules=rules,
+                              progress=self._show_progress if sys.stderr.isatty() else None)
+        start = time.time()
+        try:
+            totals = scanner.scan(path)
+        finally:
+            if sys.stderr.isatty():
+                sys.stderr.write("\r\033[K")
+                sys.stderr.flush()
+        elapsed = time.time() - start
+
+        root = totals.get(path)
+        if root is None:
+            print(f"Error: Permission denied for {path}")
+            return
+
         try:
+            entries = []
             for entry in os.scandir(path):
                 try:
-                    if entry.is_file(follow_symlinks=False):
-                        size = entry.stat().st_size
-                        total_size += size
-                        entries.append((entry.name, size, True))
-                    elif entry.is_dir(follow_symlinks=False):
-                        dir_size = self._get_dir_size(entry.path)
-                        total_size += dir_size
-                        entries.append((entry.name, dir_size, False))
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if rules is not None and rules.ignored(entry.path, is_dir):
+                        continue
+                    if is_dir:
+                        subtree = totals.get(entry.path)
+                        if subtree is not None:
+                            entries.append((entry.name, subtree.size, subtree.allocated, False))
+                    else:
+                        stat = entry.stat(follow_symlinks=False)
+                        entries.append((entry.name, stat.st_size, allocated_bytes(stat), True))
                 except (PermissionError, OSError):
                     continue
 
@@ -74,37 +208,38 @@ class DiskAnalyzer:
             
             # Print results
             print(f"\nDirectory Analysis: {path}")
-            print(f"Total Size: {humanize.naturalsize(total_size)}")
+            print(f"Total Size: {humanize.naturalsize(root.size)} "
+                  f"({humanize.naturalsize(root.allocated)} on disk)")
+            print(f"Scanned {root.files:,} files in {root.dirs:,} directories in {elapsed:.2f}s "
+                  f"(hard links counted once)")
+            if rules is not None:
+                print("(paths matched by ignore files are excluded; use --no-ignore to count them)")
             print("\nLargest Items:")
-            print("-" * 60)
-            print(f"{'Name':40} {'Size':10} {'Type':8}")
-            print("-" * 60)
+            print("-" * 70)
+            print(f"{'Name':40} {'Size':10} {'On Disk':10} {'Type':8}")
+            print("-" * 70)
             
-            for name, size, is_file in entries[:10]:  # Show top 10 items
+            for name, size, allocated, is_file in entries[:10]:  # Show top 10 items
                 print(f"{name[:40]:40} {humanize.naturalsize(size):10} "
-                      f"{'File' if is_file else 'Dir':8}")
+                      f"{humanize.naturalsize(allocated):10} {'File' if is_file else 'Dir':8}")
 
         except PermissionError:
             print(f"Error: Permission denied for {path}")
         except Exception as e:
             print(f"Error analyzing directory: {e}")
 
-    def _get_dir_size(self, path):
-        """Calculate total size of a directory"""
-        total = 0
-        try:
-            for entry in os.scandir(path):
-                try:
-                    if entry.is_file(follow_symlinks=False):
-                        total += entry.stat().st_size
-                    elif entry.is_dir(follow_symlinks=False):
-                        total += self._get_dir_size(entry.path)
-                except (PermissionError, OSError):
-                    continue
-        except PermissionError:
-            pass
-        return total
+    def _show_progress(self, dirs, entries, elapsed):
+        rate = entries / elapsed if elapsed else 0
+        sys.stderr.write(f"\rScanning: {dirs:,} dirs, {entries:,} entries, {rate:,.0f} entries/s\033[K")
+        sys.stderr.flush()
     
     
 # disk              # Show system-wide disk usage
-# disk /path        # Analyze specific directory
\ No newline at end of file
+# disk /path        # Analyze specific directory
+# disk /path --ignore    # Leave out paths matched by ignore files
+# disk -x /path           # Stay on the filesystem of /path
+# disk --clear-cache      # Forget cached directory sizes
+# disk --explore /path    # Scan once, then browse, sort and delete interactively
+# disk --export scan.bin /path      # Save a scan for later
+# disk --explore --load scan.bin    # Browse a saved scan without rescanning
+# disk dupes /path --min-size 1M    # Find duplicate files
\ No newline at end of file
@@ -1,78 +1,304 @@
 import base64
 import os
+import json
+import glob
+import time
 import hashlib
 from cryptography.fernet import Fernet
+from src.config.settings import DEFAULT_CONFIG
+from src.utils.crypto_stream import (
+    Header, new_header, derive_master_key, is_container, CipherJob, ParallelCipher,
+    KDF_NAMES, DEFAULT_KDF_PARAMS, calibrate_kdf, argon2_available
+)
+from src.utils.key_cache import KeyCache, wipe
 
 class FileEncryption:
     def __init__(self, shell):
         self.shell = shell
+        self.key_cache = KeyCache(DEFAULT_CONFIG.get('encrypt_key_ttl', 300))
+        self.kdf_file = self.shell.config_dir / "kdf_params.json"
+        self._session = None  # (KDF settings, header) whose salt and cached key new files reuse
 
     def generate_key(self, password):
-        """Generate encryption key from password"""
+        """Generate the key used by legacy Fernet files"""
         salt = b'salt_for_enhanced_shell'
         key = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, 100000)
         return key
 
     def encrypt_command(self, args):
-        """Encrypt a file"""
-        if len(args) < 2:
-            print("Usage: encrypt <input_file> -o <output_file>")
+        """Encrypt files, directories (-r) or glob patterns"""
+        if args and args[0] == '--bench':
+            self._bench(args[1:])
+            return
+        if args and args[0] == '--forget':
+            print(f"Forgot {self.key_cache.clear()} cached keys")
+            self._session = None
+            return
+
+        options = self._parse_args(args)
+        if options is None or not options['targets']:
+            print("Usage: encrypt <file|pattern>... [-r] [-o <output_file>] [-j <workers>] | --bench [ms] | --forget")
+            return
+
+        files = self._collect_files(options['targets'], options['recursive'], skip_encrypted=True)
+        if not files:
+            print("No files to encrypt")
+            return
+        if options['output'] and len(files) > 1:
+            print("encrypt: -o needs a single input file")
             return
 
-        input_file = args[0]
-        output_file = args[-1] if args[-2] == '-o' else input_file + '.enc'
-        
+        master_key = None
         try:
-            # Prompt for password
-            password = input("Enter encryption password: ")
-            
-            # Generate key
-            key = self.generate_key(password)
-            fernet = Fernet(base64.urlsafe_b64encode(key))
-            
-            # Read and encrypt file
-            with open(input_file, 'rb') as f:
-                data = f.read()
-            
-            encrypted_data = fernet.encrypt(data)
-            
-            # Write encrypted data
-            with open(output_file, 'wb') as f:
-                f.write(encrypted_data)
-            
-            print(f"File encrypted: {output_file}")
-        
+            # The password KDF runs once per session; every file gets its own salt and an HKDF-derived key
+            session, master_key = self._encrypt_session()
+            jobs = [
+                CipherJob(path, options['output'] or path + '.enc', master_key,
+                          Header(session.kdf_id, session.kdf_params, session.kdf_salt))
+                for path in files
+            ]
+            self._run(jobs, options['workers'], "encrypted")
+
         except Exception as e:
             print(f"Encryption error: {e}")
+        finally:
+            if master_key is not None:
+                wipe(master_key)
 
     def decrypt_command(self, args):
-        """Decrypt a file"""
-        if len(args) < 2:
-            print("Usage: decrypt <input_file> -o <output_file>")
+        """Decrypt files, directories (-r) or glob patterns"""
+        options = self._parse_args(args)
+        if options is None or not options['targets']:
+            print("Usage: decrypt <file|pattern>... [-r] [-o <output_file>] [-j <workers>]")
+            return
+
+        files = self._collect_files(options['targets'], options['recursive'], skip_encrypted=False)
+        if options['recursive']:
+            files = [path for path in files if path.endswith('.enc')]
+        if not files:
+            print("No files to decrypt")
+            return
+        if options['output'] and len(files) > 1:
+            print("decrypt: -o needs a single input file")
             return
 
-        input_file = args[0]
-        output_file = args[-1] if args[-2] == '-o' else input_file.replace('.enc', '')
-        
+        jobs = []
+        derived = {}
         try:
-            # Prompt for password
-            password = input("Enter decryption password: ")
-            
-            # Generate key
-            key = self.generate_key(password)
-            fernet = Fernet(base64.urlsafe_b64encode(key))
-            
-            # Read and decrypt file
-            with open(input_file, 'rb') as f:
-                encrypted_data = f.read()
-            
-            decrypted_data = fernet.decrypt(encrypted_data)
-            
-            # Write decrypted data
-            with open(output_file, 'wb') as f:
-                f.write(decrypted_data)
-            
-            print(f"File decrypted: {output_file}")
-        
+            headers = {}
+            for path in files:
+                if is_container(path):
+                    with open(path, 'rb') as src:
+                        headers[path] = Header.read(src)
+
+            # Only ask for the password if some file's key is not cached
+            password = None
+            if len(headers) < len(files) or any(_session_key(header) not in self.key_cache
+                                                for header in headers.values()):
+                password = input("Enter decryption password: ")
+
+            for path in files:
+                output_file = options['output'] or (path[:-4] if path.endswith('.enc') else path + '.dec')
+                if path not in headers:
+                    self._decrypt_legacy(path, output_file, password)
+                    print(f"File decrypted: {output_file}")
+                    continue
+                # Files encrypted in one session share a KDF salt, so the KDF runs once for them
+                header = headers[path]
+                jobs.append(CipherJob(path, output_file, self._master_key(password, header, derived),
+                                      header, decrypt=True))
+            if jobs:
+                self._run(jobs, options['workers'], "decrypted")
+
+            # Keep only keys that decrypted something, so a mistyped password is not remembered
+            for job in jobs:
+                session = _session_key(job.header)
+                if job.error is None and session in derived:
+                    self.key_cache.put(session, derived.pop(session))
+
         except Exception as e:
-            print(f"Decryption error: {e}")
\ No newline at end of file
+            print(f"Decryption error: {e}")
+        finally:
+            # Every key here is this command's own copy; the cache keeps its own
+            for key in list(derived.values()) + [job.master_key for job in jobs]:
+                wipe(key)
+
+    def _encrypt_session(self):
+        """Return (header, master key) for new files, prompting only when no key is cached.
+
+        The key is the caller's own copy, to wipe() once the files are written.
+        """
+        settings = self._kdf_settings()
+        if self._session is not None and self._session[0] == settings:
+            session = self._session[1]
+            master_key = self.key_cache.get(_session_key(session))
+            if master_key is not None:
+                return session, master_key
+
+        password = input("Enter encryption password: ")
+        session = new_header(*settings)
+        master_key = derive_master_key(password, session)
+        self.key_cache.put(_session_key(session), master_key)
+        self._session = (settings, session)
+        return session, master_key
+
+    def _master_key(self, password, header, derived):
+        """A copy of the cached key for the header's KDF session, else one derived from `password` once per session"""
+        session = _session_key(header)
+        master_key = self.key_cache.get(session)
+        if master_key is None:
+            if session not in derived:
+                derived[session] = derive_master_key(password, header)
+            master_key = derived[session]
+        return master_key
+
+    def _kdf_settings(self):
+        """KDF id and parameters for new files: calibrated by --bench, else the defaults"""
+        name = DEFAULT_CONFIG.get('encrypt_kdf', 'scrypt')
+        if name not in KDF_NAMES:
+            raise ValueError(f"Unknown encrypt_kdf setting: {name}")
+        if name == 'argon2id' and not argon2_available():
+            print("Argon2id is not available (needs cryptography 44+ or argon2-cffi); using scrypt")
+            name = 'scrypt'
+        kdf_id = KDF_NAMES[name]
+        try:
+            if self.kdf_file.exists():
+                with self.kdf_file.open('r') as f:
+                    calibrated = json.load(f)
+                if name in calibrated:
+                    return kdf_id, tuple(calibrated[name]['params'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error loading KDF calibration: {e}")
+        return kdf_id, DEFAULT_KDF_PARAMS[kdf_id]
+
+    def _bench(self, args):
+        """Calibrate every available KDF to the target latency and save the parameters"""
+        try:
+            target_ms = int(args[0]) if args else DEFAULT_CONFIG.get('encrypt_kdf_target_ms', 500)
+        except ValueError:
+            print("Usage: encrypt --bench [target_ms]")
+            return
+
+        print(f"Calibrating key derivation for {target_ms} ms on this host...")
+        calibrated = {}
+        for name, kdf_id in KDF_NAMES.items():
+            if name == 'argon2id' and not argon2_available():
+                print(f"{name:<10} unavailable (needs cryptography 44+ or argon2-cffi)")
+                continue
+            params, seconds = calibrate_kdf(kdf_id, target_ms / 1000)
+            calibrated[name] = {'params': list(params), 'ms': round(seconds * 1000)}
+            print(f"{name:<10} {_describe_params(kdf_id, params):<36} {seconds * 1000:7.0f} ms")
+
+        with self.kdf_file.open('w') as f:
+            json.dump(calibrated, f, indent=2)
+        self._session = None
+        print(f"New files use {DEFAULT_CONFIG.get('encrypt_kdf', 'scrypt')} (encrypt_kdf setting); "
+              f"parameters saved to {self.kdf_file}")
+
+    def _parse_args(self, args):
+        """Split encrypt/decrypt arguments into options; None if they are malformed"""
+        options = {'targets': [], 'recursive': False, 'output': None,
+                   'workers': DEFAULT_CONFIG.get('encrypt_workers', 0)}
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            if arg in ('-r', '--recursive'):
+                options['recursive'] = True
+            elif arg in ('-o', '-j') and i + 1 < len(args):
+                i += 1
+                if arg == '-o':
+                    options['output'] = args[i]
+                else:
+                    try:
+                        options['workers'] = int(args[i])
+                    except ValueError:
+                        print(f"Invalid worker count: {args[i]}")
+                        return None
+            elif arg.startswith('-') and arg != '-':
+                print(f"Unknown option: {arg}")
+                return None
+            else:
+                options['targets'].append(arg)
+            i += 1
+        return options
+
+    def _collect_files(self, targets, recursive, skip_encrypted):
+        """Expand globs and, with -r, directories into a list of regular files"""
+        files = []
+        for target in targets:
+            matches = sorted(glob.glob(target)) if glob.has_magic(target) else [target]
+            if not matches:
+                print(f"No match for {target}")
+            for path in matches:
+                if os.path.isdir(path):
+                    if not recursive:
+                        print(f"{path} is a directory (use -r)")
+                        continue
+                    for dirpath, dirnames, filenames in os.walk(path):
+                        dirnames.sort()
+                        files.extend(os.path.join(dirpath, name) for name in sorted(filenames))
+                elif os.path.isfile(path):
+                    files.append(path)
+                else:
+                    print(f"{path}: not a regular file")
+
+        if skip_encrypted:
+            files = [path for path in files if not path.endswith(('.enc', '.part'))]
+        return list(dict.fromkeys(files))
+
+    def _run(self, jobs, workers, verb):
+        """Process jobs on the process pool and print results and throughput"""
+        cipher = ParallelCipher(workers)
+        start = time.time()
+        cipher.run(jobs)
+        elapsed = max(time.time() - start, 1e-6)
+
+        done = [job for job in jobs if job.error is None]
+        for job in jobs:
+            if job.error is not None:
+                print(f"Error: {job.src}: {job.error}")
+        if len(jobs) == 1 and done:
+            print(f"File {verb}: {done[0].dst}")
+
+        megabytes = sum(job.bytes for job in done) / (1024 * 1024)
+        cores = min(cipher.processes, os.cpu_count() or 1)
+        rate = megabytes / elapsed
+        print(f"{verb.capitalize()} {len(done)} of {len(jobs)} files, {megabytes:.1f} MB in {elapsed:.2f}s: "
+              f"{rate:.1f} MB/s ({rate / cores:.1f} MB/s per core, {cores} cores)")
+
+    def _decrypt_legacy(self, input_file, output_file, password):
+        """Decrypt a whole-file Fernet token written by earlier versions"""
+        key = self.generate_key(password)
+        fernet = Fernet(base64.urlsafe_b64encode(key))
+
+        with open(input_file, 'rb') as f:
+            encrypted_data = f.read()
+
+        decrypted_data = fernet.decrypt(encrypted_data)
+        self._write_atomically(output_file, lambda dst: dst.write(decrypted_data))
+
+    def _write_atomically(self, output_file, write):
+        """Write through a temporary file so a failure never leaves partial output"""
+        temp_file = output_file + '.part'
+        try:
+            with open(temp_file, 'wb') as dst:
+                result = write(dst)
+            os.replace(temp_file, output_file)
+            return result
+        except BaseException:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+
+
+def _session_key(header):
+    """Key-cache lookup key: files sharing a KDF, parameters and salt share a master key"""
+    return (header.kdf_id, header.kdf_params, header.kdf_salt)
+
+
+def _describe_params(kdf_id, params):
+    if kdf_id == KDF_NAMES['pbkdf2']:
+        return f"{params[0]:,} iterations"
+    if kdf_id == KDF_NAMES['scrypt']:
+        return f"N=2^{params[0]} r={params[1]} p={params[2]} ({(128 * params[1] << params[0]) >> 20} MiB)"
+    return f"t={params[0]} m={params[1] >> 10} MiB p={params[2]}"
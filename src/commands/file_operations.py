@@ -10,14 +10,13 @@ class FileOperations:
     def __init__(self, shell):
         self.shell = shell
 
-    def ls_command(self, args):
-        """Advanced ls command with multiple display options"""
+    def _parse_ls_args(self, args):
+        """Parse ls arguments into (path, long_format, human_readable, all_files)"""
         path = "."
         long_format = False
         human_readable = False
         all_files = False
 
-        # Parse arguments
         for arg in args:
             if arg in ("-l", "-lh", "-la", "-al", "-lah", "-hal"):
                 long_format = True
@@ -28,24 +27,39 @@ class FileOperations:
             elif not arg.startswith("-"):
                 path = arg
 
+        return path, long_format, human_readable, all_files
+
+    def _list_items(self, path, all_files):
+        """Return the sorted directory entries shown by ls"""
+        items = os.listdir(path)
+        if not all_files:
+            items = [item for item in items if not item.startswith('.')]
+        items.sort()
+        return items
+
+    def _long_format_line(self, path, item, human_readable, name=None):
+        """Format one ls -l line"""
+        full_path = os.path.join(path, item)
+        stats = os.stat(full_path)
+        permissions = AdvancedLS.get_file_permissions(stats.st_mode)
+        size = stats.st_size
+        if human_readable:
+            size = AdvancedLS.human_readable_size(size)
+        mtime = datetime.fromtimestamp(stats.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
+        return f"{permissions} {stats.st_nlink} {stats.st_uid} {stats.st_gid} {size:>8} {mtime} {name or item}"
+
+    def ls_command(self, args):
+        """Advanced ls command with multiple display options"""
+        path, long_format, human_readable, all_files = self._parse_ls_args(args)
+
         try:
-            items = os.listdir(path)
-            if not all_files:
-                items = [item for item in items if not item.startswith('.')]
-            items.sort()
+            items = self._list_items(path, all_files)
 
             if long_format:
                 # Detailed list view
                 for item in items:
-                    full_path = os.path.join(path, item)
-                    stats = os.stat(full_path)
-                    permissions = AdvancedLS.get_file_permissions(stats.st_mode)
-                    size = stats.st_size
-                    if human_readable:
-                        size = AdvancedLS.human_readable_size(size)
-                    mtime = datetime.fromtimestamp(stats.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
                     colorized_name = self.colorize_filename(path, item)
-                    print(f"{permissions} {stats.st_nlink} {stats.st_uid} {stats.st_gid} {size:>8} {mtime} {colorized_name}")
+                    print(self._long_format_line(path, item, human_readable, colorized_name))
             else:
                 # Simple list view
                 for item in items:
@@ -59,6 +73,26 @@ class FileOperations:
         except Exception as e:
             print(f"ls: {e}")
 
+    def ls_stream(self, args, stdin=None):
+        """Yield one uncolored entry per line; used when ls runs inside a pipeline"""
+        path, long_format, human_readable, all_files = self._parse_ls_args(args)
+
+        try:
+            for item in self._list_items(path, all_files):
+                if long_format:
+                    yield self._long_format_line(path, item, human_readable) + "\n"
+                else:
+                    yield item + "\n"
+        except FileNotFoundError:
+            print(f"ls: cannot access '{path}': No such file or directory", file=sys.stderr)
+            return 2
+        except PermissionError:
+            print(f"ls: cannot access '{path}': Permission denied", file=sys.stderr)
+            return 2
+        except Exception as e:
+            print(f"ls: {e}", file=sys.stderr)
+            return 2
+
     def rm_command(self, args):
         """Remove files or directories"""
         if not args:
@@ -106,16 +140,35 @@ class FileOperations:
             print("cat: missing file operand")
             return
 
+        for line in self.cat_stream(args):
+            print(line, end='')
+
+    def cat_stream(self, args, stdin=None):
+        """Yield file contents line by line; with no files, pass stdin through. Returns the exit status"""
+        if not args:
+            if stdin is not None:
+                yield from stdin
+            return 0
+
+        status = 0
         for file_path in args:
             try:
                 with open(file_path, 'r') as f:
-                    print(f.read())
+                    line = ''
+                    for line in f:
+                        yield line
+                    if line and not line.endswith('\n'):
+                        yield '\n'
             except FileNotFoundError:
-                print(f"cat: {file_path}: No such file or directory")
+                print(f"cat: {file_path}: No such file or directory", file=sys.stderr)
+                status = 1
             except PermissionError:
-                print(f"cat: {file_path}: Permission denied")
+                print(f"cat: {file_path}: Permission denied", file=sys.stderr)
+                status = 1
             except IsADirectoryError:
-                print(f"cat: {file_path}: Is a directory")
+                print(f"cat: {file_path}: Is a directory", file=sys.stderr)
+                status = 1
+        return status
 
     def touch_command(self, args):
         """Create empty files"""
@@ -1,19 +1,53 @@
 import os
+import sys
 import fnmatch
 import re
 from datetime import datetime
-from typing import List, Dict, Generator
+from typing import Dict, Generator, Iterable
 from pathlib import Path
 import time
+import heapq
+import itertools
+import stat as stat_module
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from src.utils.ignore_rules import IgnoreRules, walk_tree
+from src.utils.content_matcher import ContentMatcher, match_batch
+from src.utils.fs_index import FileIndex
+from src.utils.trigram_index import TrigramIndex
+from src.utils.multi_matcher import MultiPatternMatcher, load_patterns, match_patterns_batch
+from src.config.settings import DEFAULT_CONFIG
+
+SORT_KEYS = ('size', 'mtime')
+
+class SearchResult:
+    """One search hit; slots keep millions of these small"""
+    __slots__ = ('path', 'size', 'mtime', 'is_dir', 'matched')
+
+    def __init__(self, path, size, mtime, is_dir, matched=None):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.is_dir = is_dir
+        self.matched = matched  # Pattern texts found by -f
 
 class FileSearch:
     def __init__(self, shell):
         self.shell = shell
+        self.index = FileIndex(self.shell.config_dir / "fs_index.db")
+        self.content_index = TrigramIndex(self.shell.config_dir / "content_index.db",
+                                          max_file_size=DEFAULT_CONFIG['content_index_max_file_size'])
 
     def search_command(self, args):
         """Handle file search commands"""
         if not args:
             return self._show_usage()
+
+        if args[0] == '--index':
+            return self._index_command(args[1:])
+        if args[0] == '--content-index':
+            return self._content_index_command(args[1:])
             
         # Parse arguments
         try:
@@ -22,13 +56,102 @@ class FileSearch:
             print(f"Error: {e}")
             return self._show_usage()
             
-        # Perform search
+        # Perform search; unsorted results are printed as they are found
         try:
-            results = list(self._search_files(**options))
-            self._display_results(results, options)
+            results = self._search_files(**options)
+            if options['count']:
+                print(f"Found {sum(1 for _ in results)} matches")
+            else:
+                self._display_results(self._ordered(results, options), options)
         except Exception as e:
             print(f"Error during search: {e}")
 
+    def search_stream(self, args, stdin=None):
+        """Yield one matching path per line; used when search runs inside a pipeline"""
+        try:
+            options = self._parse_search_args(args)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+
+        results = self._search_files(**options)
+        if options['count']:
+            yield f"{sum(1 for _ in results)}\n"
+            return
+
+        for result in self._ordered(results, options):
+            if result.matched:
+                yield f"{result.path}: {', '.join(result.matched)}\n"
+            else:
+                yield result.path + "\n"
+
+    def _index_command(self, args):
+        """Manage the persistent filesystem index"""
+        if not args or args[0] not in ['build', 'update', 'stats']:
+            print("Usage: search --index build|update|stats [path]")
+            return
+
+        action = args[0]
+        path = args[1] if len(args) > 1 else '.'
+        start = time.time()
+        try:
+            if action == 'build':
+                dirs, entries = self.index.build(path)
+                print(f"Indexed {entries} entries in {dirs} directories "
+                      f"under {os.path.abspath(path)} in {time.time() - start:.2f}s")
+            elif action == 'update':
+                checked, rescanned = self.index.update(path)
+                print(f"Checked {checked} directories, relisted {rescanned} "
+                      f"in {time.time() - start:.2f}s")
+            else:
+                stats = self.index.stats()
+                print(f"Index: {self.index.db_path} ({self._format_size(stats['bytes'])})")
+                print(f"Directories: {stats['dirs']}  Entries: {stats['entries']}")
+                for root, built in stats['roots']:
+                    print(f"  {root}  (updated {datetime.fromtimestamp(built).strftime('%Y-%m-%d %H:%M')})")
+        except ValueError as e:
+            print(f"Error: {e}")
+        except Exception as e:
+            print(f"Index error: {e}")
+
+    def _content_index_command(self, args):
+        """Manage the trigram index used to narrow content searches"""
+        if not args or args[0] not in ['build', 'update', 'stats']:
+            print("Usage: search --content-index build|update|stats [path]")
+            return
+
+        action = args[0]
+        path = os.path.abspath(args[1] if len(args) > 1 else '.')
+        if action == 'stats':
+            try:
+                stats = self.content_index.stats()
+            except Exception as e:
+                print(f"Index error: {e}")
+                return
+            print(f"Index: {self.content_index.db_path} ({self._format_size(stats['bytes'])})")
+            print(f"Files: {stats['files']}  Trigrams: {stats['trigrams']}  "
+                  f"Postings: {self._format_size(stats['postings_bytes'])}  Stale ids: {stats['dead']}")
+            for root, built in stats['roots']:
+                state = datetime.fromtimestamp(built).strftime('%Y-%m-%d %H:%M') if built else 'building'
+                print(f"  {root}  ({state})")
+            return
+
+        if action == 'update' and self.content_index.covering_root(path) is None:
+            print(f"Error: {path} has no content index; run 'search --content-index build {path}' first")
+            return
+
+        # Indexing reads every file, so it runs as a background job
+        self.shell.jobs.submit(f"search --content-index {action} {path}", self._run_content_index, action, path)
+
+    def _run_content_index(self, action, path):
+        start = time.time()
+        if action == 'build':
+            indexed, removed = self.content_index.build(path)
+        else:
+            indexed, removed = self.content_index.update(path)
+        print(f"Content index: indexed {indexed} files, dropped {removed} under {path} "
+              f"in {time.time() - start:.2f}s")
+
     def _show_usage(self):
         """Show search command usage information"""
         print("\nFile Search Usage:")
@@ -40,11 +163,32 @@ class FileSearch:
         print("  -d, --date <date>     Search by modification date (e.g., +7d, -30d)")
         print("  -r, --regex           Use regular expression pattern")
         print("  -c, --content <text>  Search file contents")
+        print("  -f, --patterns-file <file>")
+        print("                        Search contents for every pattern in file, one per line")
+        print("                        ('re:' prefix for a regex); hits show which matched")
+        print("  -m, --max-size <size> Skip content search in files larger than size (e.g., 100M)")
+        print("  -a, --text            Search binary files as text")
+        print("  -j, --jobs <n>        Match contents in n worker processes")
+        print("      --ordered         With -j, keep results in traversal order")
+        print("      --sort size|mtime Largest or newest first")
+        print("      --limit <n>       Stop after n results (with --sort: keep the top n)")
+        print("      --count           Print only the number of matches")
+        print("      --no-index        Walk the tree and read every file even if indexed")
+        print("      --no-ignore       Include paths excluded by .gitignore/.ignore/.nexusignore")
+        print("\nIndex:")
+        print("  search --index build [path]   Index names, sizes, dates and types")
+        print("  search --index update [path]  Relist directories that changed")
+        print("  search --index stats          Show what is indexed")
+        print("  search --content-index build|update [path]  Index file contents for -c (background)")
+        print("  search --content-index stats                Show the content index")
         print("\nExamples:")
         print("  search *.txt")
         print("  search -p /home -t f -s +1M")
         print("  search -r \".*\\.py$\" -d -7d")
         print("  search -c \"TODO\" *.py")
+        print("  search -c \"TODO\" -j 8 *.py")
+        print("  search -f error_codes.txt *.log")
+        print("  search -p / -t f --sort size --limit 20 \"*\"")
 
     def _parse_search_args(self, args) -> Dict:
         """Parse search command arguments"""
@@ -55,7 +199,17 @@ class FileSearch:
             'size': None,
             'date': None,
             'regex': False,
-            'content': None
+            'content': None,
+            'patterns': None,
+            'max_size': DEFAULT_CONFIG['search_max_file_size'] or None,
+            'binary': False,
+            'jobs': DEFAULT_CONFIG['search_jobs'],
+            'ordered': False,
+            'sort': None,
+            'limit': None,
+            'count': False,
+            'use_index': True,
+            'ignore': DEFAULT_CONFIG['respect_ignore_files']
         }
         
         i = 0
@@ -83,13 +237,54 @@ class FileSearch:
                 elif arg in ['-c', '--content'] and i + 1 < len(args):
                     options['content'] = args[i + 1]
                     i += 2
+                elif arg in ['-f', '--patterns-file'] and i + 1 < len(args):
+                    try:
+                        options['patterns'] = load_patterns(args[i + 1])
+                    except OSError as e:
+                        raise ValueError(f"Cannot read patterns file: {e}")
+                    i += 2
+                elif arg in ['-m', '--max-size'] and i + 1 < len(args):
+                    options['max_size'] = self._parse_byte_count(args[i + 1])
+                    i += 2
+                elif arg in ['-a', '--text']:
+                    options['binary'] = True
+                    i += 1
+                elif arg in ['-j', '--jobs'] and i + 1 < len(args):
+                    if not args[i + 1].isdigit() or int(args[i + 1]) < 1:
+                        raise ValueError("Jobs must be a positive integer")
+                    options['jobs'] = int(args[i + 1])
+                    i += 2
+                elif arg == '--ordered':
+                    options['ordered'] = True
+                    i += 1
+                elif arg == '--no-index':
+                    options['use_index'] = False
+                    i += 1
+                elif arg == '--sort' and i + 1 < len(args):
+                    if args[i + 1] not in SORT_KEYS:
+                        raise ValueError("Sort key must be 'size' or 'mtime'")
+                    options['sort'] = args[i + 1]
+                    i += 2
+                elif arg == '--limit' and i + 1 < len(args):
+                    if not args[i + 1].isdigit() or int(args[i + 1]) < 1:
+                        raise ValueError("Limit must be a positive integer")
+                    options['limit'] = int(args[i + 1])
+                    i += 2
+                elif arg == '--count':
+                    options['count'] = True
+                    i += 1
+                elif arg == '--no-ignore':
+                    options['ignore'] = False
+                    i += 1
                 else:
                     raise ValueError(f"Invalid option or missing value: {arg}")
             else:
                 options['pattern'] = arg
                 i += 1
         
-        if not options['pattern'] and not options['content']:
+        if options['content'] and options['patterns']:
+            raise ValueError("Use either -c or -f, not both")
+        if not options['pattern'] and not options['content'] and not options['patterns']:
             raise ValueError("Search pattern or content is required")
             
         return options
@@ -106,6 +301,16 @@ class FileSearch:
         size_bytes = int(size) * multiplier
         return (op, size_bytes)
 
+    def _parse_byte_count(self, size_str: str) -> int:
+        """Parse an unsigned size string (e.g., 500K, 2G) into bytes"""
+        units = {'K': 1024, 'M': 1024**2, 'G': 1024**3}
+        match = re.match(r'^(\d+)([KMG])?$', size_str)
+        if not match:
+            raise ValueError("Invalid size format")
+
+        size, unit = match.groups()
+        return int(size) * units.get(unit, 1)
+
     def _parse_date(self, date_str: str) -> float:
         """Parse date string (e.g., +7d, -30d) into timestamp"""
         match = re.match(r'^([+-])(\d+)d$', date_str)
@@ -123,71 +328,227 @@ class FileSearch:
 
     def _search_files(self, **options) -> Generator:
         """Search for files matching the given criteria"""
-        for root, dirs, files in os.walk(options['path']):
-            items = dirs if options['type'] == 'd' else files if options['type'] == 'f' else dirs + files
-            
-            for item in items:
-                path = os.path.join(root, item)
-                
-                # Check pattern match
-                if options['pattern']:
-                    if options['regex']:
-                        if not re.match(options['pattern'], item):
-                            continue
-                    elif not fnmatch.fnmatch(item, options['pattern']):
-                        continue
-                
+        candidates = self._find_candidates(**options)
+        needles = self._index_needles(options)
+        if needles and options['use_index']:
+            candidates = self._narrow_by_content_index(candidates, options['path'], needles)
+
+        if not options['content'] and not options['patterns']:
+            yield from candidates
+        elif options['jobs'] > 1:
+            yield from self._match_content_parallel(candidates, options)
+        elif options['patterns']:
+            # One pass per file reports every pattern it contains
+            matcher = MultiPatternMatcher(options['patterns'], max_size=options['max_size'],
+                                          include_binary=options['binary'])
+            for result in candidates:
+                try:
+                    matched = matcher.matches(result.path, result.size)
+                except (OSError, ValueError):
+                    continue
+                if matched:
+                    result.matched = [options['patterns'][index][1] for index in matched]
+                    yield result
+        else:
+            # Content check stops reading at the first hit
+            matcher = ContentMatcher(options['content'], max_size=options['max_size'],
+                                     include_binary=options['binary'])
+            for result in candidates:
                 try:
-                    stat = os.stat(path)
-                    
-                    # Check size
-                    if options['size']:
-                        op, size = options['size']
-                        if op == '+' and stat.st_size < size:
-                            continue
-                        if op == '-' and stat.st_size > size:
-                            continue
-                    
-                    # Check date
-                    if options['date']:
-                        if stat.st_mtime < options['date']:
-                            continue
-                    
-                    # Check content
-                    if options['content']:
-                        if os.path.isfile(path):
-                            try:
-                                with open(path, 'r', encoding='utf-8') as f:
-                                    if options['content'] not in f.read():
-                                        continue
-                            except (UnicodeDecodeError, IOError):
-                                continue
-                        else:
-                            continue
-                    
-                    yield {
-                        'path': path,
-                        'size': stat.st_size,
-                        'mtime': stat.st_mtime,
-                        'type': 'dir' if os.path.isdir(path) else 'file'
-                    }
-                    
+                    if matcher.matches(result.path, result.size):
+                        yield result
                 except (OSError, PermissionError):
                     continue
 
-    def _display_results(self, results: List[Dict], options: Dict):
-        """Display search results"""
-        if not results:
+    def _find_candidates(self, **options) -> Generator:
+        """Apply the name, type, size and date filters to indexed or walked entries"""
+        name_regex = re.compile(options['pattern']) if options['pattern'] and options['regex'] else None
+
+        if options['use_index'] and self.index.covering_root(options['path']):
+            # Answered from the index; changed directories are listed live
+            entries = self.index.query(
+                options['path'], type_=options['type'], size=options['size'], date=options['date'],
+                glob=options['pattern'] if options['pattern'] and not options['regex'] else None)
+            if options['ignore']:
+                rules = IgnoreRules(options['path'])
+                entries = (entry for entry in entries if not rules.excludes(entry.path, entry.is_dir()))
+        else:
+            # Ignored directories are pruned before they are read
+            entries = walk_tree(options['path'], ignore=options['ignore'])
+
+        for entry in entries:
+            try:
+                # Symlinks to directories count as directories but are not descended
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if options['type'] == 'd' and not is_dir:
+                continue
+            if options['type'] == 'f' and is_dir:
+                continue
+
+            item = entry.name
+            path = entry.path
+
+            # Check pattern match
+            if options['pattern']:
+                if name_regex is not None:
+                    if not name_regex.match(item):
+                        continue
+                elif not fnmatch.fnmatch(item, options['pattern']):
+                    continue
+
+            try:
+                # DirEntry caches this; no second stat per entry
+                stat = entry.stat()
+            except (OSError, PermissionError):
+                continue
+
+            # Check size
+            if options['size']:
+                op, size = options['size']
+                if op == '+' and stat.st_size < size:
+                    continue
+                if op == '-' and stat.st_size > size:
+                    continue
+
+            # Check date
+            if options['date']:
+                if stat.st_mtime < options['date']:
+                    continue
+
+            # Only regular files can match a content search
+            if (options['content'] or options['patterns']) and (is_dir or not stat_module.S_ISREG(stat.st_mode)):
+                continue
+
+            yield SearchResult(path, stat.st_size, stat.st_mtime, is_dir)
+
+    def _index_needles(self, options):
+        """Literal strings the trigram index can narrow on, or None"""
+        if options['content']:
+            return [options['content']]
+        if options['patterns'] and not any(is_regex for is_regex, _ in options['patterns']):
+            return [text for _, text in options['patterns']]
+        return None
+
+    def _narrow_by_content_index(self, candidates, path, needles) -> Generator:
+        """Drop unchanged indexed files whose trigrams rule out every needle"""
+        lookup = self.content_index.lookup(path, *needles)
+        if lookup is None:
+            yield from candidates
+            return
+
+        indexed, hits = lookup
+        for result in candidates:
+            path = os.path.abspath(result.path)
+            # Hits are still verified; new or modified files are read as usual
+            if path in hits or path not in indexed:
+                yield result
+                continue
+            # result.size/mtime may come from the file index, which misses files
+            # edited in place, so only a fresh stat can confirm the trigram miss
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if indexed[path] != (stat.st_size, stat.st_mtime):
+                yield result
+
+    def _match_content_parallel(self, candidates, options) -> Generator:
+        """Check candidate contents in batches on a process pool"""
+        batch_size = DEFAULT_CONFIG['search_batch_size']
+        max_in_flight = options['jobs'] * 2
+        ordered = options['ordered']
+        patterns = options['patterns']
+        if patterns:
+            task, task_args = match_patterns_batch, (patterns, options['max_size'], options['binary'])
+        else:
+            task, task_args = match_batch, (options['content'], options['max_size'], options['binary'])
+
+        # spawn: the walker threads are running, so forking is not safe
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=options['jobs'], mp_context=context) as pool:
+            pending = deque()
+
+            def submit(batch):
+                items = [(result.path, result.size) for result in batch]
+                pending.append((pool.submit(task, *task_args, items), batch))
+
+            def collect(future, batch):
+                for hit in future.result():
+                    if patterns:
+                        index, matched = hit
+                        batch[index].matched = [patterns[i][1] for i in matched]
+                        yield batch[index]
+                    else:
+                        yield batch[hit]
+
+            def drain(limit):
+                """Yield finished results until at most `limit` batches are in flight"""
+                while len(pending) > limit:
+                    if ordered:
+                        yield from collect(*pending.popleft())
+                        continue
+                    wait([future for future, _ in pending], return_when=FIRST_COMPLETED)
+                    for item in [item for item in pending if item[0].done()]:
+                        pending.remove(item)
+                        yield from collect(*item)
+
+            batch = []
+            for result in candidates:
+                batch.append(result)
+                if len(batch) < batch_size:
+                    continue
+                submit(batch)
+                batch = []
+                # Bound the work in flight so memory stays flat on huge trees
+                yield from drain(max_in_flight - 1)
+
+            if batch:
+                submit(batch)
+            yield from drain(0)
+
+    def _ordered(self, results: Iterable[SearchResult], options: Dict) -> Iterable[SearchResult]:
+        """Apply --sort and --limit; unsorted results keep streaming"""
+        limit = options['limit']
+        if not options['sort']:
+            return itertools.islice(results, limit) if limit else results
+
+        key = options['sort']
+        if not limit:
+            return sorted(results, key=lambda result: getattr(result, key), reverse=True)
+
+        # Min-heap of the best `limit` so far; memory stays O(limit) however many match
+        heap = []
+        for seq, result in enumerate(results):
+            item = (getattr(result, key), -seq, result)
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+        return [result for *_, result in sorted(heap, key=lambda item: item[:2], reverse=True)]
+
+    def _display_results(self, results: Iterable[SearchResult], options: Dict):
+        """Display search results as they arrive"""
+        count = 0
+        for result in results:
+            if count == 0:
+                print("-" * 80)
+            count += 1
+            mtime = datetime.fromtimestamp(result.mtime).strftime('%Y-%m-%d %H:%M')
+            size = '' if result.is_dir else self._format_size(result.size)
+            line = f"{'dir' if result.is_dir else 'file':4} {mtime:16} {size:10} {result.path}"
+            if result.matched:
+                line += f"  [{', '.join(result.matched)}]"
+            print(line)
+
+        if not count:
             print("No matches found")
             return
-            
-        print(f"\nFound {len(results)} matches:")
+
         print("-" * 80)
-        
-        for result in results:
-            mtime = datetime.fromtimestamp(result['mtime']).strftime('%Y-%m-%d %H:%M')
-            size = '' if result['type'] == 'dir' else self._format_size(result['size'])
-            print(f"{result['type']:4} {mtime:16} {size:10} {result['path']}")
+        print(f"Found {count} matches")
 
     def _format_size(self, size: int) -> str:
         """Format size in human readable format"""
@@ -1,12 +1,24 @@
+import os
 import psutil
 import time
-from datetime import datetime
+import heapq
+import threading
+from datetime import datetime, timedelta
 import humanize
 from typing import List, Dict
+from src.config.settings import DEFAULT_CONFIG
+from src.utils.process_sampler import ProcessSampler, SORT_KEYS, top
+from src.utils.process_tree import ProcessTree, snapshot_records
+from src.utils.process_top import ProcessTop
+from src.utils.metrics_store import MetricsWriter, MetricsReader
+
+QUERY_SORTS = ('cpu', 'rss', 'io', 'fds')
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
 
 class ProcessManager:
     def __init__(self, shell):
         self.shell = shell
+        self.recorders = []  # Stop events of running `process record` jobs
 
     def process_command(self, args):
         """Handle process-related commands"""
@@ -21,7 +33,10 @@ class ProcessManager:
             'kill': self._kill_process,
             'info': self._process_info,
             'top': self._show_top,
-            'tree': self._process_tree
+            'tree': self._process_tree,
+            'record': self._record,
+            'query': self._query,
+            'replay': self._replay
         }
         
         if subcommand in commands:
@@ -33,46 +48,55 @@ class ProcessManager:
     def _show_usage(self):
         """Show process manager usage information"""
         print("\nProcess Manager Usage:")
-        print("  process list [--sort cpu|mem]")
+        print("  process list [--sort cpu|mem|rss|io|threads] [-n count] [--interval seconds]")
         print("  process kill <pid>")
         print("  process info <pid>")
-        print("  process top")
-        print("  process tree [pid]")
+        print("  process top [--interval seconds] [--sort cpu|mem|rss|io|threads]")
+        print("  process tree [pid] [--interval seconds] [--no-collapse]")
+        print("  process record [--interval 5s] [--out file] [--duration 1h] | --stop")
+        print("  process query [--from T1] [--to T2] [--sort cpu|rss|io|fds] [-n count] [--file file]")
+        print("  process replay [--from T1] [--to T2] [-n count] [--file file]")
+        print("  (times: 03:00, 2024-05-01T03:00, -2h, now)")
 
     def _list_processes(self, args):
         """List running processes"""
         sort_by = 'cpu'
-        if args and args[0] == '--sort':
-            if len(args) > 1 and args[1] in ['cpu', 'mem']:
-                sort_by = args[1]
+        limit = 20
+        interval = DEFAULT_CONFIG.get('process_sample_interval', 0.5)
+        i = 0
+        while i < len(args):
+            option = args[i]
+            value = args[i + 1] if i + 1 < len(args) else None
+            if option == '--sort' and value in SORT_KEYS:
+                sort_by = value
+            elif option == '--sort':
+                print(f"Invalid sort option. Use one of: {', '.join(SORT_KEYS)}")
+                return
+            elif option == '-n' and value is not None and value.isdigit():
+                limit = int(value)
+            elif option == '--interval' and value is not None:
+                try:
+                    interval = float(value.rstrip('s'))
+                except ValueError:
+                    print(f"Invalid interval: {value}")
+                    return
             else:
-                print("Invalid sort option. Using default (cpu)")
-
-        processes = []
-        for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-            try:
-                info = proc.info
-                info['cpu_percent'] = proc.cpu_percent(interval=0.1)
-                processes.append(info)
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
+                print(f"Unknown option: {option}")
+                return
+            i += 2
 
-        # Sort processes
-        processes.sort(key=lambda x: x['cpu_percent' if sort_by == 'cpu' else 'memory_percent'],
-                      reverse=True)
+        # One sleep for every process, then a single oneshot() read of each
+        processes = top(ProcessSampler().snapshot(interval), sort_by, limit)
 
         # Print header
-        print(f"\n{'PID':>7} {'CPU%':>7} {'MEM%':>7} {'Name':<30}")
-        print("-" * 55)
+        print(f"\n{'PID':>7} {'CPU%':>7} {'MEM%':>7} {'RSS':>10} {'THR':>5} {'IO/s':>10} {'Name':<30}")
+        print("-" * 82)
 
         # Print processes
-        for proc in processes[:20]:  # Show top 20 processes
-            try:
-                print(f"{proc['pid']:>7} {proc['cpu_percent']:>7.1f} "
-                      f"{proc.get('memory_percent', 0):>7.1f} "
-                      f"{proc['name']:<30}")
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
+        for proc in processes:
+            print(f"{proc.pid:>7} {proc.cpu:>7.1f} {proc.mem:>7.1f} "
+                  f"{humanize.naturalsize(proc.rss):>10} {proc.threads:>5} "
+                  f"{humanize.naturalsize(proc.io_rate):>10} {proc.name[:30]:<30}")
 
     def _kill_process(self, args):
         """Kill a process by PID"""
@@ -154,90 +178,257 @@ class ProcessManager:
 
     def _show_top(self, args):
         """Show real-time process information (similar to top command)"""
+        interval = DEFAULT_CONFIG.get('process_top_interval', 2.0)
+        sort_by = 'cpu'
         try:
-            while True:
-                # Clear screen
-                print("\033[2J\033[H", end="")
-                
-                # Get system information
-                cpu_percent = psutil.cpu_percent(interval=1)
-                memory = psutil.virtual_memory()
-                
-                # Print system overview
-                print(f"CPU Usage: {cpu_percent}%")
-                print(f"Memory Usage: {memory.percent}% of {humanize.naturalsize(memory.total)}")
-                print("\n" + "=" * 80)
-                print(f"{'PID':>7} {'CPU%':>7} {'MEM%':>7} {'Name':<30}")
-                print("-" * 80)
-                
-                # Get process information
-                processes = []
-                for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-                    try:
-                        info = proc.info
-                        info['cpu_percent'] = proc.cpu_percent()
-                        processes.append(info)
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        continue
-                
-                # Sort by CPU usage and print top processes
-                processes.sort(key=lambda x: x['cpu_percent'], reverse=True)
-                for proc in processes[:15]:  # Show top 15 processes
-                    print(f"{proc['pid']:>7} {proc['cpu_percent']:>7.1f} "
-                          f"{proc.get('memory_percent', 0):>7.1f} "
-                          f"{proc['name'][:30]:<30}")
-                
-                print("\nPress Ctrl+C to exit")
-                time.sleep(2)
-                
-        except KeyboardInterrupt:
-            print("\nExiting top view")
+            for option, value in zip(args[::2], args[1::2]):
+                if option == '--interval':
+                    interval = max(0.1, float(value.rstrip('s')))
+                elif option == '--sort' and value in SORT_KEYS:
+                    sort_by = value
+                else:
+                    print(f"Unknown option: {option} {value}")
+                    return
+        except ValueError:
+            print("Error: Invalid interval")
+            return
+
+        ProcessTop(interval, sort_by).run()
 
     def _process_tree(self, args):
         """Display process tree"""
-        def get_children(pid):
-            try:
-                proc = psutil.Process(pid)
-                children = proc.children(recursive=True)
-                return {
-                    'name': proc.name(),
-                    'pid': pid,
-                    'cpu_percent': proc.cpu_percent(),
-                    'memory_percent': proc.memory_percent(),
-                    'children': [get_children(child.pid) for child in children]
-                }
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                return None
-
-        def print_tree(node, level=0):
-            if not node:
-                return
-            print(f"{'  ' * level}├─ {node['name']} (PID: {node['pid']}, "
-                  f"CPU: {node['cpu_percent']:.1f}%, MEM: {node['memory_percent']:.1f}%)")
-            for child in node['children']:
-                print_tree(child, level + 1)
+        pid = None
+        interval = None
+        collapse = True
+        try:
+            i = 0
+            while i < len(args):
+                if args[i] == '--interval' and i + 1 < len(args):
+                    interval = float(args[i + 1].rstrip('s'))
+                    i += 1
+                elif args[i] == '--no-collapse':
+                    collapse = False
+                else:
+                    pid = int(args[i])
+                i += 1
+        except ValueError:
+            print("Error: Invalid PID or interval")
+            return
 
         try:
-            if args:
-                pid = int(args[0])
-            else:
-                pid = 1  # Root process
+            # One snapshot; CPU is the lifetime average unless an interval is sampled
+            records = ProcessSampler().snapshot(interval) if interval else snapshot_records()
+            tree = ProcessTree(records)
+            if pid is not None and pid not in tree.records:
+                print(f"Error: Unable to access process {pid}")
+                return
 
-            tree = get_children(pid)
-            if tree:
+            if pid is not None:
                 print(f"\nProcess Tree (starting from PID {pid}):")
-                print_tree(tree)
             else:
-                print(f"Error: Unable to access process {pid}")
-                
-        except ValueError:
-            print("Error: Invalid PID")
+                print(f"\nProcess Tree ({len(tree.records)} processes):")
+            for line in tree.render([pid] if pid is not None else None, collapse):
+                print(line)
+
         except Exception as e:
             print(f"Error creating process tree: {e}")
-            
-            
+
+    def _record(self, args):
+        """Sample every process in the background into a metrics file"""
+        if args and args[0] == '--stop':
+            for stop in list(self.recorders):
+                stop.set()
+            print(f"Stopping {len(self.recorders)} recorders")
+            return
+
+        options = self._parse_options(args, ('--interval', '--out', '--duration'))
+        if options is None:
+            return
+        try:
+            interval = _parse_duration(options.get('--interval', str(DEFAULT_CONFIG.get('process_record_interval', 5))))
+            duration = _parse_duration(options['--duration']) if '--duration' in options else None
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        path = os.path.expanduser(options.get('--out', str(self._default_metrics_file())))
+
+        try:
+            # Opened here so a bad path is reported at once rather than from the job
+            writer = MetricsWriter(path)
+        except (OSError, ValueError) as e:
+            print(f"Error opening {path}: {e}")
+            return
+
+        stop = threading.Event()
+        self.recorders.append(stop)
+        self.shell.jobs.submit(f"process record --interval {interval:g}s --out {path}",
+                               self._run_recorder, writer, interval, duration, stop)
+
+    def _run_recorder(self, writer, interval, duration, stop):
+        sampler = ProcessSampler(fds=True)
+        sampler.prime()
+        start = time.monotonic()
+        next_sample = start + interval
+        try:
+            while not stop.is_set():
+                # Short waits so an interrupt from fg/Ctrl+C is seen promptly
+                if stop.wait(min(0.5, max(0.0, next_sample - time.monotonic()))):
+                    break
+                now = time.monotonic()
+                if now < next_sample:
+                    continue
+                writer.write(time.time(), sampler.sample())
+                # Skip missed ticks instead of sampling in a burst to catch up
+                next_sample = max(next_sample + interval, now + interval / 2)
+                if duration is not None and now - start >= duration:
+                    break
+        finally:
+            writer.close()
+            self.recorders.remove(stop)
+            print(f"Recorded {writer.frames} samples to {writer.path}")
+
+    def _query(self, args):
+        """Show the top consumers recorded between two times"""
+        options = self._parse_options(args, ('--from', '--to', '--sort', '-n', '--file'))
+        if options is None:
+            return
+        sort_by = options.get('--sort', 'cpu')
+        if sort_by not in QUERY_SORTS:
+            print(f"Invalid sort option. Use one of: {', '.join(QUERY_SORTS)}")
+            return
+        span = self._open_metrics(options)
+        if span is None:
+            return
+        reader, start, end, limit = span
+
+        try:
+            frames, rows = reader.top(start, end, sort_by, limit)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            return
+        if not frames:
+            print(f"No samples between {_format_time(start)} and {_format_time(end)}")
+            return
+
+        print(f"\nTop consumers by {sort_by} from {_format_time(start)} to {_format_time(end)} ({frames} samples)")
+        print(f"{'PID':>7} {'AVG CPU%':>9} {'PEAK RSS':>10} {'IO':>10} {'FDS':>5} {'Name':<30}")
+        print("-" * 76)
+        for pid, name, cpu, rss, io, fds in rows:
+            print(f"{pid:>7} {cpu:>9.1f} {humanize.naturalsize(rss):>10} {humanize.naturalsize(io):>10} "
+                  f"{fds if fds >= 0 else '-':>5} {name[:30]:<30}")
+
+    def _replay(self, args):
+        """Print the recorded samples between two times, busiest processes first"""
+        options = self._parse_options(args, ('--from', '--to', '-n', '--file'))
+        if options is None:
+            return
+        span = self._open_metrics(options, default_limit=5)
+        if span is None:
+            return
+        reader, start, end, limit = span
+
+        previous = {}
+        last_time = None
+        shown = 0
+        try:
+            for timestamp, state in reader.frames(start, end):
+                elapsed = timestamp - last_time if last_time is not None else 0
+                print(f"\n{_format_time(timestamp)}  {len(state)} processes")
+                for pid, (name, cpu, rss, io, fds) in heapq.nlargest(limit, state.items(),
+                                                                     key=lambda item: item[1][1]):
+                    before = previous.get(pid)
+                    rate = (io - before[3]) / elapsed if before is not None and elapsed > 0 else 0
+                    print(f"  {pid:>7} {cpu / 10:>6.1f}% {humanize.naturalsize(rss * 1024):>10} "
+                          f"{humanize.naturalsize(max(rate, 0)):>10}/s  {name[:30]}")
+                previous = state
+                last_time = timestamp
+                shown += 1
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            return
+        if not shown:
+            print(f"No samples between {_format_time(start)} and {_format_time(end)}")
+
+    def _open_metrics(self, options, default_limit=10):
+        """Return (reader, start, end, limit) for query/replay, or None after printing the problem"""
+        path = os.path.expanduser(options.get('--file', str(self._default_metrics_file())))
+        try:
+            reader = MetricsReader(path)
+            span = reader.span()
+            if span is None:
+                print(f"{path} has no samples yet")
+                return None
+            start = _parse_time(options['--from']) if '--from' in options else span[0]
+            end = _parse_time(options['--to']) if '--to' in options else span[1]
+            limit = int(options.get('-n', default_limit))
+        except FileNotFoundError:
+            print(f"Error: {path} not found (start one with: process record)")
+            return None
+        except ValueError as e:
+            print(f"Error: {e}")
+            return None
+        return reader, start, end, limit
+
+    def _default_metrics_file(self):
+        return self.shell.config_dir / "process_metrics.bin"
+
+    def _parse_options(self, args, names):
+        """Parse `--name value` pairs; None after printing the problem"""
+        options = {}
+        for i in range(0, len(args), 2):
+            if args[i] not in names or i + 1 >= len(args):
+                print(f"Unknown or incomplete option: {args[i]}")
+                return None
+            options[args[i]] = args[i + 1]
+        return options
+
+
+def _parse_duration(text):
+    """Seconds in `text`: 30, 5s, 10m, 2h or 1d"""
+    unit = DURATION_UNITS.get(text[-1:], None)
+    number = text[:-1] if unit else text
+    try:
+        seconds = float(number) * (unit or 1)
+    except ValueError:
+        raise ValueError(f"Invalid duration: {text}")
+    if seconds <= 0:
+        raise ValueError(f"Invalid duration: {text}")
+    return seconds
+
+
+def _parse_time(text):
+    """Timestamp for now, -2h style offsets, HH:MM[:SS] (most recent) or an ISO date and time"""
+    now = datetime.now()
+    if text == 'now':
+        return now.timestamp()
+    if text.startswith('-'):
+        return now.timestamp() - _parse_duration(text[1:])
+    for layout in ('%H:%M', '%H:%M:%S'):
+        try:
+            clock = datetime.strptime(text, layout).time()
+        except ValueError:
+            continue
+        moment = datetime.combine(now.date(), clock)
+        if moment > now:
+            moment -= timedelta(days=1)
+        return moment.timestamp()
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid time: {text}")
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
 # process list --sort cpu
+# process list --sort io -n 10 --interval 1
 # process kill 1234
 # process info 5678
-# process top
-# process tree
\ No newline at end of file
+# process top --interval 1 --sort mem
+# process tree
+# process tree 1 --interval 1 --no-collapse
+# process record --interval 5s --out ~/metrics.bin
+# process query --from 02:55 --to 03:10 --sort cpu --file ~/metrics.bin
+# process replay --from -10m -n 3
\ No newline at end of file
@@ -1,4 +1,6 @@
 import os
+from src.utils.ignore_rules import IgnoreRules
+from src.config.settings import DEFAULT_CONFIG
 
 class TreeView:
     def __init__(self, shell):
@@ -6,8 +8,13 @@ class TreeView:
 
     def tree_command(self, args):
         """Display directory structure in a tree-like format"""
+        ignore = DEFAULT_CONFIG['respect_ignore_files']
+        if '--no-ignore' in args:
+            ignore = False
+            args = [arg for arg in args if arg != '--no-ignore']
+
         # Determine root directory
-        root_dir = args[0] if args else '.'
+        root_dir = args[0] if args and args[0] != '-d' else '.'
 
         # Limit depth to prevent infinite recursion
         max_depth = 3
@@ -17,6 +24,10 @@ class TreeView:
             except (ValueError, IndexError):
                 print("Invalid depth specified")
                 return
+            if args.index('-d') == 0 and len(args) > 2:
+                root_dir = args[2]
+
+        rules = IgnoreRules(root_dir) if ignore else None
 
         def list_files(directory, prefix='', depth=0):
             if depth > max_depth:
@@ -25,6 +36,11 @@ class TreeView:
             try:
                 contents = os.listdir(directory)
                 contents.sort()
+                if rules is not None:
+                    # Ignored entries are hidden and never descended into
+                    contents = [item for item in contents
+                                if not rules.ignored(os.path.join(directory, item),
+                                                     os.path.isdir(os.path.join(directory, item)))]
 
                 for i, item in enumerate(contents):
                     path = os.path.join(directory, item)
@@ -3,6 +3,24 @@
 # Default shell configuration
 DEFAULT_CONFIG = {
     'history_limit': 500,
+    'job_workers': 8,  # Worker threads for background builtin jobs
+    'search_walk_workers': 8,  # Parallel directory readers used by search
+    'search_jobs': 1,  # Content-matching processes for search (-j)
+    'search_batch_size': 64,  # Files per task sent to a search worker process
+    'search_max_file_size': 0,  # Largest file search -c reads, in bytes (0 = no limit)
+    'content_index_max_file_size': 1024 * 1024,  # Larger files are left out of the trigram index
+    'disk_scan_workers': 8,  # Threads listing directories for disk
+    'encrypt_workers': 0,  # Processes for encrypt/decrypt (0 = one per core)
+    'encrypt_kdf': 'scrypt',  # Password KDF for new files: pbkdf2, scrypt or argon2id
+    'encrypt_kdf_target_ms': 500,  # Latency encrypt --bench calibrates the KDFs to
+    'encrypt_key_ttl': 300,  # Seconds a derived key stays cached in memory (0 = never cache)
+    'respect_ignore_files': True,  # search and tree skip ignored paths (--no-ignore overrides)
+    'disk_respect_ignore_files': False,  # disk counts every byte unless this or disk --ignore is set
+    'ignore_files': ['.gitignore', '.ignore', '.nexusignore'],  # Read in every directory walked
+    'ignore_always': ['.git/', '.hg/', '.svn/'],  # Pruned whenever ignore files are honoured
+    'process_sample_interval': 0.5,  # Seconds process list/tree measure CPU over
+    'process_top_interval': 2.0,  # Seconds between process top refreshes
+    'process_record_interval': 5,  # Default seconds between process record samples
     'config_directory': '~/.mycmd',
     'default_aliases': {
         'll': 'ls -l',
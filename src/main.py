@@ -1,12 +1,39 @@
 import sys
 import os
+import time
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.shell import EnhancedShell
+def startup_profile():
+    """Report how long startup takes and what each lazy command module costs to import"""
+    start = time.perf_counter()
+    from src.shell import EnhancedShell
+    import_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    shell = EnhancedShell()
+    init_time = time.perf_counter() - start
+
+    print("\nStartup Profile:")
+    print("-" * 70)
+    print(f"{'import src.shell':50} {import_time * 1000:>10.1f} ms")
+    print(f"{'EnhancedShell()':50} {init_time * 1000:>10.1f} ms")
+    print(f"{'Total startup':50} {(import_time + init_time) * 1000:>10.1f} ms")
+
+    print("\nDeferred command modules (paid on first use):")
+    print("-" * 70)
+    for module_path, seconds, error in shell.command_registry.profile():
+        if error is not None:
+            print(f"{module_path:50} {'failed':>13}  ({error})")
+        else:
+            print(f"{module_path:50} {seconds * 1000:>10.1f} ms")
 
 def main():
     """Main entry point for the Enhanced Shell"""
+    if '--startup-profile' in sys.argv[1:]:
+        return startup_profile()
+
     try:
+        from src.shell import EnhancedShell
         shell = EnhancedShell()
         shell.interactive_shell()
     except Exception as e:
@@ -1,11 +1,9 @@
 import os
-import shlex
 import shutil
 import subprocess
 import json
 import sys
 from pathlib import Path
-import time
 from typing import Iterable
 from prompt_toolkit import prompt
 from prompt_toolkit.history import FileHistory
@@ -13,24 +11,21 @@ from prompt_toolkit.key_binding import KeyBindings
 from prompt_toolkit.formatted_text import HTML
 from prompt_toolkit.completion import Completer, Completion
 from prompt_toolkit.document import Document
-from src.commands.file_search import FileSearch
-from src.commands.file_encryption import FileEncryption
-from src.commands.text_editor import TextEditor
-from src.commands.tree_view import TreeView
-from src.commands.weather_command import WeatherCommand
 from src.utils.plugin_manager import PluginManager
 from src.utils.script_interpreter import ScriptInterpreter
-from src.commands.disk_analyzer import DiskAnalyzer
-from src.commands.network_utils import NetworkUtils
-from src.commands.process_manager import ProcessManager
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.commands.builtin_commands import BuiltinCommands
 from src.commands.file_operations import FileOperations
-from src.commands.system_commands import SystemCommands
-from src.utils.file_redirection import handle_file_redirection
-from src.utils.prompt_config import PromptConfigManager
+from src.utils.file_redirection import is_operator, tokenize
+from src.utils.pipeline import PipelineExecutor
+from src.utils.job_control import JobControl
+from src.utils.command_registry import CommandRegistry
+from src.utils.command_index import CommandIndex
+from src.utils.stream_relay import run_streaming
+from src.utils.history_store import HistoryStore
+from src.config.settings import DEFAULT_CONFIG
 
 class EnhancedShell:
     def __init__(self):
@@ -41,27 +36,22 @@ class EnhancedShell:
         self.version = "1.0.0"
 
         self.history_file = self.config_dir / "history.json"
+        self.history_journal_file = self.config_dir / "history.journal"
         self.interactive_history_file = self.config_dir / "interactive_history.txt"
         
-        # Ensure history files exist
-        self.history_file.touch(exist_ok=True)
+        # The interactive history file is owned by prompt_toolkit's FileHistory
         self.interactive_history_file.touch(exist_ok=True)
         
-        # Create command handlers after initializing command_handlers
+        # Core handlers are cheap and always needed
         self.builtin_commands = BuiltinCommands(self)
         self.file_operations = FileOperations(self)
-        self.system_commands = SystemCommands(self)
-        self.prompt_config_manager = PromptConfigManager(self)
-        self.text_editor = TextEditor(self)
-        self.file_encryption = FileEncryption(self)
-        self.weather_command = WeatherCommand(self)
-        self.tree_view = TreeView(self)
         self.plugin_manager = PluginManager(self)
         self.script_interpreter = ScriptInterpreter(self)
-        self.disk_analyzer = DiskAnalyzer(self)
-        self.network_utils = NetworkUtils(self)
-        self.process_manager = ProcessManager(self)
-        self.file_search = FileSearch(self)
+
+        self.jobs = JobControl(self, max_workers=DEFAULT_CONFIG['job_workers'])
+
+        # Everything else is imported the first time its command runs
+        self.command_registry = CommandRegistry(self)
 
         # Initialize command_handlers dictionary
         self.command_handlers = {
@@ -82,28 +72,39 @@ class EnhancedShell:
             'type': self.builtin_commands.type_command,
             'create': self.builtin_commands.create_command,
             'exit': self.builtin_commands.exit_command,
-            'prompt_config': self.prompt_config_manager.prompt_config_command,
-            'sysinfo': self.system_commands.sysinfo_command,
-            'edit': self.text_editor.edit_command,
-            'encrypt': self.file_encryption.encrypt_command,
-            'decrypt': self.file_encryption.decrypt_command,
-            'weather': self.weather_command.weather_command,
-            'tree': self.tree_view.tree_command,
             'plugin': self.plugin_manager.plugin_command,
             'run': self.script_interpreter.run_script,
-            'disk': self.disk_analyzer.disk_usage_command,
-            'network': self.network_utils.network_command,
-            'process': self.process_manager.process_command,
-            'search': self.file_search.search_command
+            'jobs': self.jobs.jobs_command,
+            'fg': self.jobs.fg_command,
+            'bg': self.jobs.bg_command,
+            'wait': self.jobs.wait_command,
         }
+        self.command_handlers.update(self.command_registry.handlers())
+
+        # Generator-based handlers used when a builtin runs inside a pipeline
+        self.stream_handlers = {
+            'echo': self.builtin_commands.echo_stream,
+            'cat': self.file_operations.cat_stream,
+            'ls': self.file_operations.ls_stream,
+        }
+        self.stream_handlers.update(self.command_registry.stream_handlers())
+        self.pipeline = PipelineExecutor(self)
         
         # Load history and initialize other attributes
-        self.command_history = self.load_history()
+        self.history = HistoryStore(
+            str(self.history_journal_file),
+            limit=DEFAULT_CONFIG['history_limit'],
+            legacy_file=str(self.history_file)
+        )
+        self.command_history = self.history.entries
+        # Built once so prompt() does not re-read the file on every command
+        self.prompt_history = FileHistory(str(self.interactive_history_file))
         self.shell_builtins = [
             "echo", "exit", "type", "pwd", "cd", "create", "ls", 
             "mkdir", "rm", "cat", "touch", "whoami", "date", 
             "system", "help", "alias", "history", "sysinfo",
-            "encrypt","decrypt","edit","weather","tree","plugin"
+            "encrypt","decrypt","edit","weather","tree","plugin",
+            "jobs", "fg", "bg", "wait"
         ]
         self.aliases = self.load_aliases()
         
@@ -111,10 +112,12 @@ class EnhancedShell:
         self.kb = KeyBindings()
         self.setup_key_bindings()
         
-        # Cache for executables to improve performance
-        self._executable_cache = None
-        self._last_cache_update = 0
-        self._cache_ttl = 60  # Cache TTL in seconds
+        # Exit status of the last command ($?)
+        self.last_exit_status = 0
+
+        # Completion index; PATH is scanned in the background
+        self.command_index = CommandIndex(self, ttl=60)
+        self.command_index.executables.refresh_async(force=True)
 
     def get_completions(self, document: Document, complete_event) -> Iterable[Completion]:
         """Implementation of the Completer interface"""
@@ -133,35 +136,20 @@ class EnhancedShell:
 
     def _get_command_completions(self, word_before_cursor: str) -> Iterable[Completion]:
         """Get completions for commands, including builtins and aliases"""
-        # Update executable cache if needed
-        self._update_executable_cache()
-        
-        # Complete shell builtins
-        for cmd in self.shell_builtins:
-            if cmd.startswith(word_before_cursor):
-                yield Completion(
-                    cmd,
-                    start_position=-len(word_before_cursor),
-                    display_meta='Shell builtin'
-                )
-
-        # Complete aliases
-        for alias in self.aliases:
-            if alias.startswith(word_before_cursor):
-                yield Completion(
-                    alias,
-                    start_position=-len(word_before_cursor),
-                    display_meta=f'Alias: {self.aliases[alias]}'
-                )
-
-        # Complete executables from cache
-        for executable in self._executable_cache or set():
-            if executable.startswith(word_before_cursor):
-                yield Completion(
-                    executable,
-                    start_position=-len(word_before_cursor),
-                    display_meta='Executable'
-                )
+        for name, kind in self.command_index.complete(word_before_cursor):
+            if kind == 'builtin':
+                meta = 'Shell builtin'
+            elif kind == 'alias':
+                meta = f'Alias: {self.aliases.get(name, "")}'
+            elif kind == 'plugin':
+                meta = 'Plugin command'
+            else:
+                meta = 'Executable'
+            yield Completion(
+                name,
+                start_position=-len(word_before_cursor),
+                display_meta=meta
+            )
 
     def _get_path_completions(self, word_before_cursor: str) -> Iterable[Completion]:
         """Get completions for paths (files and directories)"""
@@ -197,29 +185,6 @@ class EnhancedShell:
         except (OSError, PermissionError):
             return
 
-    def _update_executable_cache(self):
-        """Update the cache of executable files if it's expired"""
-        current_time = time.time()
-        if (self._executable_cache is None or 
-            current_time - self._last_cache_update > self._cache_ttl):
-            self._executable_cache = self._get_executables()
-            self._last_cache_update = current_time
-
-    def _get_executables(self) -> set:
-        """Get executable files from PATH"""
-        executables = set()
-        for path in os.environ.get("PATH", "").split(os.pathsep):
-            if not path:
-                continue
-            try:
-                for item in os.listdir(path):
-                    full_path = os.path.join(path, item)
-                    if os.path.isfile(full_path) and os.access(full_path, os.X_OK):
-                        executables.add(item)
-            except (FileNotFoundError, PermissionError):
-                continue
-        return executables
-    
     def setup_key_bindings(self):
         @self.kb.add('up')
         def _(event):
@@ -252,63 +217,9 @@ class EnhancedShell:
             print(f"Error loading aliases: {e}")
             return {}
 
-    def save_history(self, command):
-        """Save command to history"""
-        try:
-            history = self.load_history()
-            history.append(command)
-            with self.history_file.open('w') as f:
-                json.dump(history[-1000:], f)  # Keep last 1000 commands
-        except Exception as e:
-            print(f"Error saving history: {e}")
-
-
-    def load_history(self):
-        """Load command history from file with proper error handling"""
-        combined_history = []
-        
-        # Load JSON history
-        try:
-            if self.history_file.exists():
-                with self.history_file.open('r') as f:
-                    json_history = json.load(f)
-                    if isinstance(json_history, list):
-                        combined_history.extend(json_history)
-        except json.JSONDecodeError:
-            print("Warning: History file is corrupted. Starting fresh.")
-        except Exception as e:
-            print(f"Error loading JSON history: {e}")
-
-        # Load text history
-        try:
-            if self.interactive_history_file.exists():
-                with self.interactive_history_file.open('r') as f:
-                    text_history = [line.strip() for line in f if line.strip()]
-                    combined_history.extend(text_history)
-        except Exception as e:
-            print(f"Error loading text history: {e}")
-
-        # Deduplicate while maintaining order
-        seen = set()
-        return [x for x in combined_history if not (x in seen or seen.add(x))]
-
     def save_history(self):
-        """Save command history to files with proper error handling"""
-        recent_history = self.command_history[-500:]  # Keep last 500 commands
-        
-        # Save JSON history
-        try:
-            with self.history_file.open('w') as f:
-                json.dump(recent_history, f, indent=2)
-        except Exception as e:
-            print(f"Error saving JSON history: {e}")
-            
-        # Save text history
-        try:
-            with self.interactive_history_file.open('w') as f:
-                f.write('\n'.join(recent_history))
-        except Exception as e:
-            print(f"Error saving text history: {e}")
+        """Flush pending history records to the journal"""
+        self.history.flush()
 
     def parse_history_shortcut(self, command):
         """Parse and execute history shortcuts with bounds checking"""
@@ -316,13 +227,14 @@ class EnhancedShell:
             return None
             
         if command == '!!':
-            return self.command_history[-1] if self.command_history else None
+            return self.history.last()
             
         if command.startswith('!') and command[1:].isdigit():
-            index = int(command[1:]) - 1
-            if 0 <= index < len(self.command_history):
-                return self.command_history[index]
-            print(f"History index {index + 1} out of range")
+            number = int(command[1:])
+            entry = self.history.get(number)
+            if entry is not None:
+                return entry
+            print(f"History index {number} out of range")
         
         return None
 
@@ -331,9 +243,8 @@ class EnhancedShell:
         if not command or not command.strip():
             return
 
-        # Add to history and save
-        self.command_history.append(command)
-        self.save_history()
+        # Add to history; the journal write is batched
+        self.history.append(command)
 
         # Handle aliases
         parts = command.split(maxsplit=1)
@@ -343,7 +254,7 @@ class EnhancedShell:
             command = f"{alias_cmd} {remaining}".strip()
 
         try:
-            parts = shlex.split(command)
+            parts = tokenize(command)
         except ValueError as e:
             print(f"Error parsing command: {e}")
             return
@@ -351,43 +262,53 @@ class EnhancedShell:
         if not parts:
             return
 
+        # Expand the exit status of the previous command
+        parts = [str(self.last_exit_status) if part == '$?' else part for part in parts]
+
+        # A trailing & runs the command as a background job
+        ampersands = [i for i, part in enumerate(parts) if is_operator(part, '&')]
+        if ampersands:
+            if ampersands != [len(parts) - 1] or len(parts) == 1:
+                print("Error parsing command: syntax error near '&'")
+                self.last_exit_status = 2
+                return self.last_exit_status
+            return self.jobs.start(command.rstrip().rstrip('&').strip(), parts[:-1])
+
+        self.last_exit_status = self.execute_tokens(parts)
+        return self.last_exit_status
+
+    def execute_tokens(self, parts):
+        """Run a tokenized command line and return its exit status"""
         program = parts[0]
         args = parts[1:]
 
-        # Handle file redirection
-        if any(redirect in parts for redirect in ['>', '>>']):
+        # Pipelines and file redirection
+        if any(is_operator(part) for part in parts):
             try:
-                return handle_file_redirection(parts)
+                return self.pipeline.run(parts)
             except Exception as e:
-                print(f"Error handling file redirection: {e}")
-                return
+                print(f"Error running pipeline: {e}")
+                return 1
 
         # Execute command using command_handlers
         if program in self.command_handlers:
             try:
-                return self.command_handlers[program](args)
+                result = self.command_handlers[program](args)
+                return result if isinstance(result, int) else 0
             except Exception as e:
                 print(f"Error executing {program}: {e}")
+                return 1
         else:
             return self.execute_external_command(program, args)
 
-
     def execute_external_command(self, program, args):
         """Execute external commands with proper path resolution and error handling"""
         try:
             # Use shutil.which to find executable in PATH
             executable = shutil.which(program)
             if executable:
-                result = subprocess.run(
-                    [executable] + args,
-                    capture_output=True,
-                    text=True
-                )
-                if result.stdout:
-                    print(result.stdout, end='')
-                if result.stderr:
-                    print(result.stderr, end='', file=sys.stderr)
-                return result.returncode
+                # Output streams straight through
+                return run_streaming([executable] + args)
             else:
                 print(f"{program}: command not found")
                 return 127  # Command not found exit code
@@ -413,6 +334,9 @@ class EnhancedShell:
 
         while True:
             try:
+                # Announce background jobs that finished while we were busy
+                self.jobs.report_finished()
+
                 current_dir = os.getcwd()
                 prompt_text = HTML(f'<ansired>➜</ansired> <ansigreen>{current_dir}</ansigreen> $ ')
                 
@@ -421,7 +345,7 @@ class EnhancedShell:
                     completer=self,
                     complete_in_thread=True,
                     key_bindings=self.kb,  # Use the configured key bindings
-                    history=FileHistory(str(self.interactive_history_file)),
+                    history=self.prompt_history,
                     multiline=False,
                     validate_while_typing=False,
                     complete_while_typing=True
@@ -439,6 +363,7 @@ class EnhancedShell:
                 # Handle exit commands
                 if command.lower() in ['exit', 'quit', 'q']:
                     print("Goodbye!")
+                    self.history.close()
                     break
 
                 # Execute command
@@ -449,6 +374,7 @@ class EnhancedShell:
                 continue
             except EOFError:
                 print("\nGoodbye!")
+                self.history.close()
                 break
             except Exception as e:
                 print(f"Shell error: {e}")
@@ -0,0 +1,143 @@
+import os
+import sys
+import time
+import threading
+from bisect import bisect_left
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class PrefixIndex:
+    """Sorted name array answering prefix queries with bisect"""
+
+    def __init__(self, names=()):
+        self.names = sorted(set(names))
+
+    def __len__(self):
+        return len(self.names)
+
+    def prefix(self, prefix):
+        """Yield names starting with `prefix` in sorted order"""
+        names = self.names
+        i = bisect_left(names, prefix)
+        while i < len(names) and names[i].startswith(prefix):
+            yield names[i]
+            i += 1
+
+
+class ExecutableIndex:
+    """Executables on PATH, rescanned per directory in a background thread"""
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.index = PrefixIndex()
+        self._dirs = {}  # directory -> (mtime_ns, frozenset of names)
+        self._last_refresh = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def prefix(self, prefix):
+        return self.index.prefix(prefix)
+
+    def refresh_async(self, force=False):
+        """Start a background rescan if the cache expired; never blocks the caller"""
+        if not force and time.time() - self._last_refresh <= self.ttl:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._last_refresh = time.time()
+        self._thread = threading.Thread(target=self.refresh, daemon=True)
+        self._thread.start()
+
+    def refresh(self):
+        """Rescan PATH directories whose mtime changed and rebuild the index"""
+        with self._lock:
+            path_dirs = [d for d in os.environ.get("PATH", "").split(os.pathsep) if d]
+            changed = False
+            dirs = {}
+
+            for directory in dict.fromkeys(path_dirs):
+                try:
+                    mtime = os.stat(directory).st_mtime_ns
+                except OSError:
+                    changed = changed or directory in self._dirs
+                    continue
+
+                cached = self._dirs.get(directory)
+                if cached and cached[0] == mtime:
+                    dirs[directory] = cached
+                    continue
+
+                dirs[directory] = (mtime, self._scan_directory(directory))
+                changed = True
+
+            if changed or dirs.keys() != self._dirs.keys():
+                names = set()
+                for _, dir_names in dirs.values():
+                    names.update(dir_names)
+                self.index = PrefixIndex(names)
+            self._dirs = dirs
+            self._last_refresh = time.time()
+
+    def _scan_directory(self, directory):
+        """Return the executable file names in one directory"""
+        names = set()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        # is_file() uses the cached d_type for non-symlinks
+                        if entry.is_file() and os.access(entry.path, os.X_OK):
+                            names.add(entry.name)
+                    except OSError:
+                        continue
+        except (FileNotFoundError, PermissionError, NotADirectoryError):
+            pass
+        return frozenset(names)
+
+
+class CommandIndex:
+    """Completion index over builtins, aliases, plugin commands and executables"""
+
+    def __init__(self, shell, ttl=60):
+        self.shell = shell
+        self.executables = ExecutableIndex(ttl)
+        self.builtins = PrefixIndex()
+        self.aliases = PrefixIndex()
+        self.plugins = PrefixIndex()
+        self._signature = None
+
+    def invalidate(self):
+        """Force the small in-process indexes to rebuild on the next query"""
+        self._signature = None
+
+    def _plugin_commands(self):
+        commands = set()
+        for info in self.shell.plugin_manager.loaded_plugins.values():
+            commands.update(info.get('commands', []))
+        return commands
+
+    def _rebuild(self):
+        shell = self.shell
+        signature = (len(shell.command_handlers), len(shell.aliases),
+                     len(shell.plugin_manager.loaded_plugins))
+        if signature == self._signature:
+            return
+        plugin_commands = self._plugin_commands()
+        self.builtins = PrefixIndex(
+            (set(shell.shell_builtins) | set(shell.command_handlers)) - plugin_commands
+        )
+        self.aliases = PrefixIndex(shell.aliases)
+        self.plugins = PrefixIndex(plugin_commands)
+        self._signature = signature
+
+    def complete(self, prefix):
+        """Yield (name, kind) pairs for every command starting with `prefix`"""
+        self._rebuild()
+        self.executables.refresh_async()
+        for name in self.builtins.prefix(prefix):
+            yield name, 'builtin'
+        for name in self.aliases.prefix(prefix):
+            yield name, 'alias'
+        for name in self.plugins.prefix(prefix):
+            yield name, 'plugin'
+        for name in self.executables.prefix(prefix):
+            yield name, 'executable'
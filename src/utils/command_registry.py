@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import importlib
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# command -> (module path, handler class, method)
+LAZY_COMMANDS = {
+    'prompt_config': ('src.utils.prompt_config', 'PromptConfigManager', 'prompt_config_command'),
+    'sysinfo': ('src.commands.system_commands', 'SystemCommands', 'sysinfo_command'),
+    'edit': ('src.commands.text_editor', 'TextEditor', 'edit_command'),
+    'encrypt': ('src.commands.file_encryption', 'FileEncryption', 'encrypt_command'),
+    'decrypt': ('src.commands.file_encryption', 'FileEncryption', 'decrypt_command'),
+    'weather': ('src.commands.weather_command', 'WeatherCommand', 'weather_command'),
+    'tree': ('src.commands.tree_view', 'TreeView', 'tree_command'),
+    'disk': ('src.commands.disk_analyzer', 'DiskAnalyzer', 'disk_usage_command'),
+    'network': ('src.commands.network_utils', 'NetworkUtils', 'network_command'),
+    'process': ('src.commands.process_manager', 'ProcessManager', 'process_command'),
+    'search': ('src.commands.file_search', 'FileSearch', 'search_command'),
+}
+
+# command -> generator method used when the command runs inside a pipeline
+LAZY_STREAMS = {
+    'search': 'search_stream',
+}
+
+
+class LazyCommand:
+    """Callable placeholder that loads its handler on first call"""
+
+    def __init__(self, registry, command, stream=False):
+        self.registry = registry
+        self.command = command
+        self.stream = stream
+
+    def __call__(self, *args):
+        return self.registry.resolve(self.command, self.stream)(*args)
+
+    def __repr__(self):
+        module_path, class_name, method_name = self.registry.specs[self.command]
+        if self.stream:
+            method_name = self.registry.streams[self.command]
+        return f"<LazyCommand {self.command} -> {module_path}.{class_name}.{method_name}>"
+
+
+class CommandRegistry:
+    """Map command names to handler classes imported the first time they run"""
+
+    def __init__(self, shell, commands=None, streams=None):
+        self.shell = shell
+        self.specs = dict(commands if commands is not None else LAZY_COMMANDS)
+        self.streams = dict(streams if streams is not None else LAZY_STREAMS)
+        self._instances = {}
+        self.import_times = {}
+
+    def handlers(self):
+        """Return a command -> callable dict suitable for shell.command_handlers"""
+        return {command: LazyCommand(self, command) for command in self.specs}
+
+    def stream_handlers(self):
+        """Return a command -> callable dict of pipeline generator handlers"""
+        return {command: LazyCommand(self, command, stream=True) for command in self.streams}
+
+    def resolve(self, command, stream=False):
+        """Return the bound handler method for `command`, importing it if needed"""
+        module_path, class_name, method_name = self.specs[command]
+        if stream:
+            method_name = self.streams[command]
+        return getattr(self.get_instance(module_path, class_name), method_name)
+
+    def get_instance(self, module_path, class_name):
+        """Return the shared handler instance, creating it on first use"""
+        key = (module_path, class_name)
+        if key not in self._instances:
+            module = self._import(module_path)
+            self._instances[key] = getattr(module, class_name)(self.shell)
+        return self._instances[key]
+
+    def _import(self, module_path):
+        start = time.perf_counter()
+        module = importlib.import_module(module_path)
+        self.import_times.setdefault(module_path, time.perf_counter() - start)
+        return module
+
+    def profile(self):
+        """Import every registered module and return (module, seconds, error) rows"""
+        rows = []
+        for module_path in dict.fromkeys(spec[0] for spec in self.specs.values()):
+            if module_path in sys.modules:
+                rows.append((module_path, self.import_times.get(module_path, 0.0), None))
+                continue
+            try:
+                self._import(module_path)
+                rows.append((module_path, self.import_times[module_path], None))
+            except Exception as e:
+                rows.append((module_path, None, e))
+        return rows
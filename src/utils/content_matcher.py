@@ -0,0 +1,83 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CHUNK_SIZE = 1024 * 1024
+SAMPLE_SIZE = 8192
+
+class ContentMatcher:
+    """Find a literal byte string in files using fixed-size chunked reads.
+
+    Files are read into one reusable buffer, carrying the last
+    len(needle) - 1 bytes between chunks so matches spanning a chunk
+    boundary are found. Matching stops at the first hit, so memory use
+    stays flat regardless of file size.
+    """
+
+    def __init__(self, needle, max_size=None, include_binary=False, chunk_size=CHUNK_SIZE):
+        self.needle = needle.encode('utf-8') if isinstance(needle, str) else bytes(needle)
+        if not self.needle:
+            raise ValueError("Content pattern must not be empty")
+        self.max_size = max_size
+        self.include_binary = include_binary
+        self.chunk_size = max(chunk_size, len(self.needle))
+        self._overlap = len(self.needle) - 1
+
+    @staticmethod
+    def is_binary(sample):
+        """Treat data containing NUL bytes as binary, like grep does"""
+        return b'\0' in sample
+
+    def matches(self, path, size=None):
+        """Return True if the file at `path` contains the needle"""
+        if self.max_size is not None:
+            if size is None:
+                size = os.path.getsize(path)
+            if size > self.max_size:
+                return False
+
+        buf = bytearray(self._overlap + self.chunk_size)
+        view = memoryview(buf)
+        needle = self.needle
+        overlap = self._overlap
+        carried = 0
+        first = True
+
+        with open(path, 'rb', buffering=0) as f:
+            while True:
+                read = f.readinto(view[carried:])
+                if not read:
+                    return False
+                end = carried + read
+
+                if first:
+                    first = False
+                    if not self.include_binary and self.is_binary(bytes(view[:min(end, SAMPLE_SIZE)])):
+                        return False
+
+                if buf.find(needle, 0, end) != -1:
+                    return True
+
+                # Keep the tail that could start a match spanning into the next chunk
+                if overlap:
+                    carried = min(overlap, end)
+                    view[:carried] = view[end - carried:end]
+
+
+_batch_matchers = {}
+
+def match_batch(needle, max_size, include_binary, items):
+    """Process pool entry point: return indexes of (path, size) items containing needle"""
+    key = (needle, max_size, include_binary)
+    matcher = _batch_matchers.get(key)
+    if matcher is None:
+        matcher = _batch_matchers[key] = ContentMatcher(needle, max_size, include_binary)
+
+    hits = []
+    for index, (path, size) in enumerate(items):
+        try:
+            if matcher.matches(path, size):
+                hits.append(index)
+        except OSError:
+            continue
+    return hits
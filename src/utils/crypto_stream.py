@@ -0,0 +1,392 @@
+import io
+import os
+import sys
+import math
+import time
+import struct
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+try:
+    from cryptography.hazmat.primitives.kdf.argon2 import Argon2id  # cryptography >= 44
+except ImportError:
+    Argon2id = None
+try:
+    from argon2.low_level import hash_secret_raw, Type as Argon2Type  # optional argon2-cffi
+except ImportError:
+    hash_secret_raw = None
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MAGIC = b'NXENC'
+VERSION = 1
+CIPHER_AES_256_GCM = 1
+KDF_PBKDF2_SHA256 = 1
+KDF_SCRYPT = 2
+KDF_ARGON2ID = 3
+KDF_NAMES = {'pbkdf2': KDF_PBKDF2_SHA256, 'scrypt': KDF_SCRYPT, 'argon2id': KDF_ARGON2ID}
+
+CHUNK_SIZE = 1024 * 1024
+MIN_CHUNK_SIZE = 4 * 1024               # Headers with chunk sizes outside these bounds are rejected
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+TAG_SIZE = 16
+SALT_SIZE = 16
+NONCE_PREFIX_SIZE = 7
+PBKDF2_ITERATIONS = 100000
+
+# Parameters stored in the header for each KDF, and the values used until
+# `encrypt --bench` has calibrated them for this host
+KDF_FORMATS = {
+    KDF_PBKDF2_SHA256: '>I',   # iterations
+    KDF_SCRYPT: '>BHH',        # log2 N, r, p
+    KDF_ARGON2ID: '>III',      # passes, memory in KiB, lanes
+}
+DEFAULT_KDF_PARAMS = {
+    KDF_PBKDF2_SHA256: (PBKDF2_ITERATIONS,),
+    KDF_SCRYPT: (15, 8, 1),            # 32 MiB
+    KDF_ARGON2ID: (3, 64 * 1024, 4),   # 64 MiB
+}
+# Upper bounds on header KDF parameters, so a crafted file cannot make
+# decrypt run for hours or exhaust memory before the password is checked
+PBKDF2_MAX_ITERATIONS = 10 * 1000 * 1000
+SCRYPT_MAX_LOG_N = 22
+SCRYPT_MAX_R = 32
+SCRYPT_MAX_P = 16
+SCRYPT_MAX_MEMORY = 4 * 1024 ** 3       # Bytes; scrypt needs 128 * r * N
+SCRYPT_MAX_WORK = 1 << 25               # N * r * p, e.g. log2 N = 22 at r=8, p=1
+ARGON2_MAX_PASSES = 64
+ARGON2_MAX_LANES = 64
+ARGON2_MAX_MEMORY = 4 * 1024 * 1024     # KiB
+ARGON2_MAX_WORK = 16 * 1024 * 1024      # passes * memory in KiB, e.g. 4 GiB over 4 passes
+
+
+class Header:
+    """Versioned container header; its packed bytes are authenticated with every chunk.
+
+    Layout: magic, version, cipher, chunk size, KDF id and parameters,
+    KDF salt, per-file salt and the nonce prefix. The password gives a
+    master key through the KDF; each file's key is then derived from the
+    master key and the file salt with HKDF.
+    """
+
+    def __init__(self, kdf_id, kdf_params, kdf_salt, file_salt=None, nonce_prefix=None,
+                 chunk_size=CHUNK_SIZE, cipher=CIPHER_AES_256_GCM, version=VERSION):
+        self.version = version
+        self.cipher = cipher
+        self.chunk_size = chunk_size
+        self.kdf_id = kdf_id
+        self.kdf_params = kdf_params
+        self.kdf_salt = kdf_salt
+        self.file_salt = file_salt or os.urandom(SALT_SIZE)
+        self.nonce_prefix = nonce_prefix or os.urandom(NONCE_PREFIX_SIZE)
+
+    def pack(self):
+        return b''.join([
+            MAGIC,
+            struct.pack('>BBIBH', self.version, self.cipher, self.chunk_size, self.kdf_id, len(self.kdf_params)),
+            self.kdf_params,
+            struct.pack('>B', len(self.kdf_salt)),
+            self.kdf_salt,
+            self.file_salt,
+            self.nonce_prefix,
+        ])
+
+    @classmethod
+    def read(cls, f):
+        """Parse a header from file object `f`; raises ValueError if it is not a container"""
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not an encrypted container")
+        fixed = _read_exactly(f, struct.calcsize('>BBIBH'))
+        version, cipher, chunk_size, kdf_id, params_len = struct.unpack('>BBIBH', fixed)
+        if version != VERSION or cipher != CIPHER_AES_256_GCM:
+            raise ValueError(f"Unsupported container version {version} or cipher {cipher}")
+        if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(f"Unsupported chunk size {chunk_size}")
+        kdf_params = _read_exactly(f, params_len)
+        kdf_salt = _read_exactly(f, _read_exactly(f, 1)[0])
+        file_salt = _read_exactly(f, SALT_SIZE)
+        nonce_prefix = _read_exactly(f, NONCE_PREFIX_SIZE)
+        return cls(kdf_id, kdf_params, kdf_salt, file_salt, nonce_prefix, chunk_size, cipher, version)
+
+    def nonce(self, counter, last):
+        # STREAM construction: prefix || chunk counter || final-chunk flag
+        return self.nonce_prefix + struct.pack('>IB', counter, 1 if last else 0)
+
+
+def _read_exactly(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated header")
+    return data
+
+
+def is_container(path):
+    """True if `path` starts with the container magic"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def new_header(kdf_id=KDF_PBKDF2_SHA256, params=None, chunk_size=CHUNK_SIZE):
+    """Header for a new file using `kdf_id` with a fresh random salt"""
+    params = params or DEFAULT_KDF_PARAMS[kdf_id]
+    return Header(kdf_id, struct.pack(KDF_FORMATS[kdf_id], *params), os.urandom(SALT_SIZE),
+                  chunk_size=chunk_size)
+
+
+def kdf_params(header):
+    """Unpack the header's KDF parameters; ValueError if they are malformed or too costly"""
+    if header.kdf_id not in KDF_FORMATS:
+        raise ValueError(f"Unsupported key derivation function {header.kdf_id}")
+    try:
+        params = struct.unpack(KDF_FORMATS[header.kdf_id], header.kdf_params)
+    except struct.error:
+        raise ValueError("Malformed key derivation parameters")
+    if min(params) < 1:
+        raise ValueError("Key derivation parameters out of range")
+
+    if header.kdf_id == KDF_PBKDF2_SHA256:
+        if params[0] > PBKDF2_MAX_ITERATIONS:
+            raise ValueError("PBKDF2 iteration count out of range")
+    elif header.kdf_id == KDF_SCRYPT:
+        log_n, r, p = params
+        n = 1 << log_n
+        if (log_n > SCRYPT_MAX_LOG_N or r > SCRYPT_MAX_R or p > SCRYPT_MAX_P
+                or 128 * r * n > SCRYPT_MAX_MEMORY or n * r * p > SCRYPT_MAX_WORK):
+            raise ValueError("scrypt parameters out of range")
+    else:
+        passes, memory, lanes = params
+        if (passes > ARGON2_MAX_PASSES or lanes > ARGON2_MAX_LANES or memory < 8 * lanes
+                or memory > ARGON2_MAX_MEMORY or passes * memory > ARGON2_MAX_WORK):
+            raise ValueError("Argon2id parameters out of range")
+    return params
+
+
+def argon2_available():
+    return Argon2id is not None or hash_secret_raw is not None
+
+
+def derive_master_key(password, header):
+    """Run the header's password KDF; returns a bytearray so callers can zero it"""
+    params = kdf_params(header)
+    secret = password.encode()
+    if header.kdf_id == KDF_PBKDF2_SHA256:
+        (iterations,) = params
+        key = hashlib.pbkdf2_hmac('sha256', secret, header.kdf_salt, iterations)
+    elif header.kdf_id == KDF_SCRYPT:
+        log_n, r, p = params
+        n = 1 << log_n
+        key = hashlib.scrypt(secret, salt=header.kdf_salt, n=n, r=r, p=p,
+                             maxmem=256 * r * (n + p + 2), dklen=32)
+    else:
+        passes, memory, lanes = params
+        if Argon2id is not None:
+            key = Argon2id(salt=header.kdf_salt, length=32, iterations=passes, lanes=lanes,
+                           memory_cost=memory).derive(secret)
+        elif hash_secret_raw is not None:
+            key = hash_secret_raw(secret, header.kdf_salt, time_cost=passes, memory_cost=memory,
+                                  parallelism=lanes, hash_len=32, type=Argon2Type.ID)
+        else:
+            raise ValueError("Argon2id needs cryptography 44+ or the argon2-cffi package")
+    return bytearray(key)
+
+
+def calibrate_kdf(kdf_id, target):
+    """Return (params, seconds): the strongest parameters for `kdf_id` that take about `target` seconds here"""
+    def measure(params):
+        header = new_header(kdf_id, params)
+        start = time.perf_counter()
+        derive_master_key('calibration', header)
+        return time.perf_counter() - start
+
+    if kdf_id == KDF_PBKDF2_SHA256:
+        # Cost is linear in the iteration count
+        probe = 20000
+        iterations = max(probe, int(probe * target / measure((probe,)) // 1000 * 1000))
+        iterations = min(iterations, PBKDF2_MAX_ITERATIONS)
+        params = (iterations,)
+    elif kdf_id == KDF_SCRYPT:
+        # Time and memory double with each step of log2 N; keep r=8, p=1
+        base = 14
+        steps = int(math.log2(max(target / measure((base, 8, 1)), 1)))
+        params = (min(base + steps, SCRYPT_MAX_LOG_N), 8, 1)
+    else:
+        # Fix memory at 64 MiB where that fits the target, then add passes
+        memory = 64 * 1024
+        elapsed = measure((1, memory, 4))
+        while elapsed > target and memory > 8 * 1024:
+            memory //= 2
+            elapsed = measure((1, memory, 4))
+        params = (min(max(1, int(target / elapsed)), ARGON2_MAX_PASSES), memory, 4)
+    return params, measure(params)
+
+
+def file_key(master_key, header):
+    """Per-file AES-256 key from the master key and the file salt"""
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=header.file_salt,
+                info=b'nexusshell file key').derive(master_key)
+
+
+# Random-access chunk processing for parallel workers. Each frame's nonce
+# depends only on its index, so any range of frames can be processed on
+# its own and written at a fixed offset.
+
+TASK_CHUNKS = 16  # Chunks per worker task (16 MiB at the default chunk size)
+
+
+def frame_count(plaintext_size, chunk_size):
+    return max(1, -(-plaintext_size // chunk_size))
+
+
+def encrypted_size(plaintext_size, header_size, chunk_size):
+    return header_size + plaintext_size + frame_count(plaintext_size, chunk_size) * TAG_SIZE
+
+
+def plaintext_size(encrypted_size, header_size, chunk_size):
+    """Plaintext length of a container, or ValueError if the length is impossible"""
+    body = encrypted_size - header_size
+    frame_size = chunk_size + TAG_SIZE
+    frames = max(1, -(-body // frame_size))
+    if body - (frames - 1) * frame_size < TAG_SIZE:
+        raise ValueError("Encrypted file is truncated")
+    return body - frames * TAG_SIZE
+
+
+def process_chunks(decrypt, src_path, dst_path, master_key, header_bytes, start, stop, frames):
+    """Encrypt or decrypt frames start..stop-1 of one file in place; returns plaintext bytes.
+
+    Runs in worker processes: the key and header travel with the task and
+    the data never leaves the worker.
+    """
+    header = Header.read(io.BytesIO(header_bytes))
+    aead = AESGCM(file_key(master_key, header))
+    chunk_size = header.chunk_size
+    frame_size = chunk_size + TAG_SIZE
+    base = len(header_bytes)
+
+    total = 0
+    with open(src_path, 'rb') as src, open(dst_path, 'r+b') as dst:
+        for index in range(start, stop):
+            last = index == frames - 1
+            if decrypt:
+                src.seek(base + index * frame_size)
+                data = src.read(frame_size)
+                try:
+                    result = aead.decrypt(header.nonce(index, last), data, header_bytes)
+                except InvalidTag:
+                    raise ValueError("Decryption failed: wrong password or corrupted file")
+                dst.seek(index * chunk_size)
+                total += len(result)
+            else:
+                src.seek(index * chunk_size)
+                data = src.read(chunk_size)
+                if not last and len(data) != chunk_size:
+                    raise ValueError(f"{src_path} changed while it was being encrypted")
+                result = aead.encrypt(header.nonce(index, last), data, header_bytes)
+                dst.seek(base + index * frame_size)
+                total += len(data)
+            dst.write(result)
+    return total
+
+
+class CipherJob:
+    """One file to encrypt or decrypt with a ParallelCipher"""
+
+    def __init__(self, src, dst, master_key, header, decrypt=False):
+        self.src = src
+        self.dst = dst
+        self.master_key = master_key
+        self.header = header
+        self.decrypt = decrypt
+        self.bytes = 0
+        self.error = None
+
+
+class ParallelCipher:
+    """Encrypt or decrypt many files, and the chunks of large files, on a process pool.
+
+    Each output is preallocated as a .part file; workers fill in disjoint
+    frame ranges and the file is renamed into place once every range has
+    succeeded.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.processes = 1  # Processes the last run actually used
+
+    def run(self, jobs):
+        """Process every job, setting job.bytes or job.error; returns the jobs"""
+        tasks = []
+        try:
+            for job in jobs:
+                try:
+                    tasks.extend(self._prepare(job))
+                except (OSError, ValueError) as e:
+                    job.error = e
+
+            self.processes = min(self.workers, max(1, len(tasks)))
+            if self.processes == 1:
+                for job, args in tasks:
+                    self._record(job, lambda: process_chunks(*args))
+            else:
+                # spawn: the shell may be running threads, which fork does not copy safely
+                context = multiprocessing.get_context('spawn')
+                try:
+                    with ProcessPoolExecutor(max_workers=self.processes, mp_context=context) as pool:
+                        futures = [(job, pool.submit(process_chunks, *args)) for job, args in tasks]
+                        for job, future in futures:
+                            self._record(job, future.result)
+                except BrokenProcessPool as e:
+                    for job, _ in tasks:
+                        job.error = job.error or e
+        except BaseException:
+            # Ctrl+C: no half-written output is left behind
+            for job in jobs:
+                if os.path.exists(job.dst + '.part'):
+                    os.remove(job.dst + '.part')
+            raise
+
+        for job in jobs:
+            self._finish(job)
+        return jobs
+
+    def _prepare(self, job):
+        """Create the preallocated .part output and split the file into tasks"""
+        header_bytes = job.header.pack()
+        chunk_size = job.header.chunk_size
+        size = os.path.getsize(job.src)
+        if job.decrypt:
+            output_size = plaintext_size(size, len(header_bytes), chunk_size)
+            frames = frame_count(output_size, chunk_size)
+        else:
+            output_size = encrypted_size(size, len(header_bytes), chunk_size)
+            frames = frame_count(size, chunk_size)
+
+        with open(job.dst + '.part', 'wb') as f:
+            if not job.decrypt:
+                f.write(header_bytes)
+            f.truncate(output_size)
+
+        return [
+            (job, (job.decrypt, job.src, job.dst + '.part', job.master_key, header_bytes,
+                   start, min(start + TASK_CHUNKS, frames), frames))
+            for start in range(0, frames, TASK_CHUNKS)
+        ]
+
+    def _record(self, job, result):
+        if job.error is not None:
+            return
+        try:
+            job.bytes += result()
+        except (OSError, ValueError) as e:
+            job.error = e
+
+    def _finish(self, job):
+        temp = job.dst + '.part'
+        if job.error is None:
+            os.replace(temp, job.dst)
+        elif os.path.exists(temp):
+            os.remove(temp)
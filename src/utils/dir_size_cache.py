@@ -0,0 +1,170 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+from collections import namedtuple
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    dev INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    rules TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    ctime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    allocated INTEGER NOT NULL,
+    files TEXT NOT NULL,
+    children TEXT NOT NULL,
+    links TEXT NOT NULL,
+    PRIMARY KEY (dev, ino, rules)
+) WITHOUT ROWID;
+"""
+
+RACY_SECONDS = 2  # Directories modified this recently may change again within the same mtime tick
+
+# One directory's own contents. size/allocated cover entries with a single
+# link; `links` holds (ino, size, allocated) for hard-linked files so a scan
+# can count each inode once. The directory's own inode is included. `names`
+# lists the counted non-directory entries and `ctime_ns` is the newest ctime
+# among them, which is how cached listings notice files changing in place.
+Listing = namedtuple('Listing', ['dev', 'ino', 'size', 'allocated', 'files', 'children', 'links',
+                                 'names', 'ctime_ns'])
+
+
+def allocated_bytes(stat):
+    """Bytes actually allocated on disk; sparse files use less than st_size"""
+    blocks = getattr(stat, 'st_blocks', None)
+    return blocks * 512 if blocks is not None else stat.st_size
+
+
+class DirSizeCache:
+    """Persistent per-directory listing summaries keyed by (dev, inode, ignore rules).
+
+    For each directory the cache keeps the bytes held by its own entries,
+    the names of its files and the names of its subdirectories. A cached
+    listing is used while the directory's mtime is unchanged and none of
+    its files has a newer ctime, so a repeat scan stats the files it knows
+    about but skips reading directories and matching ignore rules. Filtered
+    listings are keyed on a digest of the rules in force, so editing an
+    ignore file or scanning from another root never reuses a stale one.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        # Scanner threads each get their own SQLite connection
+        self._local = threading.local()
+        self._dirty = {}
+        self._lock = threading.Lock()
+
+    @property
+    def db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.db_path)
+            db.executescript(SCHEMA)
+            self._local.db = db
+        return db
+
+    def listing(self, path, rules=None, dev=None):
+        """Return the Listing of one directory, or None if it cannot be read or is not on `dev`"""
+        try:
+            stat = os.stat(path, follow_symlinks=False)
+        except OSError:
+            return None
+        if dev is not None and stat.st_dev != dev:
+            return None
+        key = (stat.st_dev, stat.st_ino, rules.fingerprint(path) if rules is not None else '')
+
+        row = self.db.execute(
+            "SELECT mtime_ns, ctime_ns, size, allocated, files, children, links FROM listings "
+            "WHERE dev = ? AND ino = ? AND rules = ?", key).fetchone()
+        if row is not None and row[0] == stat.st_mtime_ns:
+            _, ctime_ns, size, allocated, files, children, links = row
+            names = files.split('\0') if files else []
+            if _newest_ctime(path, names) == ctime_ns:
+                return Listing(stat.st_dev, stat.st_ino, size, allocated, len(names),
+                               children.split('\0') if children else [], _decode_links(links),
+                               names, ctime_ns)
+
+        listing = self._scan(path, stat, rules)
+        newest = max(stat.st_mtime_ns, listing.ctime_ns) if listing is not None else 0
+        if listing is not None and time.time() - newest / 1e9 > RACY_SECONDS:
+            with self._lock:
+                self._dirty[key] = (stat.st_mtime_ns, listing.ctime_ns, listing.size, listing.allocated,
+                                    '\0'.join(listing.names), '\0'.join(listing.children),
+                                    _encode_links(listing.links))
+        return listing
+
+    def _scan(self, path, stat, rules):
+        size = stat.st_size
+        allocated = allocated_bytes(stat)
+        names = []
+        ctime_ns = 0
+        children = []
+        links = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if rules is not None and rules.ignored(entry.path, is_dir):
+                            continue
+                        if is_dir:
+                            children.append(entry.name)
+                            continue
+                        # Everything else, symlinks included, is counted by its own inode
+                        entry_stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    names.append(entry.name)
+                    ctime_ns = max(ctime_ns, entry_stat.st_ctime_ns)
+                    if entry_stat.st_nlink > 1:
+                        links.append((entry_stat.st_ino, entry_stat.st_size, allocated_bytes(entry_stat)))
+                    else:
+                        size += entry_stat.st_size
+                        allocated += allocated_bytes(entry_stat)
+        except OSError:
+            return None
+        return Listing(stat.st_dev, stat.st_ino, size, allocated, len(names), children, links,
+                       names, ctime_ns)
+
+    def flush(self):
+        """Write summaries gathered since the last flush in one transaction"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO listings "
+                "(dev, ino, rules, mtime_ns, ctime_ns, size, allocated, files, children, links) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [key + value for key, value in dirty.items()])
+
+    def clear(self):
+        with self.db:
+            self.db.execute("DELETE FROM listings")
+        self.db.execute("VACUUM")
+
+
+def _newest_ctime(path, names):
+    """Newest ctime among the named files, or None if any of them is gone"""
+    newest = 0
+    for name in names:
+        try:
+            newest = max(newest, os.stat(os.path.join(path, name), follow_symlinks=False).st_ctime_ns)
+        except OSError:
+            return None
+    return newest
+
+
+def _encode_links(links):
+    return ';'.join(f"{ino},{size},{allocated}" for ino, size, allocated in links)
+
+
+def _decode_links(text):
+    if not text:
+        return []
+    return [tuple(map(int, item.split(','))) for item in text.split(';')]
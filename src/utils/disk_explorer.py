@@ -0,0 +1,159 @@
+import os
+import sys
+import humanize
+from prompt_toolkit.application import Application, get_app
+from prompt_toolkit.key_binding import KeyBindings
+from prompt_toolkit.layout import Layout, HSplit, Window
+from prompt_toolkit.layout.controls import FormattedTextControl
+from prompt_toolkit.keys import Keys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BAR_WIDTH = 12
+SORTS = {'s': 'size', 'n': 'name', 'c': 'items'}
+HELP = "↑↓ move  →/enter open  ←/backspace up  s/n/c sort size/name/count  a on-disk  d delete  q quit"
+
+
+class DiskExplorer:
+    """ncdu-style browser over a ScanTree; every keypress is answered from memory"""
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.node = 0
+        self.cursor = 0
+        self.top = 0
+        self.sort = 'size'
+        self.allocated = False
+        self.message = ''
+        self.confirm_delete = None
+        self._trail = []  # Cursor positions of the directories above the current one
+        self._rows = []
+
+    def run(self):
+        kb = KeyBindings()
+
+        @kb.add(Keys.Any)
+        @kb.add(Keys.Up)
+        @kb.add(Keys.Down)
+        @kb.add(Keys.Left)
+        @kb.add(Keys.Right)
+        @kb.add(Keys.PageUp)
+        @kb.add(Keys.PageDown)
+        @kb.add(Keys.Home)
+        @kb.add(Keys.End)
+        @kb.add(Keys.Enter)
+        @kb.add(Keys.Backspace)
+        @kb.add(Keys.Escape, eager=True)
+        @kb.add(Keys.ControlC)
+        def _(event):
+            self._handle(event.key_sequence[0].key, event.app)
+
+        layout = Layout(HSplit([
+            Window(FormattedTextControl(self._render_header), height=2),
+            Window(FormattedTextControl(self._render_rows)),
+            Window(FormattedTextControl(self._render_status), height=1, style='reverse'),
+        ]))
+        Application(layout=layout, key_bindings=kb, full_screen=True).run()
+
+    # Input
+
+    def _handle(self, key, app):
+        if self.confirm_delete is not None:
+            node, self.confirm_delete = self.confirm_delete, None
+            if key in ('y', 'Y'):
+                self._delete(node)
+            else:
+                self.message = "Delete cancelled"
+            return
+
+        self.message = ''
+        rows = self._rows
+        page = max(1, self._visible_rows() - 1)
+        if key in (Keys.Up, 'k'):
+            self.cursor = max(0, self.cursor - 1)
+        elif key in (Keys.Down, 'j'):
+            self.cursor = min(len(rows) - 1, self.cursor + 1) if rows else 0
+        elif key == Keys.PageUp:
+            self.cursor = max(0, self.cursor - page)
+        elif key == Keys.PageDown:
+            self.cursor = min(len(rows) - 1, self.cursor + page) if rows else 0
+        elif key == Keys.Home:
+            self.cursor = 0
+        elif key == Keys.End:
+            self.cursor = max(0, len(rows) - 1)
+        elif key in (Keys.Right, Keys.Enter, 'l'):
+            if rows and self.tree.is_dir(rows[self.cursor]):
+                self._trail.append(self.cursor)
+                self.node = rows[self.cursor]
+                self.cursor = self.top = 0
+        elif key in (Keys.Left, Keys.Backspace, 'h'):
+            if self.node != 0:
+                self.node = self.tree.parent[self.node]
+                self.cursor = self._trail.pop() if self._trail else 0
+        elif key in SORTS:
+            self.sort = SORTS[key]
+        elif key == 'a':
+            self.allocated = not self.allocated
+        elif key == 'd':
+            if rows:
+                self.confirm_delete = rows[self.cursor]
+                self.message = f"Delete {self.tree.path(rows[self.cursor])}? (y/N)"
+        elif key in ('q', Keys.Escape, Keys.ControlC):
+            app.exit()
+
+    def _delete(self, node):
+        try:
+            self.tree.delete(node)
+            self.message = f"Deleted {self.tree.path(node)}"
+        except (OSError, ValueError) as e:
+            self.message = f"Error: {e}"
+        self.cursor = max(0, self.cursor - 1) if self.cursor >= len(self._rows) - 1 else self.cursor
+
+    # Rendering
+
+    def _visible_rows(self):
+        try:
+            return max(1, get_app().output.get_size().rows - 3)
+        except Exception:
+            return 20
+
+    def _value(self, node):
+        return self.tree.allocated[node] if self.allocated else self.tree.size[node]
+
+    def _render_header(self):
+        tree = self.tree
+        label = "on disk" if self.allocated else "apparent"
+        return [
+            ('bold', f" {tree.path(self.node)}\n"),
+            ('', f" {humanize.naturalsize(self._value(self.node))} {label}, "
+                 f"{tree.items[self.node]:,} items, sorted by {self.sort}"),
+        ]
+
+    def _render_rows(self):
+        sort = 'allocated' if self.allocated and self.sort == 'size' else self.sort
+        self._rows = rows = self.tree.children(self.node, sort)
+        if not rows:
+            return [('italic', " (empty directory)")]
+        self.cursor = min(self.cursor, len(rows) - 1)
+
+        # Only the rows that fit on screen are formatted
+        height = self._visible_rows()
+        if self.cursor < self.top:
+            self.top = self.cursor
+        elif self.cursor >= self.top + height:
+            self.top = self.cursor - height + 1
+
+        largest = max(self._value(rows[0]), 1) if sort in ('size', 'allocated') else \
+            max(max(self._value(node) for node in rows), 1)
+        fragments = []
+        for index in range(self.top, min(len(rows), self.top + height)):
+            node = rows[index]
+            value = self._value(node)
+            filled = round(BAR_WIDTH * value / largest)
+            name = self.tree.names[node] + ('/' if self.tree.is_dir(node) else '')
+            line = (f" {humanize.naturalsize(value):>10} [{'#' * filled:<{BAR_WIDTH}}] "
+                    f"{self.tree.items[node]:>8,}  {name}\n")
+            fragments.append(('reverse' if index == self.cursor else '', line))
+        return fragments
+
+    def _render_status(self):
+        return f" {self.message or HELP}"
@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROGRESS_INTERVAL = 0.25  # Seconds between progress callbacks
+
+
+class DirTotals:
+    """Aggregated sizes of one directory subtree"""
+    __slots__ = ('size', 'allocated', 'files', 'dirs')
+
+    def __init__(self, size=0, allocated=0, files=0, dirs=0):
+        self.size = size            # Apparent bytes (st_size)
+        self.allocated = allocated  # Bytes on disk (st_blocks)
+        self.files = files
+        self.dirs = dirs
+
+
+class DiskScanner:
+    """Directory size scanner that lists directories on a thread pool.
+
+    Listings come from a DirSizeCache, so unchanged directories are not
+    relisted. Totals are then summed iteratively, children before parents,
+    counting every hard-linked inode once per scan.
+    """
+
+    def __init__(self, cache, workers=8, one_filesystem=False, rules=None, progress=None):
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.one_filesystem = one_filesystem
+        self.rules = rules
+        # progress(dirs, entries, elapsed) is called from the scanning thread
+        self.progress = progress
+
+    def scan(self, root):
+        """Return {directory path: DirTotals} for `root` and every directory below it"""
+        dev = None
+        if self.one_filesystem:
+            try:
+                dev = os.stat(root).st_dev
+            except OSError:
+                return {}
+        listings = self._collect(root, dev)
+        self.cache.flush()
+        return self._aggregate(root, listings)
+
+    def _collect(self, root, dev):
+        """List every directory under `root` in parallel; returns {path: Listing}"""
+        listings = {}
+        lock = threading.Lock()
+        finished = threading.Event()
+        state = {'pending': 1, 'entries': 0}
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='disk-scan') as pool:
+            def visit(path):
+                try:
+                    listing = self.cache.listing(path, self.rules, dev)
+                    if listing is not None:
+                        with lock:
+                            listings[path] = listing
+                            state['entries'] += listing.files + len(listing.children)
+                            state['pending'] += len(listing.children)
+                        for name in listing.children:
+                            pool.submit(visit, os.path.join(path, name))
+                finally:
+                    with lock:
+                        state['pending'] -= 1
+                        if not state['pending']:
+                            finished.set()
+
+            start = time.time()
+            pool.submit(visit, root)
+            while not finished.wait(PROGRESS_INTERVAL):
+                if self.progress is not None:
+                    self.progress(len(listings), state['entries'], time.time() - start)
+            if self.progress is not None:
+                self.progress(len(listings), state['entries'], time.time() - start)
+        return listings
+
+    def _aggregate(self, root, listings):
+        totals = {}
+        seen_links = set()
+        stack = [(root, False)]
+        while stack:
+            path, expanded = stack.pop()
+            listing = listings.get(path)
+            if listing is None:
+                continue
+            if not expanded:
+                stack.append((path, True))
+                stack.extend((os.path.join(path, name), False) for name in listing.children)
+                continue
+
+            total = DirTotals(listing.size, listing.allocated, listing.files, 1)
+            for ino, size, allocated in listing.links:
+                key = (listing.dev, ino)
+                if key not in seen_links:
+                    seen_links.add(key)
+                    total.size += size
+                    total.allocated += allocated
+            for name in listing.children:
+                child = totals.get(os.path.join(path, name))
+                if child is not None:
+                    total.size += child.size
+                    total.allocated += child.allocated
+                    total.files += child.files
+                    total.dirs += child.dirs
+            totals[path] = total
+        return totals
@@ -0,0 +1,168 @@
+import os
+import sys
+import mmap
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PARTIAL_SIZE = 64 * 1024  # Bytes hashed from each end of a file in the partial stage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    dev INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest BLOB NOT NULL,
+    PRIMARY KEY (dev, ino, kind)
+) WITHOUT ROWID;
+"""
+
+
+class FileRecord:
+    """A duplicate candidate: one inode and the path it was found under"""
+    __slots__ = ('path', 'size', 'dev', 'ino', 'mtime_ns')
+
+    def __init__(self, path, stat):
+        self.path = path
+        self.size = stat.st_size
+        self.dev = stat.st_dev
+        self.ino = stat.st_ino
+        self.mtime_ns = stat.st_mtime_ns
+
+
+class HashCache:
+    """Persistent digests keyed by (dev, inode), valid while size and mtime match"""
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._local = threading.local()
+        self._pending = []
+        self._lock = threading.Lock()
+
+    @property
+    def db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.db_path)
+            db.executescript(SCHEMA)
+            self._local.db = db
+        return db
+
+    def get(self, record, kind):
+        row = self.db.execute("SELECT size, mtime_ns, digest FROM hashes WHERE dev = ? AND ino = ? AND kind = ?",
+                              (record.dev, record.ino, kind)).fetchone()
+        if row is not None and row[:2] == (record.size, record.mtime_ns):
+            return row[2]
+        return None
+
+    def put(self, record, kind, digest):
+        with self._lock:
+            self._pending.append((record.dev, record.ino, kind, record.size, record.mtime_ns, digest))
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if pending:
+            with self.db:
+                self.db.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)", pending)
+
+
+class DupeFinder:
+    """Find files with identical contents in three narrowing stages.
+
+    Files are grouped by size, then by a hash of their first and last
+    64 KiB, and only files still sharing a group are hashed in full.
+    Hashing runs on a thread pool (hashlib releases the GIL) over mmap
+    reads, so I/O tracks the number of real candidates rather than the
+    size of the tree. Hard links to one inode are a single candidate.
+    """
+
+    def __init__(self, cache, workers=8, min_size=1):
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.min_size = max(1, min_size)
+        self.bytes_hashed = 0
+        self.hard_links = 0
+        self._lock = threading.Lock()
+
+    def find(self, entries):
+        """Return [(size, [paths])] for duplicate sets, most reclaimable space first"""
+        by_size = {}
+        inodes = set()
+        for entry in entries:
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if stat.st_size < self.min_size:
+                continue
+            key = (stat.st_dev, stat.st_ino)
+            if key in inodes:
+                # Another name for data already counted; deleting it frees nothing
+                self.hard_links += 1
+                continue
+            inodes.add(key)
+            by_size.setdefault(stat.st_size, []).append(FileRecord(entry.path, stat))
+
+        groups = [group for group in by_size.values() if len(group) > 1]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='dupes') as pool:
+            groups = self._refine(pool, groups, 'partial', self._partial_digest)
+            # Files no larger than both partial blocks were already hashed whole
+            small = [group for group in groups if group[0].size <= 2 * PARTIAL_SIZE]
+            large = [group for group in groups if group[0].size > 2 * PARTIAL_SIZE]
+            groups = small + self._refine(pool, large, 'full', self._full_digest)
+        self.cache.flush()
+
+        results = [(group[0].size, sorted(record.path for record in group)) for group in groups]
+        results.sort(key=lambda item: item[0] * (len(item[1]) - 1), reverse=True)
+        return results
+
+    def _refine(self, pool, groups, kind, digest):
+        """Split each group by `digest`, keeping subgroups of two or more"""
+        records = [record for group in groups for record in group]
+        digests = pool.map(lambda record: self._cached(record, kind, digest), records)
+        refined = {}
+        for record, value in zip(records, digests):
+            if value is not None:
+                refined.setdefault((record.size, value), []).append(record)
+        return [group for group in refined.values() if len(group) > 1]
+
+    def _cached(self, record, kind, digest):
+        value = self.cache.get(record, kind)
+        if value is None:
+            try:
+                value = digest(record)
+            except (OSError, ValueError):
+                return None
+            self.cache.put(record, kind, value)
+        return value
+
+    def _partial_digest(self, record):
+        with open(record.path, 'rb') as f:
+            head = f.read(PARTIAL_SIZE)
+            tail = b''
+            if record.size > 2 * PARTIAL_SIZE:
+                f.seek(-PARTIAL_SIZE, os.SEEK_END)
+                tail = f.read(PARTIAL_SIZE)
+            else:
+                tail = f.read()
+        self._count(len(head) + len(tail))
+        return hashlib.blake2b(head + tail, digest_size=16).digest()
+
+    def _full_digest(self, record):
+        digest = hashlib.blake2b(digest_size=32)
+        with open(record.path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                digest.update(data)
+                self._count(len(data))
+        return digest.digest()
+
+    def _count(self, size):
+        with self._lock:
+            self.bytes_hashed += size
@@ -1,28 +1,127 @@
 import os
-import subprocess
+import re
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def handle_file_redirection(parts):
-    """Handle file redirection"""
-    try:
-        if ">" in parts:
-            operator_index = parts.index(">")
-            command_args = parts[:operator_index]
-            file_name = parts[operator_index + 1]
-            mode = "w"  # Overwrite mode
-        elif ">>" in parts:
-            operator_index = parts.index(">>")
-            command_args = parts[:operator_index]
-            file_name = parts[operator_index + 1]
-            mode = "a"  # Append mode
-
-        file_name = file_name.strip().strip('"')
-        os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
-
-        with open(file_name, mode) as f:
-            result = subprocess.run(command_args, capture_output=True, text=True, shell=True)
-            f.write(result.stdout)
-
-    except Exception as e:
-        print(f"Redirection error: {e}")
\ No newline at end of file
+PIPELINE_OPERATORS = ('|', '>', '>>', '<', '2>', '2>>', '2>&1')
+STDOUT = '&1'  # stderr target meaning "wherever stdout goes" (2>&1)
+
+# Unquoted operators, longest first; a leading fd number only counts at the start of a word
+OPERATOR_PATTERN = re.compile(r'\d*>>|\d*>&\d+|\d*>|<|\||&')
+
+
+class Operator(str):
+    """A token that came from an unquoted operator; a quoted "|" stays a plain str"""
+
+
+def is_operator(token, *names):
+    """True if `token` is an unquoted operator (one of `names`, if given)"""
+    return isinstance(token, Operator) and (not names or token in names)
+
+
+def tokenize(command):
+    """Split a command line into words and operators with POSIX-style quoting.
+
+    Redirections with a file descriptor (2>, 2>>, 2>&1) are single
+    operator tokens. Operators are returned as Operator instances, so
+    text that was quoted is never taken for an operator.
+    """
+    tokens = []
+    word = []
+    quoted = False  # The current word contains quoted text
+    i = 0
+    length = len(command)
+    while i < length:
+        char = command[i]
+        if char.isspace():
+            if word or quoted:
+                tokens.append(''.join(word))
+                word, quoted = [], False
+            i += 1
+        elif char == "'":
+            end = command.find("'", i + 1)
+            if end < 0:
+                raise ValueError("No closing quotation")
+            word.append(command[i + 1:end])
+            quoted = True
+            i = end + 1
+        elif char == '"':
+            i += 1
+            while True:
+                if i >= length:
+                    raise ValueError("No closing quotation")
+                if command[i] == '"':
+                    break
+                if command[i] == '\\' and i + 1 < length and command[i + 1] in '"\\$`':
+                    i += 1
+                word.append(command[i])
+                i += 1
+            quoted = True
+            i += 1
+        elif char == '\\':
+            if i + 1 >= length:
+                raise ValueError("No escaped character")
+            word.append(command[i + 1])
+            quoted = True
+            i += 2
+        else:
+            match = OPERATOR_PATTERN.match(command, i)
+            # In "a2>f" the 2 is part of the word; only "2>f" redirects stderr
+            if match and not (match.group()[0].isdigit() and (word or quoted)):
+                if word or quoted:
+                    tokens.append(''.join(word))
+                    word, quoted = [], False
+                tokens.append(_operator(match.group()))
+                i = match.end()
+            else:
+                word.append(char)
+                i += 1
+    if word or quoted:
+        tokens.append(''.join(word))
+    return tokens
+
+
+def _operator(text):
+    """Normalise 1> to > and reject descriptors other than stdout and stderr"""
+    if text.startswith('1>'):
+        text = text[1:]
+    if text not in PIPELINE_OPERATORS and text != '&':
+        raise ValueError(f"unsupported redirection '{text}'")
+    return Operator(text)
+
+
+def split_redirections(tokens):
+    """Handle file redirection; returns (args, stdin_file, stdout_file, mode, stderr_file, stderr_mode)"""
+    args = []
+    stdin_file = None
+    stdout_file = None
+    stderr_file = None
+    mode = "w"
+    stderr_mode = "w"
+
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if is_operator(token, '2>&1'):
+            stderr_file = STDOUT
+            i += 1
+        elif is_operator(token, '>', '>>', '<', '2>', '2>>'):
+            if i + 1 >= len(tokens) or is_operator(tokens[i + 1]):
+                raise ValueError(f"syntax error near '{token}'")
+            file_name = tokens[i + 1]
+            if token == '<':
+                stdin_file = file_name
+            elif token.startswith('2'):
+                stderr_file = file_name
+                stderr_mode = "a" if token == '2>>' else "w"
+            else:
+                stdout_file = file_name
+                mode = "a" if token == '>>' else "w"  # Append or overwrite mode
+            i += 2
+        elif is_operator(token):
+            raise ValueError(f"syntax error near '{token}'")
+        else:
+            args.append(token)
+            i += 1
+
+    return args, stdin_file, stdout_file, mode, stderr_file, stderr_mode
@@ -0,0 +1,305 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+import stat as stat_module
+from collections import namedtuple
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.fs_walker import ParallelWalker
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (
+    path TEXT PRIMARY KEY,
+    built REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    parent_id INTEGER,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent_id);
+CREATE TABLE IF NOT EXISTS entries (
+    dir_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    mode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    PRIMARY KEY (dir_id, name)
+) WITHOUT ROWID;
+"""
+
+S_IFMT_MASK = 0o170000  # File type bits of st_mode
+
+IndexedStat = namedtuple('IndexedStat', ['st_mode', 'st_size', 'st_mtime'])
+
+
+class IndexedEntry:
+    """os.DirEntry look-alike for rows served from the index"""
+    __slots__ = ('name', 'path', '_stat')
+
+    def __init__(self, name, path, mode, size, mtime):
+        self.name = name
+        self.path = path
+        self._stat = IndexedStat(mode, size, mtime)
+
+    def is_dir(self):
+        return stat_module.S_ISDIR(self._stat.st_mode)
+
+    def stat(self):
+        return self._stat
+
+
+def _subtree_bounds(path):
+    """Return (low, high) so that low <= p < high selects paths strictly below `path`"""
+    base = path.rstrip(os.sep)
+    return base + os.sep, base + chr(ord(os.sep) + 1)
+
+
+def scan_directory(path):
+    """List one directory; returns (entry rows, real subdirectory paths)"""
+    rows = []
+    subdirs = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                # Same semantics as the live walk: symlinks are followed for
+                # stat, but only real directories are descended
+                stat = entry.stat()
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+            except OSError:
+                continue
+            rows.append((entry.name, stat.st_mode, stat.st_size, stat.st_mtime))
+    return rows, subdirs
+
+
+class FileIndex:
+    """Persistent name/size/mtime/type index of directory trees in SQLite.
+
+    Directories record their mtime, so `update` relists only directories
+    whose entries were added, removed or renamed, and queries fall back
+    to a live listing for any directory that changed since it was indexed.
+    Size and mtime changes to existing files do not touch the directory
+    mtime and are picked up by the next `build`.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        # Searches may run on pipeline and job threads; SQLite connections are per thread
+        self._local = threading.local()
+
+    @property
+    def db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.db_path)
+            db.executescript(SCHEMA)
+            self._local.db = db
+        return db
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    def exists(self):
+        return os.path.exists(self.db_path)
+
+    def covering_root(self, path):
+        """Return the indexed root containing `path`, or None"""
+        if not self.exists():
+            return None
+        path = os.path.abspath(path)
+        for (root,) in self.db.execute("SELECT path FROM roots"):
+            if path == root or path.startswith(root.rstrip(os.sep) + os.sep):
+                return root
+        return None
+
+    # Building and updating
+
+    def build(self, root):
+        """Index `root` from scratch; returns (directories, entries)"""
+        root = os.path.abspath(root)
+        with self.db:
+            self._delete_subtree(root)
+            counts = self._index_tree(root, None)
+            self.db.execute("INSERT OR REPLACE INTO roots (path, built) VALUES (?, ?)", (root, time.time()))
+        return counts
+
+    def update(self, root):
+        """Relist only directories whose mtime changed; returns (checked, rescanned)"""
+        root = os.path.abspath(root)
+        if self.covering_root(root) is None:
+            raise ValueError(f"{root} is not indexed; run 'search --index build {root}' first")
+
+        checked = rescanned = 0
+        with self.db:
+            stack = [root]
+            while stack:
+                path = stack.pop()
+                checked += 1
+                row = self.db.execute("SELECT id, mtime_ns, parent_id FROM dirs WHERE path = ?", (path,)).fetchone()
+                try:
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except OSError:
+                    self._delete_subtree(path)
+                    continue
+
+                if row is None:
+                    parent = self.db.execute("SELECT id FROM dirs WHERE path = ?",
+                                             (os.path.dirname(path),)).fetchone()
+                    self._index_tree(path, parent[0] if parent else None)
+                    rescanned += 1
+                    continue
+
+                dir_id, indexed_mtime, _ = row
+                if indexed_mtime == mtime_ns:
+                    # Unchanged listing; children may still have changed
+                    stack.extend(p for (p,) in self.db.execute(
+                        "SELECT path FROM dirs WHERE parent_id = ?", (dir_id,)))
+                    continue
+
+                rescanned += 1
+                try:
+                    rows, subdirs = scan_directory(path)
+                except OSError:
+                    continue
+                self._store_listing(dir_id, rows, mtime_ns)
+
+                # Drop subtrees of directories that disappeared
+                current = set(subdirs)
+                for (child,) in self.db.execute("SELECT path FROM dirs WHERE parent_id = ?", (dir_id,)).fetchall():
+                    if child not in current:
+                        self._delete_subtree(child)
+                stack.extend(subdirs)
+
+            self.db.execute("UPDATE roots SET built = ? WHERE path = ?", (time.time(), root))
+        return checked, rescanned
+
+    def _index_tree(self, root, parent_id):
+        """Insert every directory under `root`; returns (directories, entries)"""
+        dirs = entries = 0
+        stack = [(root, parent_id)]
+        while stack:
+            path, parent = stack.pop()
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+                rows, subdirs = scan_directory(path)
+            except OSError:
+                continue
+            cursor = self.db.execute(
+                "INSERT OR REPLACE INTO dirs (path, parent_id, mtime_ns) VALUES (?, ?, ?)",
+                (path, parent, mtime_ns))
+            dir_id = cursor.lastrowid
+            self._store_listing(dir_id, rows, mtime_ns)
+            dirs += 1
+            entries += len(rows)
+            stack.extend((subdir, dir_id) for subdir in subdirs)
+        return dirs, entries
+
+    def _store_listing(self, dir_id, rows, mtime_ns):
+        self.db.execute("DELETE FROM entries WHERE dir_id = ?", (dir_id,))
+        self.db.executemany(
+            "INSERT INTO entries (dir_id, name, mode, size, mtime) VALUES (?, ?, ?, ?, ?)",
+            [(dir_id,) + row for row in rows])
+        self.db.execute("UPDATE dirs SET mtime_ns = ? WHERE id = ?", (mtime_ns, dir_id))
+
+    def _delete_subtree(self, path):
+        low, high = _subtree_bounds(path)
+        where = "path = ? OR (path >= ? AND path < ?)"
+        params = (path, low, high)
+        self.db.execute(f"DELETE FROM entries WHERE dir_id IN (SELECT id FROM dirs WHERE {where})", params)
+        self.db.execute(f"DELETE FROM dirs WHERE {where}", params)
+        self.db.execute(f"DELETE FROM roots WHERE {where}", params)
+
+    # Querying
+
+    def query(self, path, type_=None, size=None, date=None, glob=None):
+        """Yield IndexedEntry objects for everything under `path`.
+
+        type_, size and date take the same values as FileSearch options and
+        glob is an fnmatch-style name pattern; they narrow the SQL query but
+        callers should still apply their own filters, since directories that
+        changed since indexing are listed live and returned unfiltered.
+        Entry paths are built on `path` as given, like a live walk.
+        """
+        abs_path = os.path.abspath(path)
+        low, high = _subtree_bounds(abs_path)
+
+        def shown(full_path):
+            relative = os.path.relpath(full_path, abs_path)
+            return path if relative == '.' else os.path.join(path, relative)
+
+        known = {}
+        stale = []
+        for dir_id, dir_path, mtime_ns in self.db.execute(
+                "SELECT id, path, mtime_ns FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                (abs_path, low, high)):
+            known[dir_path] = dir_id
+            try:
+                if os.stat(dir_path).st_mtime_ns != mtime_ns:
+                    stale.append(dir_path)
+            except OSError:
+                stale.append(dir_path)
+        stale_ids = {known[p] for p in stale}
+
+        sql = ["SELECT e.dir_id, d.path, e.name, e.mode, e.size, e.mtime FROM entries e "
+               "JOIN dirs d ON d.id = e.dir_id WHERE (d.path = ? OR (d.path >= ? AND d.path < ?))"]
+        params = [abs_path, low, high]
+        if type_ == 'd':
+            sql.append("AND (e.mode & ?) = ?")
+            params += [S_IFMT_MASK, stat_module.S_IFDIR]
+        elif type_ == 'f':
+            sql.append("AND (e.mode & ?) != ?")
+            params += [S_IFMT_MASK, stat_module.S_IFDIR]
+        if size:
+            op, limit = size
+            sql.append("AND e.size >= ?" if op == '+' else "AND e.size <= ?")
+            params.append(limit)
+        if date:
+            sql.append("AND e.mtime >= ?")
+            params.append(date)
+        if glob:
+            sql.append("AND e.name GLOB ?")
+            params.append(_fnmatch_to_glob(glob))
+
+        for dir_id, dir_path, name, mode, entry_size, mtime in self.db.execute(" ".join(sql), params):
+            if dir_id not in stale_ids:
+                yield IndexedEntry(name, shown(os.path.join(dir_path, name)), mode, entry_size, mtime)
+
+        # Live fallback for directories that changed since they were indexed
+        for dir_path in stale:
+            try:
+                rows, subdirs = scan_directory(dir_path)
+            except OSError:
+                continue
+            for name, mode, entry_size, mtime in rows:
+                yield IndexedEntry(name, shown(os.path.join(dir_path, name)), mode, entry_size, mtime)
+            for subdir in subdirs:
+                if subdir not in known:
+                    for entry in ParallelWalker().walk(subdir):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        yield IndexedEntry(entry.name, shown(entry.path), stat.st_mode,
+                                           stat.st_size, stat.st_mtime)
+
+    def stats(self):
+        """Return a dict describing the index"""
+        db = self.db
+        return {
+            'roots': db.execute("SELECT path, built FROM roots ORDER BY path").fetchall(),
+            'dirs': db.execute("SELECT COUNT(*) FROM dirs").fetchone()[0],
+            'entries': db.execute("SELECT COUNT(*) FROM entries").fetchone()[0],
+            'bytes': os.path.getsize(self.db_path),
+        }
+
+
+def _fnmatch_to_glob(pattern):
+    """fnmatch writes negated sets as [!...]; SQLite GLOB uses [^...]"""
+    return pattern.replace('[!', '[^')
@@ -0,0 +1,130 @@
+import os
+import sys
+import queue
+import threading
+from collections import deque
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_WORKERS = 8
+_DONE = object()
+
+class ParallelWalker:
+    """Directory traversal on a work-stealing pool of scandir readers.
+
+    walk() yields os.DirEntry objects for everything below the root as
+    directories are read, in no particular order. DirEntry caches the
+    file type from the directory listing, and its stat() result once
+    fetched, so callers never need to stat a path a second time.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, descend=None, queue_size=256):
+        self.workers = max(1, workers)
+        # descend(entry) -> bool decides whether a directory is entered
+        self.descend = descend
+        self.queue_size = queue_size
+
+    def walk(self, root):
+        """Yield a DirEntry for every file and directory under `root`"""
+        state = _WalkState(self.workers, self.queue_size)
+        state.push(0, root)
+
+        threads = [
+            threading.Thread(target=self._worker, args=(state, i), daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                batch = state.results.get()
+                if batch is _DONE:
+                    break
+                yield from batch
+        finally:
+            # Stop the readers if the consumer went away early
+            state.cancelled.set()
+            with state.cond:
+                state.cond.notify_all()
+
+    def _worker(self, state, index):
+        while not state.cancelled.is_set():
+            path = state.take(index)
+            if path is None:
+                if state.wait_for_work():
+                    continue
+                return
+
+            batch = []
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        batch.append(entry)
+                        try:
+                            if entry.is_dir(follow_symlinks=False) and (
+                                    self.descend is None or self.descend(entry)):
+                                state.push(index, entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                pass
+
+            if batch:
+                state.emit(batch)
+            state.task_done()
+
+
+class _WalkState:
+    """Per-walk deques, pending counter and result queue"""
+
+    def __init__(self, workers, queue_size):
+        self.deques = [deque() for _ in range(workers)]
+        self.results = queue.Queue(maxsize=queue_size)
+        self.cond = threading.Condition()
+        self.cancelled = threading.Event()
+        self.pending = 0
+
+    def push(self, index, path):
+        with self.cond:
+            self.pending += 1
+            self.deques[index].append(path)
+            self.cond.notify()
+
+    def take(self, index):
+        """Pop local work depth-first, else steal the oldest entry from a peer"""
+        try:
+            return self.deques[index].pop()
+        except IndexError:
+            pass
+        count = len(self.deques)
+        for offset in range(1, count):
+            try:
+                return self.deques[(index + offset) % count].popleft()
+            except IndexError:
+                continue
+        return None
+
+    def wait_for_work(self):
+        """Block until work may be available; False once the walk is over"""
+        with self.cond:
+            if self.pending == 0 or self.cancelled.is_set():
+                return False
+            self.cond.wait(0.05)
+            return True
+
+    def emit(self, batch):
+        while not self.cancelled.is_set():
+            try:
+                self.results.put(batch, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def task_done(self):
+        with self.cond:
+            self.pending -= 1
+            finished = self.pending == 0
+            if finished:
+                self.cond.notify_all()
+        if finished:
+            self.emit(_DONE)
@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class HistoryStore:
+    """Append-only command history journal with batched writes"""
+
+    def __init__(self, journal_file, limit=500, batch_size=32, flush_delay=2.0, legacy_file=None):
+        self.journal_file = journal_file
+        self.legacy_file = legacy_file
+        self.limit = limit
+        self.batch_size = batch_size
+        self.flush_delay = flush_delay
+
+        # In-memory index: entries[n - 1] is command n, so !n and !! never touch disk
+        self.entries = []
+        self._pending = []
+        self._journal_records = 0
+        self._lock = threading.RLock()
+        self._flush_timer = None
+        self._compacting = False
+
+        self.load()
+        atexit.register(self.close)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def get(self, number):
+        """Return command number `number` (1-based) or None"""
+        if 1 <= number <= len(self.entries):
+            return self.entries[number - 1]
+        return None
+
+    def last(self):
+        """Return the most recent command or None"""
+        return self.entries[-1] if self.entries else None
+
+    def load(self):
+        """Load the journal, importing the legacy JSON history on first run"""
+        if not os.path.exists(self.journal_file):
+            self._import_legacy()
+
+        entries = []
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn write at the tail of the journal; skip it
+                        continue
+                    if isinstance(record, dict) and 'cmd' in record:
+                        entries.append(record['cmd'])
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading history: {e}")
+
+        self._journal_records = len(entries)
+        self.entries[:] = entries[-self.limit:]
+        if self._journal_records > 2 * self.limit:
+            self._start_compaction()
+
+    def _import_legacy(self):
+        """Convert the old whole-file history.json into a journal"""
+        if not self.legacy_file or not os.path.exists(self.legacy_file):
+            return
+        try:
+            with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return
+        if not isinstance(legacy, list):
+            return
+        records = [{'t': 0, 'cmd': cmd} for cmd in legacy[-self.limit:] if isinstance(cmd, str)]
+        self._write_snapshot(records)
+
+    def append(self, command):
+        """Record a command; the write is batched and flushed later"""
+        with self._lock:
+            self.entries.append(command)
+            self._pending.append({'t': time.time(), 'cmd': command})
+
+            if len(self.entries) > 2 * self.limit:
+                del self.entries[:len(self.entries) - self.limit]
+
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+            else:
+                self._schedule_flush()
+
+    def _schedule_flush(self):
+        """Flush pending records once the shell has been idle for flush_delay seconds"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+        self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def flush(self):
+        """Append pending records to the journal"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._pending:
+                return
+
+            pending, self._pending = self._pending, []
+            try:
+                with open(self.journal_file, 'a', encoding='utf-8') as f:
+                    f.write(''.join(json.dumps(record) + '\n' for record in pending))
+                self._journal_records += len(pending)
+            except Exception as e:
+                print(f"Error saving history: {e}")
+                self._pending = pending + self._pending
+                return
+
+            if self._journal_records > 2 * self.limit:
+                self._start_compaction()
+
+    def _start_compaction(self):
+        """Rewrite the journal down to the last `limit` records in the background"""
+        if self._compacting:
+            return
+        self._compacting = True
+        thread = threading.Thread(target=self._compact, daemon=True)
+        thread.start()
+
+    def _compact(self):
+        try:
+            with self._lock:
+                records = [{'t': 0, 'cmd': cmd} for cmd in self.entries[-self.limit:]]
+                # Anything still pending is included in the snapshot
+                self._pending = []
+                self._write_snapshot(records)
+                self._journal_records = len(records)
+        except Exception as e:
+            print(f"Error compacting history: {e}")
+        finally:
+            self._compacting = False
+
+    def _write_snapshot(self, records):
+        """Atomically replace the journal with `records`"""
+        tmp_file = f"{self.journal_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(record) + '\n' for record in records))
+        os.replace(tmp_file, self.journal_file)
+
+    def clear(self):
+        """Drop all history, in memory and on disk"""
+        with self._lock:
+            self.entries.clear()
+            self._pending = []
+            self._write_snapshot([])
+            self._journal_records = 0
+
+    def close(self):
+        """Flush outstanding records; called on exit"""
+        self.flush()
@@ -0,0 +1,237 @@
+import os
+import re
+import sys
+import hashlib
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.fs_walker import ParallelWalker
+from src.config.settings import DEFAULT_CONFIG
+
+
+def translate_pattern(line):
+    """Compile one gitignore line into (negated, dir_only, regex), or None.
+
+    The regex matches a path relative to the directory holding the ignore
+    file, using '/' separators. Blank lines and comments give None.
+    """
+    line = line.rstrip('\r\n')
+    if not line.strip() or line.startswith('#'):
+        return None
+    if not line.endswith('\\ '):
+        line = line.rstrip(' ')
+
+    negated = line.startswith('!')
+    if negated:
+        line = line[1:]
+    elif line.startswith('\\'):
+        line = line[1:]
+
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+    # A slash anywhere but the end anchors the pattern to the ignore file's directory
+    anchored = '/' in line
+    line = line.lstrip('/')
+
+    parts = [] if anchored else ['(?:.*/)?']
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if line.startswith('**/', i) and (i == 0 or line[i - 1] == '/'):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif line.startswith('**', i) and (i == 0 or line[i - 1] == '/') and i + 2 == len(line):
+            parts.append('.*')
+            i += 2
+        elif char == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif char == '?':
+            parts.append('[^/]')
+            i += 1
+        elif char == '[':
+            end = line.find(']', i + 2)
+            if end == -1:
+                parts.append(re.escape(char))
+                i += 1
+                continue
+            body = line[i + 1:end]
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            parts.append('[' + body.replace('\\', '\\\\') + ']')
+            i = end + 1
+        elif char == '\\' and i + 1 < len(line):
+            parts.append(re.escape(line[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(char))
+            i += 1
+
+    return negated, dir_only, ''.join(parts)
+
+
+class RuleSet:
+    """The compiled rules of one ignore file; the last matching rule wins"""
+
+    def __init__(self, lines):
+        lines = [line.rstrip('\r\n') for line in lines]
+        self.digest = hashlib.sha1('\n'.join(lines).encode('utf-8', 'surrogateescape')).digest()
+        rules = [rule for rule in map(translate_pattern, lines) if rule is not None]
+        # Runs of rules with the same sign share one alternation, tried from the last run back
+        runs = []
+        for negated, dir_only, pattern in rules:
+            if not runs or runs[-1][0] != negated:
+                runs.append((negated, []))
+            runs[-1][1].append((dir_only, pattern))
+
+        # Each run compiles twice: all of its rules for directories, and
+        # without the trailing-slash rules for everything else
+        self.groups = []
+        for negated, patterns in reversed(runs):
+            files = [pattern for dir_only, pattern in patterns if not dir_only]
+            self.groups.append((negated, self._compile([pattern for _, pattern in patterns]),
+                                self._compile(files) if files else None))
+
+    @staticmethod
+    def _compile(patterns):
+        return re.compile('(?:' + '|'.join(patterns) + r')\Z', re.DOTALL)
+
+    def __bool__(self):
+        return bool(self.groups)
+
+    def decide(self, relative, is_dir):
+        """True if ignored, False if re-included, None if no rule matches"""
+        for negated, dirs, files in self.groups:
+            regex = dirs if is_dir else files
+            if regex is not None and regex.match(relative):
+                return not negated
+        return None
+
+
+class IgnoreRules:
+    """Ignore-file matcher for one traversal, with rules cached per directory.
+
+    Honours the ignore files named in DEFAULT_CONFIG['ignore_files'] in
+    every directory, plus those between the root and the top of its git
+    repository. Deeper files override shallower ones, as in git.
+    """
+
+    def __init__(self, root, ignore_files=None, always=None):
+        self.root = root.rstrip(os.sep) or os.sep
+        self.root_abs = os.path.abspath(root)
+        self.ignore_files = tuple(ignore_files if ignore_files is not None else DEFAULT_CONFIG['ignore_files'])
+        always = always if always is not None else DEFAULT_CONFIG['ignore_always']
+
+        levels = []
+        if always:
+            levels.append((self.root_abs, RuleSet(always)))
+        for directory in self._repository_ancestors():
+            rules = self._load(directory)
+            if rules:
+                levels.append((directory, rules))
+        rules = self._load(self.root_abs)
+        if rules:
+            levels.append((self.root_abs, rules))
+
+        # directory -> innermost-first tuple of (base directory, RuleSet)
+        self._levels = {self.root_abs: tuple(reversed(levels))}
+        self._excluded_dirs = {}
+
+    def _repository_ancestors(self):
+        """Directories above the root up to its repository top, outermost first"""
+        ancestors = []
+        directory = self.root_abs
+        while True:
+            if os.path.exists(os.path.join(directory, '.git')):
+                return list(reversed(ancestors))
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return []
+            directory = parent
+            ancestors.append(directory)
+
+    def _load(self, directory):
+        lines = []
+        for name in self.ignore_files:
+            try:
+                with open(os.path.join(directory, name), 'r', encoding='utf-8', errors='replace') as f:
+                    lines.extend(f)
+            except OSError:
+                continue
+        return RuleSet(lines) if lines else None
+
+    def _levels_for(self, directory):
+        levels = self._levels.get(directory)
+        if levels is None:
+            parent = os.path.dirname(directory)
+            if parent == directory or not directory.startswith(self.root_abs):
+                return self._levels[self.root_abs]
+            levels = self._levels_for(parent)
+            rules = self._load(directory)
+            if rules:
+                levels = ((directory, rules),) + levels
+            # Walker threads may race here; both compute the same value
+            self._levels[directory] = levels
+        return levels
+
+    def _absolute(self, path):
+        rest = path[len(self.root):].lstrip(os.sep)
+        return os.path.join(self.root_abs, rest) if rest else self.root_abs
+
+    def ignored(self, path, is_dir):
+        """Whether `path`, a path yielded by walking the root, is ignored"""
+        path = self._absolute(path)
+        if path == self.root_abs:
+            return False
+        for base, rules in self._levels_for(os.path.dirname(path)):
+            relative = path[len(base):].lstrip(os.sep)
+            if os.sep != '/':
+                relative = relative.replace(os.sep, '/')
+            decision = rules.decide(relative, is_dir)
+            if decision is not None:
+                return decision
+        return False
+
+    def fingerprint(self, directory):
+        """Digest of every rule that applies to the entries of `directory`, for caching per rule set"""
+        directory = self._absolute(directory)
+        digest = hashlib.sha1(directory.encode('utf-8', 'surrogateescape'))
+        for base, rules in self._levels_for(directory):
+            digest.update(b'\0' + base.encode('utf-8', 'surrogateescape') + b'\0' + rules.digest)
+        return digest.hexdigest()
+
+    def excludes(self, path, is_dir):
+        """Like ignored(), but also true when any directory above `path` is ignored"""
+        parent = os.path.dirname(path)
+        if len(parent) > len(self.root) and self._directory_excluded(parent):
+            return True
+        return self.ignored(path, is_dir)
+
+    def _directory_excluded(self, directory):
+        excluded = self._excluded_dirs.get(directory)
+        if excluded is None:
+            excluded = self.excludes(directory, True)
+            self._excluded_dirs[directory] = excluded
+        return excluded
+
+    def descend(self, entry):
+        """ParallelWalker hook: prune ignored directories before reading them"""
+        return not self.ignored(entry.path, True)
+
+
+def walk_tree(root, ignore=True, workers=None):
+    """Yield DirEntry objects under `root`, skipping ignored paths when `ignore` is set"""
+    workers = workers or DEFAULT_CONFIG['search_walk_workers']
+    if not ignore:
+        yield from ParallelWalker(workers=workers).walk(root)
+        return
+
+    rules = IgnoreRules(root)
+    for entry in ParallelWalker(workers=workers, descend=rules.descend).walk(root):
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+        except OSError:
+            is_dir = False
+        if not rules.ignored(entry.path, is_dir):
+            yield entry
@@ -0,0 +1,296 @@
+import os
+import sys
+import codecs
+import ctypes
+import atexit
+import shutil
+import signal
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from prompt_toolkit.patch_stdout import StdoutProxy
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.file_redirection import is_operator
+from src.utils.pipeline import StdoutRouter
+from src.utils.stream_relay import CHUNK_SIZE
+
+class Job:
+    """One entry in the job table"""
+
+    def __init__(self, job_id, command):
+        self.id = job_id
+        self.command = command
+        self.status = 'Running'
+        self.returncode = None
+        self.proc = None        # Popen for external commands
+        self.future = None      # Future for in-process builtins and pipelines
+        self.thread_id = None
+        self.done = threading.Event()
+
+    def describe(self):
+        pid = f" {self.proc.pid}" if self.proc else ""
+        return f"[{self.id}]{pid}  {self.status:<10} {self.command}"
+
+
+class JobOutput:
+    """Prefix each line a job prints with its job id"""
+
+    def __init__(self, job_id, console):
+        self.prefix = f"[{job_id}] "
+        self.console = console
+        self._partial = ''
+        self._lock = threading.Lock()
+
+    def write(self, data):
+        with self._lock:
+            self._partial += data
+            if '\n' in self._partial:
+                *lines, self._partial = self._partial.split('\n')
+                self.console.write(''.join(f"{self.prefix}{line}\n" for line in lines))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        with self._lock:
+            if self._partial:
+                self.console.write(f"{self.prefix}{self._partial}\n")
+                self._partial = ''
+
+
+class JobControl:
+    """Background job table with jobs/fg/bg/wait builtins"""
+
+    def __init__(self, shell, max_workers=8):
+        self.shell = shell
+        self.max_workers = max_workers
+        self.jobs = {}
+        self.console = None
+        self._pool = None
+        self._finished = []
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        """Set up the output multiplexer and worker pool on first use"""
+        if self.console is not None:
+            return
+        # Writes through the proxy appear above an active prompt
+        self.console = StdoutProxy(raw=True)
+        if not isinstance(sys.stdout, StdoutRouter):
+            sys.stdout = StdoutRouter(sys.stdout)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+        atexit.register(self.close)
+
+    def _new_job(self, command):
+        with self._lock:
+            job_id = max(self.jobs, default=0) + 1
+            job = Job(job_id, command)
+            self.jobs[job_id] = job
+            return job
+
+    def start(self, command, parts):
+        """Start `parts` in the background and return 0"""
+        self._ensure_started()
+        job = self._new_job(command)
+
+        program = parts[0]
+        executable = None
+        if program not in self.shell.command_handlers and not any(is_operator(part) for part in parts):
+            executable = shutil.which(program)
+
+        if executable:
+            self._start_process(job, [executable] + parts[1:])
+        else:
+            job.future = self._pool.submit(self._run_task, job, self.shell.execute_tokens, parts)
+
+        print(job.describe() if job.proc else f"[{job.id}]")
+        return 0
+
+    def submit(self, command, func, *args):
+        """Run func(*args) in the background as job `command`; returns the job"""
+        self._ensure_started()
+        job = self._new_job(command)
+        job.future = self._pool.submit(self._run_task, job, func, *args)
+        print(f"[{job.id}]")
+        return job
+
+    def _start_process(self, job, argv):
+        # A new session keeps Ctrl+C at the prompt from reaching background jobs
+        job.proc = subprocess.Popen(
+            argv,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True
+        )
+        thread = threading.Thread(target=self._relay_process, args=(job,), daemon=True)
+        thread.start()
+
+    def _relay_process(self, job):
+        output = JobOutput(job.id, self.console)
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        fd = job.proc.stdout.fileno()
+        try:
+            while True:
+                chunk = os.read(fd, CHUNK_SIZE)
+                if not chunk:
+                    break
+                output.write(decoder.decode(chunk))
+            output.write(decoder.decode(b'', final=True))
+        except OSError:
+            pass
+        finally:
+            output.close()
+            job.proc.stdout.close()
+            self._finish(job, job.proc.wait())
+
+    def _run_task(self, job, func, *args):
+        job.thread_id = threading.get_ident()
+        output = JobOutput(job.id, self.console)
+        sys.stdout.set_target(output)
+        status = 1
+        try:
+            status = func(*args)
+            if not isinstance(status, int):
+                status = 0
+        except KeyboardInterrupt:
+            status = 130
+        except Exception as e:
+            print(f"Error executing {job.command}: {e}")
+        finally:
+            output.close()
+            sys.stdout.set_target(None)
+            self._finish(job, status)
+
+    def _finish(self, job, returncode):
+        job.returncode = returncode
+        job.status = 'Done' if not returncode else f'Exit {returncode}'
+        with self._lock:
+            self._finished.append(job)
+        job.done.set()
+
+    def report_finished(self):
+        """Print and forget jobs that finished since the last report"""
+        with self._lock:
+            finished, self._finished = self._finished, []
+            for job in finished:
+                self.jobs.pop(job.id, None)
+        for job in finished:
+            print(job.describe())
+
+    def _resolve(self, args, usage):
+        """Return the job named by %n (default: most recent) or None"""
+        if not self.jobs:
+            print(f"{usage}: no current job")
+            return None
+        if not args:
+            return self.jobs[max(self.jobs)]
+        spec = args[0].lstrip('%')
+        if not spec.isdigit() or int(spec) not in self.jobs:
+            print(f"{usage}: {args[0]}: no such job")
+            return None
+        return self.jobs[int(spec)]
+
+    def interrupt(self, job):
+        """Deliver an interrupt to a job"""
+        if job.proc is not None:
+            try:
+                os.killpg(job.proc.pid, signal.SIGINT)
+            except (AttributeError, OSError):
+                job.proc.terminate()
+        elif job.future is not None and job.future.cancel():
+            self._finish(job, 130)
+        elif job.thread_id is not None:
+            # In-process jobs see KeyboardInterrupt at their next bytecode, like Ctrl+C
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                ctypes.c_ulong(job.thread_id), ctypes.py_object(KeyboardInterrupt)
+            )
+
+    def _continue(self, job):
+        if job.status == 'Stopped' and job.proc is not None:
+            os.killpg(job.proc.pid, signal.SIGCONT)
+            job.status = 'Running'
+
+    def jobs_command(self, args=None):
+        """List background jobs"""
+        for job in sorted(self.jobs.values(), key=lambda j: j.id):
+            if not job.done.is_set():
+                print(job.describe())
+        self.report_finished()
+
+    def fg_command(self, args=None):
+        """Bring a job to the foreground and wait for it"""
+        job = self._resolve(args, 'fg')
+        if job is None:
+            return 1
+        print(job.command)
+        self._continue(job)
+
+        suspended = []
+        previous = None
+        if hasattr(signal, 'SIGTSTP') and threading.current_thread() is threading.main_thread():
+            previous = signal.signal(signal.SIGTSTP, lambda signum, frame: suspended.append(True))
+
+        try:
+            while not job.done.wait(0.1):
+                if suspended:
+                    if job.proc is not None:
+                        os.killpg(job.proc.pid, signal.SIGSTOP)
+                        job.status = 'Stopped'
+                    print(f"\n{job.describe()}")
+                    return 148
+        except KeyboardInterrupt:
+            self.interrupt(job)
+            job.done.wait()
+        finally:
+            if previous is not None:
+                signal.signal(signal.SIGTSTP, previous)
+
+        with self._lock:
+            self.jobs.pop(job.id, None)
+            if job in self._finished:
+                self._finished.remove(job)
+        return job.returncode
+
+    def bg_command(self, args=None):
+        """Resume a stopped job in the background"""
+        job = self._resolve(args, 'bg')
+        if job is None:
+            return 1
+        if job.status != 'Stopped':
+            print(f"bg: job {job.id} already in background")
+            return 0
+        self._continue(job)
+        print(f"[{job.id}] {job.command} &")
+        return 0
+
+    def wait_command(self, args=None):
+        """Wait for one job, or all of them, to finish"""
+        if args:
+            job = self._resolve(args, 'wait')
+            if job is None:
+                return 127
+            waiting = [job]
+        else:
+            waiting = [job for job in self.jobs.values() if job.status != 'Stopped']
+
+        try:
+            for job in waiting:
+                while not job.done.wait(0.1):
+                    pass
+        except KeyboardInterrupt:
+            print("\nwait: interrupted")
+            return 130
+
+        self.report_finished()
+        return waiting[-1].returncode if waiting else 0
+
+    def close(self):
+        """Terminate background processes when the shell exits"""
+        for job in list(self.jobs.values()):
+            if job.proc is not None and job.proc.poll() is None:
+                job.proc.terminate()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
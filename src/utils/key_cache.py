@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class KeyCache:
+    """Derived keys held in memory for `ttl` seconds, then overwritten with zeros.
+
+    Keys are bytearrays so they can be wiped in place. The cache keeps its
+    own copies and get() hands out a fresh one, so expiry never zeroes a
+    key an operation is still using; callers wipe their copies when done.
+    Expiry counts from when a key was derived, not from its last use, and
+    a background timer wipes expired keys even if the cache is never
+    touched again.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._keys = {}  # session -> (key, expires)
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def get(self, session):
+        """A copy of the cached key for `session`, or None; the caller should wipe() it"""
+        with self._lock:
+            self._expire_locked()
+            item = self._keys.get(session)
+            return bytearray(item[0]) if item is not None else None
+
+    def put(self, session, key):
+        """Cache a copy of `key`; with a TTL of zero nothing is kept"""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            previous = self._keys.get(session)
+            if previous is not None:
+                wipe(previous[0])
+            self._keys[session] = (bytearray(key), time.monotonic() + self.ttl)
+            self._schedule_locked()
+
+    def clear(self):
+        """Wipe and forget every cached key; returns how many there were"""
+        with self._lock:
+            for key, _ in self._keys.values():
+                wipe(key)
+            count = len(self._keys)
+            self._keys.clear()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return count
+
+    def __contains__(self, session):
+        with self._lock:
+            self._expire_locked()
+            return session in self._keys
+
+    def __len__(self):
+        with self._lock:
+            self._expire_locked()
+            return len(self._keys)
+
+    def _expire_locked(self):
+        now = time.monotonic()
+        for session, (key, expires) in list(self._keys.items()):
+            if expires <= now:
+                wipe(key)
+                del self._keys[session]
+
+    def _schedule_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._keys:
+            delay = min(expires for _, expires in self._keys.values()) - time.monotonic()
+            self._timer = threading.Timer(max(delay, 0), self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            self._expire_locked()
+            self._schedule_locked()
+
+
+def wipe(key):
+    """Overwrite a bytearray key with zeros"""
+    key[:] = bytes(len(key))
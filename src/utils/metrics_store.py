@@ -0,0 +1,263 @@
+import os
+import sys
+import heapq
+import struct
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.varint import encode_deltas, decode_deltas, put_varint, get_varint
+
+MAGIC = b'NXPROC1\n'
+FRAME = struct.Struct('>IqB')   # payload length, timestamp in ms, keyframe flag
+INDEX = struct.Struct('>qQ')    # keyframe timestamp in ms, offset of its frame
+KEYFRAME_EVERY = 60             # Frames between keyframes; bounds how far a query decodes before T1
+COLUMNS = ('cpu', 'rss', 'io', 'fds')
+
+# Frames are stored column by column: the sorted PIDs as varint gaps, then
+# one column per metric. A keyframe holds absolute values and every name;
+# other frames hold each value's change since the previous frame and only
+# the names of new processes. cpu is in tenths of a percent, rss in KiB,
+# io the cumulative bytes read and written, fds -1 when unknown.
+
+
+class MetricsWriter:
+    """Append process samples to a metrics file and its keyframe index (<path>.idx)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + '.idx'
+        self._previous = {}  # pid -> (name, cpu, rss, io, fds) as last written
+        self._since_keyframe = KEYFRAME_EVERY
+        self.frames = 0
+        self._recover()
+        self.data = open(path, 'ab')
+        self.index = open(self.index_path, 'ab')
+
+    def _recover(self):
+        """Create the file, or cut off a frame left half-written by an interrupted recorder"""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            with open(self.path, 'wb') as f:
+                f.write(MAGIC)
+            with open(self.index_path, 'wb'):
+                pass
+            return
+
+        size = os.path.getsize(self.path)
+        entries = _read_index(self.index_path)
+        while entries and entries[-1][1] >= size:
+            entries.pop()
+        with open(self.index_path, 'wb') as f:
+            f.write(b''.join(INDEX.pack(*entry) for entry in entries))
+
+        with open(self.path, 'r+b') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a process metrics file")
+            end = entries[-1][1] if entries else len(MAGIC)
+            while True:
+                f.seek(end)
+                head = f.read(FRAME.size)
+                if len(head) < FRAME.size:
+                    break
+                length = FRAME.unpack(head)[0]
+                if end + FRAME.size + length > size:
+                    break
+                end += FRAME.size + length
+            f.truncate(end)
+
+    def write(self, timestamp, records):
+        """Append one sample of ProcRecords taken at `timestamp` (seconds since the epoch)"""
+        rows = sorted((record.pid, record.name, int(round(record.cpu * 10)), record.rss // 1024,
+                       record.io, record.fds) for record in records)
+        keyframe = self._since_keyframe >= KEYFRAME_EVERY
+        previous = {} if keyframe else self._previous
+
+        out = bytearray()
+        pids = [row[0] for row in rows]
+        put_varint(out, len(pids))
+        _put_blob(out, encode_deltas(pids))
+
+        # Names for processes the reader has not seen, or that exec'd a new program
+        named = [(position, row[1]) for position, row in enumerate(rows)
+                 if row[0] not in previous or previous[row[0]][0] != row[1]]
+        put_varint(out, len(named))
+        for position, name in named:
+            put_varint(out, position)
+            _put_blob(out, name.encode('utf-8', 'replace'))
+
+        for column in range(len(COLUMNS)):
+            values = bytearray()
+            for row in rows:
+                before = previous.get(row[0])
+                put_varint(values, _zigzag(row[column + 2] - (before[column + 1] if before else 0)))
+            _put_blob(out, values)
+
+        offset = self.data.tell()
+        timestamp_ms = int(timestamp * 1000)
+        self.data.write(FRAME.pack(len(out), timestamp_ms, int(keyframe)))
+        self.data.write(out)
+        self.data.flush()
+        if keyframe:
+            # Indexed only once the frame is on disk, so the index never points past the data
+            self.index.write(INDEX.pack(timestamp_ms, offset))
+            self.index.flush()
+            self._since_keyframe = 0
+
+        self._previous = {row[0]: row[1:] for row in rows}
+        self._since_keyframe += 1
+        self.frames += 1
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+
+class MetricsReader:
+    """Read frames back from a metrics file, seeking through the keyframe index"""
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + '.idx'
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a process metrics file")
+
+    def frames(self, start=None, end=None):
+        """Yield (timestamp, {pid: (name, cpu, rss, io, fds)}) for frames between start and end.
+
+        Decoding starts at the last keyframe at or before `start`, found by
+        binary search on the index file, so earlier data is never read.
+        """
+        start_ms = int(start * 1000) if start is not None else None
+        end_ms = int(end * 1000) if end is not None else None
+        offset = self._seek_keyframe(start_ms) if start_ms is not None else len(MAGIC)
+
+        state = {}
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            while True:
+                head = f.read(FRAME.size)
+                if len(head) < FRAME.size:
+                    return
+                length, timestamp_ms, keyframe = FRAME.unpack(head)
+                payload = f.read(length)
+                if len(payload) < length:
+                    return  # A recorder is writing this frame right now
+                if end_ms is not None and timestamp_ms > end_ms:
+                    return
+                try:
+                    state = _decode_frame(payload, {} if keyframe else state)
+                except (IndexError, ValueError):
+                    raise ValueError(f"{self.path} is corrupt: bad frame at offset {f.tell() - length - FRAME.size}")
+                if start_ms is None or timestamp_ms >= start_ms:
+                    yield timestamp_ms / 1000, state
+
+    def span(self):
+        """(first, last) sample timestamps, or None for an empty file"""
+        entries = _read_index(self.index_path)
+        if not entries:
+            return None
+        last = None
+        for last, _ in self.frames(entries[-1][0] / 1000):
+            pass
+        return entries[0][0] / 1000, last
+
+    def _seek_keyframe(self, timestamp_ms):
+        """Offset of the last keyframe at or before `timestamp_ms`, by binary search in the index file"""
+        offset = len(MAGIC)
+        if not os.path.exists(self.index_path):
+            return offset
+        low, high = 0, os.path.getsize(self.index_path) // INDEX.size - 1
+        with open(self.index_path, 'rb') as f:
+            while low <= high:
+                middle = (low + high) // 2
+                f.seek(middle * INDEX.size)
+                keyframe_ms, keyframe_offset = INDEX.unpack(f.read(INDEX.size))
+                if keyframe_ms <= timestamp_ms:
+                    offset = keyframe_offset
+                    low = middle + 1
+                else:
+                    high = middle - 1
+        return offset
+
+    def top(self, start=None, end=None, sort='cpu', limit=10):
+        """Top consumers between start and end.
+
+        Returns (frames, rows) with rows of (pid, name, average cpu %, peak
+        rss bytes, io bytes, peak fds), largest first by `sort`. CPU is
+        averaged over every frame in the range, so short-lived processes
+        are not over-weighted.
+        """
+        totals = {}
+        frames = 0
+        for _, state in self.frames(start, end):
+            frames += 1
+            for pid, (name, cpu, rss, io, fds) in state.items():
+                item = totals.get((pid, name))
+                if item is None:
+                    totals[(pid, name)] = [cpu, rss, io, io, fds]
+                else:
+                    item[0] += cpu
+                    item[1] = max(item[1], rss)
+                    item[3] = io
+                    item[4] = max(item[4], fds)
+
+        rows = [(pid, name, cpu / 10 / frames, rss * 1024, last_io - first_io, fds)
+                for (pid, name), (cpu, rss, first_io, last_io, fds) in totals.items()]
+        column = {'cpu': 2, 'rss': 3, 'io': 4, 'fds': 5}[sort]
+        return frames, heapq.nlargest(limit, rows, key=lambda row: row[column])
+
+
+def _decode_frame(payload, previous):
+    """Decode one frame against the previous state; IndexError or ValueError if it is malformed"""
+    count, pos = get_varint(payload, 0)
+    blob, pos = _get_blob(payload, pos)
+    pids = decode_deltas(blob)
+    if len(pids) != count:
+        raise ValueError("Corrupt metrics frame")
+
+    names = [previous[pid][0] if pid in previous else '?' for pid in pids]
+    named, pos = get_varint(payload, pos)
+    for _ in range(named):
+        position, pos = get_varint(payload, pos)
+        name, pos = _get_blob(payload, pos)
+        names[position] = name.decode('utf-8', 'replace')
+
+    columns = []
+    for column in range(len(COLUMNS)):
+        blob, pos = _get_blob(payload, pos)
+        values = []
+        value_pos = 0
+        for pid in pids:
+            change, value_pos = get_varint(blob, value_pos)
+            before = previous.get(pid)
+            values.append((before[column + 1] if before else 0) + _unzigzag(change))
+        columns.append(values)
+
+    return {pid: (names[i], columns[0][i], columns[1][i], columns[2][i], columns[3][i])
+            for i, pid in enumerate(pids)}
+
+
+def _read_index(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        data = f.read()
+    usable = len(data) - len(data) % INDEX.size
+    return [INDEX.unpack_from(data, pos) for pos in range(0, usable, INDEX.size)]
+
+
+def _zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+
+def _put_blob(out, blob):
+    put_varint(out, len(blob))
+    out += blob
+
+
+def _get_blob(data, pos):
+    length, pos = get_varint(data, pos)
+    return data[pos:pos + length], pos + length
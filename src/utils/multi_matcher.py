@@ -0,0 +1,219 @@
+import os
+import re
+import sys
+import mmap
+from collections import deque
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.content_matcher import CHUNK_SIZE, SAMPLE_SIZE, ContentMatcher
+
+REGEX_PREFIX = 're:'
+FIND_LITERALS = 32  # Up to this many literals, one bytes.find each beats stepping the automaton in Python
+
+
+def load_patterns(path):
+    """Read a patterns file into a list of (is_regex, text).
+
+    One pattern per line; blank lines and lines starting with '#' are
+    skipped, and lines starting with 're:' are regular expressions.
+    """
+    patterns = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip('\r\n')
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith(REGEX_PREFIX):
+                text = line[len(REGEX_PREFIX):]
+                try:
+                    re.compile(text)
+                except re.error as e:
+                    raise ValueError(f"{path}:{number}: invalid regex: {e}")
+                patterns.append((True, text))
+            else:
+                patterns.append((False, line))
+    if not patterns:
+        raise ValueError(f"{path}: no patterns")
+    return patterns
+
+
+class AhoCorasick:
+    """Byte-level Aho-Corasick automaton compiled to a dense transition table.
+
+    The table holds 256 entries per state, with failure links already
+    folded in, so scanning costs one list lookup per input byte however
+    many patterns there are. States are stored pre-multiplied by 256 so
+    the next index is simply `state + byte`.
+    """
+
+    def __init__(self, patterns):
+        goto = [{}]
+        outputs = [[]]
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for byte in pattern:
+                following = goto[state].get(byte)
+                if following is None:
+                    following = len(goto)
+                    goto[state][byte] = following
+                    goto.append({})
+                    outputs.append([])
+                state = following
+            outputs[state].append(index)
+
+        fail = [0] * len(goto)
+        table = [0] * (len(goto) * 256)
+        for byte, following in goto[0].items():
+            table[byte] = following * 256
+
+        # Breadth-first, so every failure state is complete before it is used
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            base = state * 256
+            fallback = fail[state] * 256
+            table[base:base + 256] = table[fallback:fallback + 256]
+            for byte, following in goto[state].items():
+                fail[following] = table[fallback + byte] // 256
+                outputs[following] = outputs[following] + outputs[fail[following]]
+                table[base + byte] = following * 256
+                queue.append(following)
+
+        self.table = table
+        self.outputs = {state * 256: tuple(found) for state, found in enumerate(outputs) if found}
+
+    def scan(self, data, state=0, found=None):
+        """Feed bytes through the automaton; returns (state, set of pattern indexes)"""
+        if found is None:
+            found = set()
+        table = self.table
+        outputs = self.outputs
+        for byte in data:
+            state = table[state + byte]
+            if state in outputs:
+                found.update(outputs[state])
+        return state, found
+
+
+class MultiPatternMatcher:
+    """Report which of many literal and regex patterns occur in a file.
+
+    Literal patterns are searched in fixed-size chunked reads: a few are
+    each found with bytes.find, which runs in C, while large sets share
+    one Aho-Corasick automaton whose cost does not grow with the pattern
+    count. Regexes run over a memory map of the file: one alternation of
+    them all first rules out files none can match, then each regex not
+    yet found is searched on its own, since an alternation reports only
+    one pattern per position. Both stop as soon as every pattern of their
+    kind has been seen.
+    """
+
+    def __init__(self, patterns, max_size=None, include_binary=False, chunk_size=CHUNK_SIZE):
+        self.patterns = list(patterns)
+        self.max_size = max_size
+        self.include_binary = include_binary
+        self.chunk_size = chunk_size
+
+        literals = [(index, text.encode('utf-8')) for index, (is_regex, text) in enumerate(self.patterns)
+                    if not is_regex and text]
+        self._literal_ids = [index for index, _ in literals]
+        self._literals = [pattern for _, pattern in literals]
+        self.automaton = AhoCorasick(self._literals) if len(literals) > FIND_LITERALS else None
+
+        self.regexes = []
+        for index, (is_regex, text) in enumerate(self.patterns):
+            if is_regex:
+                try:
+                    self.regexes.append((index, re.compile(text.encode('utf-8'))))
+                except re.error as e:
+                    raise ValueError(f"Invalid regex {text!r}: {e}")
+        self.prefilter = None
+        if len(self.regexes) > 1:
+            # Backreferences and inline flags cannot always be combined; then every regex runs alone
+            try:
+                self.prefilter = re.compile(b'|'.join(b'(?:' + regex.pattern + b')' for _, regex in self.regexes))
+            except re.error:
+                self.prefilter = None
+
+    def matches(self, path, size=None):
+        """Return the sorted indexes of patterns found in the file at `path`"""
+        if self.max_size is not None:
+            if size is None:
+                size = os.path.getsize(path)
+            if size > self.max_size:
+                return []
+
+        found = set()
+        with open(path, 'rb', buffering=0) as f:
+            sample = f.read(SAMPLE_SIZE)
+            if not sample or (not self.include_binary and ContentMatcher.is_binary(sample)):
+                return []
+
+            if self.automaton is not None:
+                found = self._scan_literals(f, sample)
+            elif self._literals:
+                found = self._find_literals(f, sample)
+
+            if self.regexes and len(found) < len(self.patterns):
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    if self.prefilter is None or self.prefilter.search(data):
+                        for index, regex in self.regexes:
+                            if regex.search(data):
+                                found.add(index)
+
+        return sorted(found)
+
+    def _scan_literals(self, f, sample):
+        automaton = self.automaton
+        state, hits = automaton.scan(sample)
+        buf = bytearray(self.chunk_size)
+        view = memoryview(buf)
+        total = len(self._literal_ids)
+        while len(hits) < total:
+            read = f.readinto(buf)
+            if not read:
+                break
+            state, hits = automaton.scan(view[:read], state, hits)
+        return {self._literal_ids[hit] for hit in hits}
+
+    def _find_literals(self, f, sample):
+        # Keep the last len(longest) - 1 bytes so a literal split across two reads is still found
+        overlap = max(len(pattern) for pattern in self._literals) - 1
+        pending = list(enumerate(self._literals))
+        data = sample
+        found = set()
+        while True:
+            missing = []
+            for hit, pattern in pending:
+                if data.find(pattern) >= 0:
+                    found.add(self._literal_ids[hit])
+                else:
+                    missing.append((hit, pattern))
+            pending = missing
+            if not pending:
+                break
+            chunk = f.read(self.chunk_size)
+            if not chunk:
+                break
+            data = data[-overlap:] + chunk if overlap else chunk
+        return found
+
+
+_batch_matchers = {}
+
+def match_patterns_batch(patterns, max_size, include_binary, items):
+    """Process pool entry point: return (index, pattern indexes) for items with any match"""
+    key = (tuple(patterns), max_size, include_binary)
+    matcher = _batch_matchers.get(key)
+    if matcher is None:
+        matcher = _batch_matchers[key] = MultiPatternMatcher(patterns, max_size, include_binary)
+
+    hits = []
+    for index, (path, size) in enumerate(items):
+        try:
+            matched = matcher.matches(path, size)
+        except (OSError, ValueError):
+            continue
+        if matched:
+            hits.append((index, matched))
+    return hits
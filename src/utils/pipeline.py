@@ -0,0 +1,416 @@
+import os
+import sys
+import codecs
+import queue
+import shutil
+import threading
+import subprocess
+from collections import deque
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.file_redirection import STDOUT, is_operator, split_redirections
+from src.utils.stream_relay import has_fileno, relay
+
+QUEUE_LINES = 1024  # Lines buffered between a captured builtin and its consumer
+
+class StdoutRouter:
+    """sys.stdout (or sys.stderr) replacement that sends each thread's output to its own target"""
+
+    def __init__(self, default):
+        self.default = default
+        self._local = threading.local()
+
+    def current(self):
+        """Return the stream output from the calling thread goes to"""
+        return getattr(self._local, 'target', None) or self.default
+
+    def set_target(self, target):
+        self._local.target = target
+
+    def swap(self, target):
+        """Set the calling thread's target and return the one it replaces"""
+        previous = getattr(self._local, 'target', None)
+        self._local.target = target
+        return previous
+
+    def write(self, data):
+        return self.current().write(data)
+
+    def flush(self):
+        return self.current().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+
+class CapturedOutput:
+    """Line iterator over everything a builtin handler prints on its worker thread"""
+
+    def __init__(self):
+        self._lines = queue.Queue(maxsize=QUEUE_LINES)
+        self._partial = ''
+        self._cancelled = threading.Event()
+        self.status = 0  # The handler's exit status, set before finish()
+
+    # Writer side, used as the worker thread's stdout
+    def write(self, data):
+        self._partial += data
+        if '\n' not in self._partial:
+            return len(data)
+        *lines, self._partial = self._partial.split('\n')
+        for line in lines:
+            self._put(line + '\n')
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def finish(self):
+        if self._partial:
+            self._put(self._partial)
+            self._partial = ''
+        self._put(None)
+
+    def _put(self, item):
+        # Bounded queue gives backpressure; give up once the consumer is gone
+        while not self._cancelled.is_set():
+            try:
+                self._lines.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    # Reader side
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self._lines.get()
+        if line is None:
+            raise StopIteration
+        return line
+
+    def close(self):
+        self._cancelled.set()
+
+
+def text_sink(binary):
+    """Text writer over a binary redirect target, or None"""
+    return codecs.getwriter('utf-8')(binary, 'replace') if binary is not None else None
+
+
+class StreamStage:
+    """Line iterator over a stream handler that applies its stage's stderr redirect.
+
+    Stream handlers run on whichever thread consumes them, so stderr is
+    redirected around each step of the generator. With 2>&1 this object
+    is itself the stderr target and interleaves error lines with output.
+    The generator's return value becomes the stage's exit status.
+    """
+
+    def __init__(self, lines, err_router, stderr):
+        self._lines = lines
+        self._err_router = err_router
+        self._stderr = self if stderr == subprocess.STDOUT else text_sink(stderr)
+        self._pending = deque()
+        self._partial = ''
+        self._done = False
+        self.status = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self._pending:
+            if self._done:
+                raise StopIteration
+            previous = self._err_router.swap(self._stderr) if self._stderr is not None else None
+            try:
+                self._pending.append(next(self._lines))
+            except StopIteration as stop:
+                self._done = True
+                self.status = stop.value if isinstance(stop.value, int) else 0
+                if self._partial:
+                    self._pending.append(self._partial)
+                    self._partial = ''
+            finally:
+                if self._stderr is not None:
+                    self._err_router.set_target(previous)
+        return self._pending.popleft()
+
+    # stderr side, used for 2>&1
+    def write(self, data):
+        self._partial += data
+        *lines, self._partial = self._partial.split('\n')
+        self._pending.extend(line + '\n' for line in lines)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if hasattr(self._lines, 'close'):
+            self._lines.close()
+
+
+class PipelineExecutor:
+    """Run `a | b 2>&1 | c > file` with OS pipes between external stages"""
+
+    def __init__(self, shell):
+        self.shell = shell
+
+    def parse(self, tokens):
+        """Split tokens into stages; returns (stages, stdin_file, stdout_file, mode, errors).
+
+        errors holds one (stderr_file, stderr_mode) pair per stage, with
+        stderr_file None to leave stderr alone or STDOUT for 2>&1.
+        """
+        stages = [[]]
+        for token in tokens:
+            if is_operator(token, '|'):
+                stages.append([])
+            else:
+                stages[-1].append(token)
+
+        stdin_file = stdout_file = None
+        mode = "w"
+        parsed = []
+        errors = []
+        for i, stage in enumerate(stages):
+            args, stage_in, stage_out, stage_mode, stage_err, err_mode = split_redirections(stage)
+            if not args:
+                raise ValueError("syntax error near '|'")
+            if stage_in is not None:
+                if i != 0:
+                    raise ValueError("input redirection is only allowed on the first command")
+                stdin_file = stage_in
+            if stage_out is not None:
+                if i != len(stages) - 1:
+                    raise ValueError("output redirection is only allowed on the last command")
+                stdout_file, mode = stage_out, stage_mode
+            parsed.append(args)
+            errors.append((stage_err, err_mode))
+
+        return parsed, stdin_file, stdout_file, mode, errors
+
+    def run(self, tokens):
+        """Parse and execute a pipeline, returning the exit status of the last stage"""
+        try:
+            stages, stdin_file, stdout_file, mode, errors = self.parse(tokens)
+        except ValueError as e:
+            print(f"Pipeline error: {e}")
+            return 2
+        return self.execute(stages, stdin_file, stdout_file, mode, errors)
+
+    def execute(self, stages, stdin_file=None, stdout_file=None, mode="w", errors=None):
+        """Connect the stages and stream data through them"""
+        # Reuse a shell-wide router so pipelines in background jobs do not swap sys.stdout
+        installed = not isinstance(sys.stdout, StdoutRouter)
+        router = StdoutRouter(sys.stdout) if installed else sys.stdout
+        err_installed = not isinstance(sys.stderr, StdoutRouter)
+        err_router = StdoutRouter(sys.stderr) if err_installed else sys.stderr
+        stdout = router.current()
+        procs = []
+        threads = []
+        resources = []
+        out_file = None
+        status = 0
+        builtin = None  # Output of the last stage when it is a builtin, carrying its status
+
+        stdout.flush()
+        if installed:
+            sys.stdout = router
+        if err_installed:
+            sys.stderr = err_router
+        try:
+            # upstream is None, a readable fd, or an iterator of text lines
+            upstream = None
+            if stdin_file is not None:
+                upstream = os.open(stdin_file, os.O_RDONLY)
+            if stdout_file is not None:
+                os.makedirs(os.path.dirname(stdout_file) or ".", exist_ok=True)
+                out_file = open(stdout_file, 'ab' if mode == "a" else 'wb')
+            err_targets = [self._stderr_target(error, resources) for error in errors or ()]
+
+            for i, (program, *args) in enumerate(stages):
+                last = i == len(stages) - 1
+
+                stderr = err_targets[i] if i < len(err_targets) else None
+                if program in self.shell.command_handlers:
+                    lines = self._as_lines(upstream, resources)
+                    upstream = builtin = self._builtin_stage(program, args, lines, router, err_router,
+                                                             stderr, resources)
+                    continue
+                builtin = None
+
+                executable = shutil.which(program)
+                if not executable:
+                    print(f"{program}: command not found", file=sys.stderr)
+                    self._discard(upstream)
+                    upstream = iter(())
+                    status = 127
+                    continue
+
+                stdin = self._as_fd(upstream, i, threads)
+                read_fd = None
+                if not last:
+                    read_fd, proc_stdout = os.pipe()
+                elif out_file is not None:
+                    proc_stdout = out_file.fileno()
+                elif has_fileno(stdout):
+                    proc_stdout = stdout.fileno()
+                else:
+                    read_fd, proc_stdout = os.pipe()
+
+                try:
+                    procs.append(subprocess.Popen([executable] + args, stdin=stdin, stdout=proc_stdout,
+                                                  stderr=stderr))
+                finally:
+                    # The child holds its own copies of these descriptors
+                    if isinstance(stdin, int) and stdin >= 0:
+                        os.close(stdin)
+                    if read_fd is not None:
+                        os.close(proc_stdout)
+                upstream = read_fd
+                status = None
+
+            self._drain(upstream, out_file, stdout)
+
+            for thread in threads:
+                thread.join()
+            # Pipes no builtin read are closed so upstream writers see EPIPE instead of blocking
+            for resource in resources:
+                resource.close()
+            for proc in procs:
+                proc.wait()
+
+            if builtin is not None:
+                status = builtin.status
+            elif status is None:
+                status = procs[-1].returncode
+            return status
+
+        except KeyboardInterrupt:
+            for proc in procs:
+                if proc.poll() is None:
+                    proc.terminate()
+            raise
+        except OSError as e:
+            print(f"Pipeline error: {e}")
+            return 1
+        finally:
+            if installed:
+                sys.stdout = router.default
+            if err_installed:
+                sys.stderr = err_router.default
+            for resource in resources:
+                resource.close()
+            if out_file is not None:
+                out_file.close()
+
+    def _stderr_target(self, error, resources):
+        """Popen stderr argument for one stage's (stderr_file, stderr_mode)"""
+        stderr_file, stderr_mode = error
+        if stderr_file is None:
+            return None
+        if stderr_file == STDOUT:
+            return subprocess.STDOUT
+        os.makedirs(os.path.dirname(stderr_file) or ".", exist_ok=True)
+        err_file = open(stderr_file, 'ab' if stderr_mode == "a" else 'wb')
+        resources.append(err_file)
+        return err_file
+
+    def _builtin_stage(self, program, args, lines, router, err_router, stderr, resources):
+        """Return an iterator of output lines for a builtin stage; its .status is set once it ends.
+
+        `stderr` is the stage's Popen-style stderr: None, a binary file or
+        subprocess.STDOUT for 2>&1.
+        """
+        stream = self.shell.stream_handlers.get(program)
+        if stream is not None:
+            return StreamStage(stream(args, lines), err_router, stderr)
+
+        # Any other builtin runs on a worker thread with its prints captured
+        handler = self.shell.command_handlers[program]
+        captured = CapturedOutput()
+        resources.append(captured)
+        err_target = captured if stderr == subprocess.STDOUT else text_sink(stderr)
+
+        def worker():
+            router.set_target(captured)
+            err_router.set_target(err_target)
+            try:
+                result = handler(args)
+                captured.status = result if isinstance(result, int) else 0
+            except Exception as e:
+                print(f"Error executing {program}: {e}", file=sys.stderr)
+                captured.status = 1
+            finally:
+                captured.finish()
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return captured
+
+    def _as_lines(self, upstream, resources):
+        """Expose upstream output to a builtin as an iterator of text lines"""
+        if upstream is None or not isinstance(upstream, int):
+            return upstream
+        reader = os.fdopen(upstream, 'r', encoding='utf-8', errors='replace')
+        resources.append(reader)
+        return reader
+
+    def _as_fd(self, upstream, index, threads):
+        """Expose upstream output to an external command as a file descriptor"""
+        if upstream is None:
+            # The first command reads the terminal; later ones get nothing
+            return None if index == 0 else subprocess.DEVNULL
+        if isinstance(upstream, int):
+            return upstream
+
+        read_fd, write_fd = os.pipe()
+        thread = threading.Thread(target=self._pump, args=(upstream, write_fd), daemon=True)
+        thread.start()
+        threads.append(thread)
+        return read_fd
+
+    def _pump(self, lines, fd):
+        """Feed builtin output lines into a pipe"""
+        try:
+            for line in lines:
+                data = line.encode('utf-8', 'replace')
+                while data:
+                    written = os.write(fd, data)
+                    data = data[written:]
+        except BrokenPipeError:
+            pass
+        except Exception as e:
+            print(f"Pipeline error: {e}", file=sys.stderr)
+        finally:
+            os.close(fd)
+            if hasattr(lines, 'close'):
+                lines.close()
+
+    def _drain(self, upstream, out_file, stdout):
+        """Write the final stage's output to the redirect target or the terminal"""
+        if upstream is None:
+            return
+        if isinstance(upstream, int):
+            try:
+                relay(upstream, stdout)
+            finally:
+                os.close(upstream)
+            return
+
+        for line in upstream:
+            if out_file is not None:
+                out_file.write(line.encode('utf-8', 'replace'))
+            else:
+                stdout.write(line)
+        stdout.flush()
+
+    def _discard(self, upstream):
+        if isinstance(upstream, int):
+            os.close(upstream)
+        elif hasattr(upstream, 'close'):
+            upstream.close()
@@ -0,0 +1,120 @@
+import os
+import sys
+import time
+import heapq
+import psutil
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SORT_KEYS = {
+    'cpu': lambda record: record.cpu,
+    'mem': lambda record: record.mem,
+    'rss': lambda record: record.rss,
+    'io': lambda record: record.io_rate,
+    'threads': lambda record: record.threads,
+}
+
+
+class ProcRecord:
+    """One process at one sample. io is cumulative read+write bytes, io_rate bytes/s since the last sample"""
+    __slots__ = ('pid', 'ppid', 'name', 'cpu', 'mem', 'rss', 'threads', 'io', 'io_rate', 'fds')
+
+    def __init__(self, pid, ppid, name, cpu, mem, rss, threads, io, io_rate, fds):
+        self.pid = pid
+        self.ppid = ppid
+        self.name = name
+        self.cpu = cpu
+        self.mem = mem
+        self.rss = rss
+        self.threads = threads
+        self.io = io
+        self.io_rate = io_rate
+        self.fds = fds
+
+
+class ProcessSampler:
+    """Sample every process in one pass, keeping psutil.Process objects between samples.
+
+    psutil measures CPU as the change since the previous call on the same
+    Process object, so reusing the objects makes each sample cover the
+    whole interval since the last one: callers prime once, sleep once and
+    sample, instead of blocking per process. Each process is read inside
+    oneshot(), which serves all fields from a single set of /proc reads.
+    """
+
+    def __init__(self, fds=False):
+        self.fds = fds  # Counting open files lists /proc/<pid>/fd, so it is opt-in
+        self._procs = {}
+        self._io = {}  # pid -> cumulative I/O bytes at the previous sample
+        self._last = None
+        self._total_memory = psutil.virtual_memory().total
+
+    def prime(self):
+        """Start the CPU and I/O counters for every process without reporting anything"""
+        self.sample()
+
+    def sample(self):
+        """Return a ProcRecord for every live process, measured since the previous call"""
+        now = time.monotonic()
+        elapsed = now - self._last if self._last is not None else 0
+        self._last = now
+
+        procs = {}
+        io_totals = {}
+        records = []
+        for proc in psutil.process_iter():
+            # Keep the object from the previous sample so its CPU times carry over
+            proc = self._procs.get(proc.pid, proc)
+            try:
+                with proc.oneshot():
+                    record = self._read(proc, elapsed)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            procs[proc.pid] = proc
+            io_totals[proc.pid] = record.io
+            records.append(record)
+
+        # Processes that exited drop out here, along with their counters
+        self._procs = procs
+        self._io = io_totals
+        return records
+
+    def snapshot(self, interval):
+        """Prime, wait one interval and sample: one sleep however many processes there are"""
+        self.prime()
+        time.sleep(interval)
+        return self.sample()
+
+    def _read(self, proc, elapsed):
+        cpu = proc.cpu_percent(None)
+        rss = proc.memory_info().rss
+        io = _optional(lambda: sum(proc.io_counters()[2:4]), 0)  # read_bytes, write_bytes
+        previous = self._io.get(proc.pid)
+        io_rate = (io - previous) / elapsed if previous is not None and elapsed > 0 else 0.0
+        return ProcRecord(
+            proc.pid,
+            _optional(proc.ppid, 0),
+            _optional(proc.name, '?'),
+            cpu,
+            rss * 100.0 / self._total_memory,
+            rss,
+            _optional(proc.num_threads, 0),
+            io,
+            max(io_rate, 0.0),
+            _optional(proc.num_fds, -1) if self.fds else -1,
+        )
+
+
+def top(records, sort='cpu', limit=20):
+    """The `limit` largest records by `sort`, without sorting the whole table"""
+    key = SORT_KEYS[sort]
+    if limit is None or limit <= 0:
+        return sorted(records, key=key, reverse=True)
+    return heapq.nlargest(limit, records, key=key)
+
+
+def _optional(read, default):
+    """Read a field that may be hidden from us without losing the whole record"""
+    try:
+        return read()
+    except (psutil.AccessDenied, AttributeError, NotImplementedError):
+        return default
@@ -0,0 +1,259 @@
+import os
+import sys
+import asyncio
+import psutil
+import humanize
+from array import array
+from prompt_toolkit.application import Application, get_app
+from prompt_toolkit.key_binding import KeyBindings
+from prompt_toolkit.layout import Layout, HSplit, Window
+from prompt_toolkit.layout.controls import FormattedTextControl
+from prompt_toolkit.keys import Keys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.process_sampler import ProcessSampler, top
+
+HISTORY = 30  # Samples of CPU history kept per process for the sparkline
+SPARKS = '▁▂▃▄▅▆▇█'
+SORTS = {'c': 'cpu', 'm': 'mem', 'r': 'rss', 'i': 'io', 't': 'threads'}
+HELP = "↑↓ move  c/m/r/i/t sort  / filter  k kill  p pause  q quit"
+
+
+class History:
+    """Fixed-size ring buffer of one process's CPU samples"""
+    __slots__ = ('values', 'pos', 'filled')
+
+    def __init__(self):
+        self.values = array('f', bytes(4 * HISTORY))
+        self.pos = 0
+        self.filled = 0
+
+    def add(self, value):
+        self.values[self.pos] = value
+        self.pos = (self.pos + 1) % HISTORY
+        self.filled = min(self.filled + 1, HISTORY)
+
+    def sparkline(self, width):
+        count = min(width, self.filled)
+        start = self.pos - count
+        samples = [self.values[index % HISTORY] for index in range(start, self.pos)]
+        peak = max(100.0, max(samples, default=0.0))
+        line = ''.join(SPARKS[min(len(SPARKS) - 1, int(value / peak * len(SPARKS)))] for value in samples)
+        return line.rjust(width)
+
+
+class ProcessTop:
+    """Full-screen process monitor refreshed from one ProcessSampler.
+
+    The sampler keeps Process objects between frames, so each frame's CPU
+    figures cover exactly the time since the previous one with no extra
+    sleeping. Sampling runs off the event loop; formatted rows are cached
+    until the next sample, and prompt_toolkit only rewrites the screen
+    cells that changed.
+    """
+
+    def __init__(self, interval=2.0, sort='cpu'):
+        self.interval = interval
+        self.sort = sort
+        self.sampler = ProcessSampler()
+        self.records = None
+        self.system = None
+        self.histories = {}
+        self.generation = 0
+        self.cursor = 0
+        self.top = 0
+        self.selected = None  # PID under the cursor, followed across re-sorts
+        self.filter = ''
+        self.editing_filter = False
+        self.paused = False
+        self.confirm_kill = None
+        self.message = ''
+        self._rows = []
+        self._row_cache = {}  # pid -> (generation, formatted line)
+
+    def run(self):
+        kb = KeyBindings()
+
+        @kb.add(Keys.Any)
+        @kb.add(Keys.Up)
+        @kb.add(Keys.Down)
+        @kb.add(Keys.PageUp)
+        @kb.add(Keys.PageDown)
+        @kb.add(Keys.Home)
+        @kb.add(Keys.End)
+        @kb.add(Keys.Enter)
+        @kb.add(Keys.Backspace)
+        @kb.add(Keys.Escape, eager=True)
+        @kb.add(Keys.ControlC)
+        def _(event):
+            press = event.key_sequence[0]
+            self._handle(press.key, press.data, event.app)
+
+        layout = Layout(HSplit([
+            Window(FormattedTextControl(self._render_header), height=3),
+            Window(FormattedTextControl(self._render_rows)),
+            Window(FormattedTextControl(self._render_status), height=1, style='reverse'),
+        ]))
+        app = Application(layout=layout, key_bindings=kb, full_screen=True)
+
+        psutil.cpu_percent(None)
+        self.sampler.prime()
+        app.run(pre_run=lambda: app.create_background_task(self._refresh(app)))
+
+    async def _refresh(self, app):
+        loop = asyncio.get_event_loop()
+        delay = min(self.interval, 0.5)  # Show the first frame quickly
+        while True:
+            await asyncio.sleep(delay)
+            delay = self.interval
+            if self.paused:
+                continue
+            records = await loop.run_in_executor(None, self.sampler.sample)
+            # Histories are only touched here, on the event loop, never from the sampling thread
+            histories = {}
+            for record in records:
+                history = self.histories.get(record.pid) or History()
+                history.add(record.cpu)
+                histories[record.pid] = history
+            self.histories = histories
+            self.records = records
+            self.system = (psutil.cpu_percent(None), psutil.virtual_memory())
+            self.generation += 1
+            app.invalidate()
+
+    # Input
+
+    def _handle(self, key, data, app):
+        if self.editing_filter:
+            if key == Keys.Enter:
+                self.editing_filter = False
+            elif key == Keys.Escape:
+                self.editing_filter = False
+                self.filter = ''
+            elif key == Keys.Backspace:
+                self.filter = self.filter[:-1]
+            elif key == Keys.ControlC:
+                app.exit()
+            elif data and data.isprintable():
+                self.filter += data
+            self.cursor = self.top = 0
+            return
+
+        if self.confirm_kill is not None:
+            pid, self.confirm_kill = self.confirm_kill, None
+            if key in ('y', 'Y'):
+                self._kill(pid)
+            else:
+                self.message = "Kill cancelled"
+            return
+
+        self.message = ''
+        rows = self._rows
+        page = max(1, self._visible_rows() - 1)
+        if key == Keys.Up:
+            self.cursor = max(0, self.cursor - 1)
+        elif key == Keys.Down:
+            self.cursor = min(len(rows) - 1, self.cursor + 1) if rows else 0
+        elif key == Keys.PageUp:
+            self.cursor = max(0, self.cursor - page)
+        elif key == Keys.PageDown:
+            self.cursor = min(len(rows) - 1, self.cursor + page) if rows else 0
+        elif key == Keys.Home:
+            self.cursor = 0
+        elif key == Keys.End:
+            self.cursor = max(0, len(rows) - 1)
+        elif key in SORTS:
+            self.sort = SORTS[key]
+        elif key == '/':
+            self.editing_filter = True
+        elif key == 'p':
+            self.paused = not self.paused
+            self.message = "Paused" if self.paused else "Resumed"
+        elif key == 'k':
+            if rows:
+                record = rows[self.cursor]
+                self.confirm_kill = record.pid
+                self.message = f"Kill {record.pid} ({record.name})? (y/N)"
+        elif key in ('q', Keys.Escape, Keys.ControlC):
+            app.exit()
+            return
+        self.selected = rows[self.cursor].pid if rows and self.cursor < len(rows) else None
+
+    def _kill(self, pid):
+        try:
+            psutil.Process(pid).terminate()
+            self.message = f"Sent SIGTERM to {pid}"
+        except psutil.NoSuchProcess:
+            self.message = f"Process {pid} has already exited"
+        except psutil.AccessDenied:
+            self.message = f"Permission denied to kill process {pid}"
+
+    # Rendering
+
+    def _visible_rows(self):
+        try:
+            return max(1, get_app().output.get_size().rows - 5)
+        except Exception:
+            return 20
+
+    def _render_header(self):
+        if self.records is None:
+            return [('bold', " Sampling processes...\n")]
+        cpu, memory = self.system
+        return [
+            ('bold', f" CPU {cpu:5.1f}%   Memory {memory.percent:.1f}% of {humanize.naturalsize(memory.total)}"
+                     f"   {len(self.records)} processes   sorted by {self.sort}"
+                     f"{'   filter: ' + self.filter if self.filter else ''}\n"),
+            ('', "\n"),
+            ('bold', f" {'PID':>7} {'CPU%':>6} {'MEM%':>5} {'RSS':>10} {'THR':>4} {'IO/s':>10}  "
+                     f"{'CPU history':<{HISTORY}}  {'Name'}\n"),
+        ]
+
+    def _render_rows(self):
+        if self.records is None:
+            return []
+        records = self.records
+        if self.filter:
+            needle = self.filter.lower()
+            records = [record for record in records
+                       if needle in record.name.lower() or needle == str(record.pid)]
+        self._rows = rows = top(records, self.sort, None)
+        if not rows:
+            return [('italic', " (no matching processes)")]
+
+        # Keep the cursor on the same process when the order changes
+        if self.selected is not None:
+            for index, record in enumerate(rows):
+                if record.pid == self.selected:
+                    self.cursor = index
+                    break
+        self.cursor = min(self.cursor, len(rows) - 1)
+
+        height = self._visible_rows()
+        if self.cursor < self.top:
+            self.top = self.cursor
+        elif self.cursor >= self.top + height:
+            self.top = self.cursor - height + 1
+
+        # Only visible rows are formatted, and only once per sample
+        cache = {}
+        fragments = []
+        for index in range(self.top, min(len(rows), self.top + height)):
+            record = rows[index]
+            cached = self._row_cache.get(record.pid)
+            if cached is None or cached[0] != self.generation:
+                history = self.histories.get(record.pid)
+                spark = history.sparkline(HISTORY) if history else ' ' * HISTORY
+                cached = (self.generation,
+                          f" {record.pid:>7} {record.cpu:>6.1f} {record.mem:>5.1f} "
+                          f"{humanize.naturalsize(record.rss):>10} {record.threads:>4} "
+                          f"{humanize.naturalsize(record.io_rate):>10}  {spark}  {record.name}\n")
+            cache[record.pid] = cached
+            fragments.append(('reverse' if index == self.cursor else '', cached[1]))
+        self._row_cache = cache
+        return fragments
+
+    def _render_status(self):
+        if self.editing_filter:
+            return f" Filter: {self.filter}_   (Enter apply, Esc clear)"
+        return f" {self.message or HELP}"
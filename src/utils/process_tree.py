@@ -0,0 +1,136 @@
+import os
+import sys
+import time
+import psutil
+import humanize
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.process_sampler import ProcRecord
+
+SNAPSHOT_ATTRS = ['pid', 'ppid', 'name', 'cpu_times', 'create_time', 'memory_info', 'num_threads']
+
+
+def snapshot_records():
+    """Read every process in one process_iter pass, without waiting.
+
+    With no interval to measure over, CPU is the lifetime average, the
+    same figure ps reports.
+    """
+    now = time.time()
+    total_memory = psutil.virtual_memory().total
+    records = []
+    for proc in psutil.process_iter(SNAPSHOT_ATTRS):
+        info = proc.info
+        if info['ppid'] is None:
+            continue
+        cpu_times = info['cpu_times']
+        age = now - info['create_time'] if info['create_time'] else 0
+        cpu = (cpu_times.user + cpu_times.system) * 100.0 / age if cpu_times and age > 0 else 0.0
+        rss = info['memory_info'].rss if info['memory_info'] else 0
+        records.append(ProcRecord(info['pid'], info['ppid'], info['name'] or '?', cpu,
+                                  rss * 100.0 / total_memory, rss, info['num_threads'] or 0, 0, 0.0, -1))
+    return records
+
+
+class SubtreeTotals:
+    """CPU, memory, threads and process count of a process and all its descendants"""
+    __slots__ = ('cpu', 'mem', 'rss', 'threads', 'processes')
+
+    def __init__(self, record):
+        self.cpu = record.cpu
+        self.mem = record.mem
+        self.rss = record.rss
+        self.threads = record.threads
+        self.processes = 1
+
+    def add(self, other):
+        self.cpu += other.cpu
+        self.mem += other.mem
+        self.rss += other.rss
+        self.threads += other.threads
+        self.processes += other.processes
+
+
+class ProcessTree:
+    """Parent -> children adjacency built from one snapshot, in time linear in the process count.
+
+    Subtree totals and the shape signatures used to collapse identical
+    siblings are computed in a single bottom-up pass.
+    """
+
+    def __init__(self, records):
+        self.records = {record.pid: record for record in records}
+        self.children = {}
+        for record in records:
+            if record.ppid != record.pid and record.ppid in self.records:
+                self.children.setdefault(record.ppid, []).append(record.pid)
+        for pids in self.children.values():
+            pids.sort()
+        self.roots = sorted(record.pid for record in records
+                            if record.ppid == record.pid or record.ppid not in self.records)
+
+        self.totals = {}
+        self.shapes = {}  # pid -> id shared by every identical subtree
+        shape_ids = {}
+        for pid in reversed(self._preorder(self.roots)):
+            totals = SubtreeTotals(self.records[pid])
+            child_shapes = []
+            for child in self.children.get(pid, ()):
+                totals.add(self.totals[child])
+                child_shapes.append(self.shapes[child])
+            self.totals[pid] = totals
+            shape = (self.records[pid].name, tuple(sorted(child_shapes)))
+            self.shapes[pid] = shape_ids.setdefault(shape, len(shape_ids))
+
+    def _preorder(self, roots):
+        order = []
+        stack = list(reversed(roots))
+        while stack:
+            pid = stack.pop()
+            order.append(pid)
+            stack.extend(reversed(self.children.get(pid, ())))
+        return order
+
+    def render(self, roots=None, collapse=True):
+        """Return the tree as text lines; identical sibling subtrees become one `N*[name]` line"""
+        lines = []
+        # (pid group, prefix for this line, prefix for its children)
+        stack = [(group, '', '') for group in reversed(self._group(roots or self.roots, collapse))]
+        while stack:
+            group, prefix, child_prefix = stack.pop()
+            lines.append(prefix + self._describe(group))
+            groups = self._group(self.children.get(group[0], ()), collapse)
+            for index in range(len(groups) - 1, -1, -1):
+                last = index == len(groups) - 1
+                stack.append((groups[index],
+                              child_prefix + ('└─ ' if last else '├─ '),
+                              child_prefix + ('   ' if last else '│  ')))
+        return lines
+
+    def _group(self, pids, collapse):
+        """Split sibling pids into groups of identical subtrees, keeping first-seen order"""
+        if not collapse:
+            return [[pid] for pid in pids]
+        groups = {}
+        for pid in pids:
+            groups.setdefault(self.shapes[pid], []).append(pid)
+        return list(groups.values())
+
+    def _describe(self, group):
+        record = self.records[group[0]]
+        if len(group) == 1:
+            text = (f"{record.name} (PID: {record.pid}, CPU: {record.cpu:.1f}%, "
+                    f"MEM: {record.mem:.1f}%, THR: {record.threads})")
+        else:
+            cpu = sum(self.records[pid].cpu for pid in group)
+            rss = sum(self.records[pid].rss for pid in group)
+            pids = ', '.join(str(pid) for pid in group[:4]) + (', ...' if len(group) > 4 else '')
+            text = f"{len(group)}*[{record.name}] (PIDs: {pids}, CPU: {cpu:.1f}%, RSS: {humanize.naturalsize(rss)})"
+
+        if self.children.get(group[0]):
+            totals = [self.totals[pid] for pid in group]
+            text += (f"  [subtree: {sum(t.processes for t in totals)} procs, "
+                     f"CPU {sum(t.cpu for t in totals):.1f}%, "
+                     f"RSS {humanize.naturalsize(sum(t.rss for t in totals))}, "
+                     f"THR {sum(t.threads for t in totals)}]")
+        return text
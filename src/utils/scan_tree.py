@@ -0,0 +1,263 @@
+import os
+import sys
+import json
+import time
+import shutil
+from array import array
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.fs_walker import ParallelWalker
+from src.utils.dir_size_cache import allocated_bytes
+
+MAGIC = b'NXSCAN2\n'
+ARRAYS = ('parent', 'first', 'count', 'size', 'allocated', 'items', 'link')
+FLAG_DIR = 1
+FLAG_LINKED = 2   # Extra name of a hard-linked inode; not added to directory totals
+FLAG_DELETED = 4
+
+
+def walk_entries(root, workers=8, one_filesystem=False, rules=None):
+    """Yield the DirEntry of everything under `root`, stat already cached.
+
+    Ignored paths, entries that cannot be stat'ed and, with
+    `one_filesystem`, directories on other devices are left out, and the
+    walk never descends into them.
+    """
+    dev = os.stat(root, follow_symlinks=False).st_dev
+
+    def descend(entry):
+        if rules is not None and rules.ignored(entry.path, True):
+            return False
+        return not one_filesystem or entry.stat(follow_symlinks=False).st_dev == dev
+
+    for entry in ParallelWalker(workers=workers, descend=descend).walk(root):
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if rules is not None and rules.ignored(entry.path, is_dir):
+                continue
+            stat = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        if is_dir and one_filesystem and stat.st_dev != dev:
+            continue
+        yield entry
+
+
+class ScanTree:
+    """One-shot scan of a directory tree held in flat arrays.
+
+    Node 0 is the root. Nodes are stored breadth-first, so the children of
+    a directory occupy the contiguous range first[n] .. first[n] + count[n].
+    For directories size, allocated and items are subtree totals. Names are
+    interned, since the same file names repeat throughout a tree. Every
+    name of a hard-linked inode has link[n] set to the node first seen for
+    it, the one whose size is counted; other nodes have -1.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.scanned = time.time()
+        self.names = []
+        self.flags = bytearray()
+        self.parent = array('q')
+        self.first = array('q')
+        self.count = array('q')
+        self.size = array('q')
+        self.allocated = array('q')
+        self.items = array('q')
+        self.link = array('q')
+        self._link_groups = None  # link id -> nodes, built on the first delete
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def scan(cls, root, workers=8, one_filesystem=False, rules=None, progress=None):
+        """Scan `root` with walk_entries() and build the tree"""
+        root = os.path.abspath(root)
+        root_stat = os.stat(root, follow_symlinks=False)
+
+        # Group the walker's unordered output by directory, then lay it out breadth-first
+        listings = {}
+        start = last_report = time.time()
+        seen = dirs = 0
+        for entry in walk_entries(root, workers, one_filesystem, rules):
+            is_dir = entry.is_dir(follow_symlinks=False)
+            stat = entry.stat(follow_symlinks=False)
+            listings.setdefault(os.path.dirname(entry.path), []).append((entry.name, is_dir, stat))
+            seen += 1
+            dirs += is_dir
+            if progress is not None and time.time() - last_report > 0.25:
+                last_report = time.time()
+                progress(dirs, seen, last_report - start)
+
+        tree = cls(root)
+        tree._layout(root, root_stat, listings)
+        return tree
+
+    def _layout(self, root, root_stat, listings):
+        self._append('', -1, True, root_stat)
+        seen_links = {}  # (dev, ino) -> first node seen for it
+        paths = [root]
+        node = 0
+        while node < len(self.names):
+            if self.flags[node] & FLAG_DIR:
+                children = listings.pop(paths[node], ())
+                self.first[node] = len(self.names)
+                self.count[node] = len(children)
+                for name, is_dir, stat in children:
+                    child = self._append(sys.intern(name), node, is_dir, stat)
+                    paths.append(os.path.join(paths[node], name) if is_dir else None)
+                    if not is_dir and stat.st_nlink > 1:
+                        counted = seen_links.setdefault((stat.st_dev, stat.st_ino), child)
+                        self.link[child] = counted
+                        if counted != child:
+                            self.flags[child] |= FLAG_LINKED
+            node += 1
+
+        # Children follow their parents, so one reverse pass sums every subtree
+        for node in range(len(self.names) - 1, 0, -1):
+            if self.flags[node] & FLAG_LINKED:
+                continue
+            parent = self.parent[node]
+            self.size[parent] += self.size[node]
+            self.allocated[parent] += self.allocated[node]
+            self.items[parent] += self.items[node]
+
+    def _append(self, name, parent, is_dir, stat):
+        self.names.append(name)
+        self.flags.append(FLAG_DIR if is_dir else 0)
+        self.parent.append(parent)
+        self.first.append(0)
+        self.count.append(0)
+        self.size.append(stat.st_size)
+        self.allocated.append(allocated_bytes(stat))
+        self.items.append(1)
+        self.link.append(-1)
+        return len(self.names) - 1
+
+    # Queries
+
+    def is_dir(self, node):
+        return bool(self.flags[node] & FLAG_DIR)
+
+    def children(self, node, sort='size'):
+        """Live children of `node`, largest first, or by name"""
+        start = self.first[node]
+        nodes = [child for child in range(start, start + self.count[node])
+                 if not self.flags[child] & FLAG_DELETED]
+        if sort == 'name':
+            nodes.sort(key=lambda child: self.names[child])
+        elif sort == 'items':
+            nodes.sort(key=lambda child: self.items[child], reverse=True)
+        elif sort == 'allocated':
+            nodes.sort(key=lambda child: self.allocated[child], reverse=True)
+        else:
+            nodes.sort(key=lambda child: self.size[child], reverse=True)
+        return nodes
+
+    def path(self, node):
+        parts = []
+        while node > 0:
+            parts.append(self.names[node])
+            node = self.parent[node]
+        return os.path.join(self.root, *reversed(parts))
+
+    # Changes
+
+    def delete(self, node):
+        """Remove a node's file or directory from disk and from the tree"""
+        if node == 0:
+            raise ValueError("Cannot delete the scan root")
+        path = self.path(node)
+        if self.is_dir(node):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+        self.flags[node] |= FLAG_DELETED
+        if self.flags[node] & FLAG_LINKED:
+            return
+        self._add_to_ancestors(node, -self.size[node], -self.allocated[node], -self.items[node])
+
+        # An inode counted under the deleted node lives on through its other
+        # names; the first surviving one takes over its size
+        for gone in self._subtree(node):
+            if self.link[gone] < 0 or self.flags[gone] & FLAG_LINKED:
+                continue
+            for other in self._linked_nodes(self.link[gone]):
+                if self.flags[other] & FLAG_LINKED and self._alive(other):
+                    self.flags[other] &= ~FLAG_LINKED
+                    self._add_to_ancestors(other, self.size[other], self.allocated[other], self.items[other])
+                    break
+
+    def _add_to_ancestors(self, node, size, allocated, items):
+        ancestor = self.parent[node]
+        while ancestor >= 0:
+            self.size[ancestor] += size
+            self.allocated[ancestor] += allocated
+            self.items[ancestor] += items
+            ancestor = self.parent[ancestor]
+
+    def _subtree(self, node):
+        """`node` and its live descendants"""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            yield node
+            if self.flags[node] & FLAG_DIR:
+                start = self.first[node]
+                stack.extend(child for child in range(start, start + self.count[node])
+                             if not self.flags[child] & FLAG_DELETED)
+
+    def _linked_nodes(self, link):
+        if self._link_groups is None:
+            self._link_groups = {}
+            for node, group in enumerate(self.link):
+                if group >= 0:
+                    self._link_groups.setdefault(group, []).append(node)
+        return self._link_groups.get(link, ())
+
+    def _alive(self, node):
+        """False if the node or any directory above it has been deleted"""
+        while node >= 0:
+            if self.flags[node] & FLAG_DELETED:
+                return False
+            node = self.parent[node]
+        return True
+
+    # Persistence
+
+    def save(self, path):
+        """Write the tree to `path` so it can be explored later without rescanning"""
+        header = json.dumps({'root': self.root, 'scanned': self.scanned, 'nodes': len(self)}).encode('utf-8')
+        names = '\0'.join(self.names).encode('utf-8', 'surrogateescape')
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(header + b'\n')
+            f.write(len(names).to_bytes(8, 'little'))
+            f.write(names)
+            f.write(bytes(self.flags))
+            for name in ARRAYS:
+                getattr(self, name).tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        """Read a tree written by save()"""
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a disk scan export")
+            header = json.loads(f.readline())
+            nodes = header['nodes']
+            tree = cls(header['root'])
+            tree.scanned = header['scanned']
+            names = f.read(int.from_bytes(f.read(8), 'little')).decode('utf-8', 'surrogateescape')
+            tree.names = [sys.intern(name) for name in names.split('\0')] if nodes else []
+            tree.flags = bytearray(f.read(nodes))
+            for name in ARRAYS:
+                values = array('q')
+                values.fromfile(f, nodes)
+                setattr(tree, name, values)
+        if len(tree.names) != nodes or len(tree.flags) != nodes:
+            raise ValueError(f"{path} is truncated")
+        return tree
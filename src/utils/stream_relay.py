@@ -0,0 +1,62 @@
+import io
+import os
+import sys
+import codecs
+import subprocess
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CHUNK_SIZE = 64 * 1024
+
+def has_fileno(stream):
+    """Return True if `stream` is backed by a real OS file descriptor"""
+    try:
+        stream.fileno()
+        return True
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return False
+
+
+def relay(fd, stream):
+    """Copy bytes from `fd` to `stream` chunk by chunk as they arrive"""
+    binary = getattr(stream, 'buffer', None)
+    decoder = None if binary is not None else codecs.getincrementaldecoder('utf-8')('replace')
+
+    while True:
+        chunk = os.read(fd, CHUNK_SIZE)
+        if not chunk:
+            break
+        if binary is not None:
+            binary.write(chunk)
+            binary.flush()
+        else:
+            stream.write(decoder.decode(chunk))
+            stream.flush()
+
+    if decoder is not None:
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            stream.write(tail)
+
+
+def run_streaming(argv, stdout=None):
+    """Run `argv`, streaming its output instead of buffering it.
+
+    The child inherits stdout directly when it is a real file or TTY;
+    otherwise output is relayed through a pipe.
+    """
+    stdout = stdout if stdout is not None else sys.stdout
+    stdout.flush()
+
+    if has_fileno(stdout):
+        return subprocess.run(argv, stdout=stdout.fileno()).returncode
+
+    proc = subprocess.Popen(argv, stdout=subprocess.PIPE)
+    try:
+        relay(proc.stdout.fileno(), stdout)
+    except KeyboardInterrupt:
+        proc.terminate()
+        proc.wait()
+        raise
+    finally:
+        proc.stdout.close()
+    return proc.wait()
@@ -0,0 +1,277 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.fs_walker import ParallelWalker
+from src.utils.content_matcher import SAMPLE_SIZE
+from src.utils.varint import encode_deltas, decode_deltas
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (
+    path TEXT PRIMARY KEY,
+    built REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    binary INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    trigram INTEGER PRIMARY KEY,
+    last_id INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+BATCH_FILES = 1000  # Files whose postings are merged into the database per transaction
+
+
+def trigrams(data):
+    """Return the set of 3-byte sequences in `data` packed into ints"""
+    return {(a << 16) | (b << 8) | c for a, b, c in set(zip(data, data[1:], data[2:]))}
+
+
+class TrigramIndex:
+    """Trigram inverted index of file contents for substring search.
+
+    Each trigram maps to the ids of files containing it, stored as a
+    delta-encoded varint list. File ids only grow, so new postings are
+    appended to the end of a list; changed or deleted files simply lose
+    their row in `files`, and their stale ids are dropped at query time
+    until the lists are compacted.
+    """
+
+    def __init__(self, db_path, max_file_size=1024 * 1024):
+        self.db_path = str(db_path)
+        self.max_file_size = max_file_size
+        # Indexing runs on a background job thread; SQLite connections are per thread
+        self._local = threading.local()
+
+    @property
+    def db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.db_path)
+            # WAL lets searches read while the indexer writes
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            self._local.db = db
+        return db
+
+    def exists(self):
+        return os.path.exists(self.db_path)
+
+    def covering_root(self, path):
+        """Return the indexed root containing `path`, or None"""
+        if not self.exists():
+            return None
+        path = os.path.abspath(path)
+        for (root,) in self.db.execute("SELECT path FROM roots"):
+            if path == root or path.startswith(root.rstrip(os.sep) + os.sep):
+                return root
+        return None
+
+    # Indexing
+
+    def build(self, root):
+        """Index every file under `root` from scratch; returns (indexed, removed)"""
+        root = os.path.abspath(root)
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO roots (path, built) VALUES (?, 0)", (root,))
+        return self._sync(root, rebuild=True)
+
+    def update(self, root):
+        """Reindex files whose size or mtime changed; returns (indexed, removed)"""
+        root = os.path.abspath(root)
+        if self.covering_root(root) is None:
+            raise ValueError(f"{root} has no content index; run 'search --content-index build {root}' first")
+        return self._sync(root, rebuild=False)
+
+    def _sync(self, root, rebuild):
+        known = {} if rebuild else self._files_under(root)
+        if rebuild:
+            self._forget(list(self._files_under(root).values()))
+
+        seen = set()
+        batch = []
+        indexed = 0
+        walker = ParallelWalker()
+        for entry in walker.walk(root):
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            seen.add(entry.path)
+            previous = known.get(entry.path)
+            if previous is not None and previous[1:] == (stat.st_size, stat.st_mtime):
+                continue
+            if stat.st_size > self.max_file_size:
+                if previous is not None:
+                    self._forget([previous])
+                continue
+            batch.append((entry.path, stat.st_size, stat.st_mtime, previous))
+            if len(batch) >= BATCH_FILES:
+                indexed += self._index_batch(batch)
+                batch = []
+        if batch:
+            indexed += self._index_batch(batch)
+
+        removed = [state for path, state in known.items() if path not in seen]
+        self._forget(removed)
+
+        with self.db:
+            self.db.execute("UPDATE roots SET built = ? WHERE path = ?", (time.time(), root))
+        if self._dead_ids() > self._live_ids():
+            self.compact()
+        return indexed, len(removed)
+
+    def _index_batch(self, batch):
+        """Read a batch of files and merge their postings in one transaction"""
+        postings = {}
+        indexed = 0
+        with self.db:
+            self._forget([previous for *_, previous in batch if previous is not None], commit=False)
+            for path, size, mtime, _ in batch:
+                try:
+                    with open(path, 'rb') as f:
+                        data = f.read(self.max_file_size + 1)
+                except OSError:
+                    continue
+                binary = b'\0' in data[:SAMPLE_SIZE]
+                cursor = self.db.execute(
+                    "INSERT OR REPLACE INTO files (path, size, mtime, binary) VALUES (?, ?, ?, ?)",
+                    (path, size, mtime, int(binary)))
+                indexed += 1
+                if binary:
+                    continue
+                file_id = cursor.lastrowid
+                for trigram in trigrams(data):
+                    postings.setdefault(trigram, []).append(file_id)
+
+            for trigram, ids in postings.items():
+                row = self.db.execute("SELECT last_id, data FROM postings WHERE trigram = ?",
+                                      (trigram,)).fetchone()
+                last_id, data = row if row else (0, b'')
+                self.db.execute("INSERT OR REPLACE INTO postings (trigram, last_id, data) VALUES (?, ?, ?)",
+                                (trigram, ids[-1], data + encode_deltas(ids, last_id)))
+        return indexed
+
+    def _files_under(self, root):
+        """Map path -> (id, size, mtime) for indexed files below `root`"""
+        low = root.rstrip(os.sep) + os.sep
+        high = root.rstrip(os.sep) + chr(ord(os.sep) + 1)
+        return {
+            path: (file_id, size, mtime)
+            for file_id, path, size, mtime in self.db.execute(
+                "SELECT id, path, size, mtime FROM files WHERE path >= ? AND path < ?", (low, high))
+        }
+
+    def _forget(self, states, commit=True):
+        """Drop file rows; their ids become dead entries in the posting lists"""
+        if not states:
+            return
+
+        def forget():
+            self.db.executemany("DELETE FROM files WHERE id = ?", [(state[0],) for state in states])
+            self.db.execute("INSERT INTO meta (key, value) VALUES ('dead', ?) "
+                            "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value", (len(states),))
+
+        if commit:
+            with self.db:
+                forget()
+        else:
+            forget()
+
+    def _dead_ids(self):
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'dead'").fetchone()
+        return row[0] if row else 0
+
+    def _live_ids(self):
+        return self.db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def compact(self):
+        """Rewrite posting lists without ids of deleted or changed files"""
+        live = {file_id for (file_id,) in self.db.execute("SELECT id FROM files")}
+        with self.db:
+            for trigram, data in self.db.execute("SELECT trigram, data FROM postings").fetchall():
+                ids = [file_id for file_id in decode_deltas(data) if file_id in live]
+                if ids:
+                    self.db.execute("UPDATE postings SET last_id = ?, data = ? WHERE trigram = ?",
+                                    (ids[-1], encode_deltas(ids), trigram))
+                else:
+                    self.db.execute("DELETE FROM postings WHERE trigram = ?", (trigram,))
+            self.db.execute("DELETE FROM meta WHERE key = 'dead'")
+        self.db.execute("VACUUM")
+
+    # Querying
+
+    def lookup(self, path, *needles):
+        """Return (indexed, hits) for a substring search under `path`, or None.
+
+        indexed maps the absolute path of every text file the index covers
+        to its (size, mtime) at indexing time; hits is the subset of those
+        paths whose contents contain every trigram of at least one needle.
+        Files missing from `indexed`, or whose size or mtime differ, must
+        be checked directly. Returns None when a needle is shorter than
+        three bytes or `path` is not indexed.
+        """
+        needles = [needle.encode('utf-8') if isinstance(needle, str) else bytes(needle) for needle in needles]
+        if not needles or min(map(len, needles)) < 3 or self.covering_root(path) is None:
+            return None
+
+        path = os.path.abspath(path)
+        low = path.rstrip(os.sep) + os.sep
+        high = path.rstrip(os.sep) + chr(ord(os.sep) + 1)
+        indexed = {}
+        by_id = {}
+        for file_id, file_path, size, mtime in self.db.execute(
+                "SELECT id, path, size, mtime FROM files "
+                "WHERE binary = 0 AND (path = ? OR (path >= ? AND path < ?))", (path, low, high)):
+            indexed[file_path] = (size, mtime)
+            by_id[file_id] = file_path
+
+        hits = set()
+        for needle in needles:
+            hits.update(by_id[file_id] for file_id in self._intersect(needle, by_id))
+        return indexed, hits
+
+    def _intersect(self, needle, candidates):
+        """Return the ids in `candidates` whose postings hold every trigram of needle"""
+        # Intersect the shortest lists first so the working set shrinks fast
+        lists = []
+        for trigram in trigrams(needle):
+            row = self.db.execute("SELECT data FROM postings WHERE trigram = ?", (trigram,)).fetchone()
+            if row is None:
+                return set()
+            lists.append(row[0])
+        lists.sort(key=len)
+
+        matching = set(candidates)
+        for data in lists:
+            matching.intersection_update(decode_deltas(data))
+            if not matching:
+                break
+        return matching
+
+    def stats(self):
+        """Return a dict describing the index"""
+        db = self.db
+        return {
+            'roots': db.execute("SELECT path, built FROM roots ORDER BY path").fetchall(),
+            'files': self._live_ids(),
+            'dead': self._dead_ids(),
+            'trigrams': db.execute("SELECT COUNT(*) FROM postings").fetchone()[0],
+            'postings_bytes': db.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM postings").fetchone()[0],
+            'bytes': os.path.getsize(self.db_path),
+        }
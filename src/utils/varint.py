@@ -0,0 +1,52 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def put_varint(out, value):
+    """Append a non-negative int to bytearray `out` as an LEB128 varint"""
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def get_varint(data, pos):
+    """Read the varint at `pos`; returns (value, position after it). IndexError if it runs off the end"""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode_deltas(ids, previous=0):
+    """Varint-encode ascending ids as gaps from `previous`"""
+    out = bytearray()
+    for file_id in ids:
+        put_varint(out, file_id - previous)
+        previous = file_id
+    return bytes(out)
+
+
+def decode_deltas(data):
+    """Inverse of encode_deltas; returns the list of ids.
+
+    Decodes inline rather than through get_varint: trigram posting lists
+    are read on every query, and a call per id makes this about three
+    times slower.
+    """
+    ids = []
+    current = shift = gap = 0
+    for byte in data:
+        gap |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        current += gap
+        ids.append(current)
+        gap = shift = 0
+    return ids
@@ -0,0 +1,34 @@
+import os
+import time
+from types import SimpleNamespace
+
+from src.commands.file_search import FileSearch
+
+
+def make_search(tmp_path):
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    return FileSearch(SimpleNamespace(config_dir=config_dir))
+
+
+def test_content_index_does_not_hide_a_file_edited_in_place(tmp_path, capsys):
+    root = tmp_path / "tree"
+    (root / "src").mkdir(parents=True)
+    source = root / "src" / "a.py"
+    source.write_text("print('hello')\n")
+    # Old enough that neither index treats the directories as still changing
+    past = time.time() - 3600
+    for path in (source, root / "src", root):
+        os.utime(path, (past, past))
+
+    search = make_search(tmp_path)
+    search.index.build(str(root))
+    search.content_index.build(str(root))
+
+    # Appending changes the file but not its directory's mtime
+    with open(source, 'a') as f:
+        f.write("NEWWORD = 1\n")
+    os.utime(root / "src", (past, past))
+
+    search.search_command(['-c', 'NEWWORD', '-p', str(root), '*.py'])
+    assert str(source) in capsys.readouterr().out
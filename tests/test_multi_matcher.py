@@ -0,0 +1,32 @@
+from src.utils.multi_matcher import MultiPatternMatcher
+
+
+def matches(tmp_path, patterns, text):
+    path = tmp_path / "data.txt"
+    path.write_text(text)
+    return MultiPatternMatcher(patterns).matches(str(path))
+
+
+def test_overlapping_regexes_are_all_reported(tmp_path):
+    patterns = [(True, 'foo'), (True, 'foobar'), (True, 'o+b')]
+    assert matches(tmp_path, patterns, "foobar\n") == [0, 1, 2]
+
+
+def test_regex_that_is_a_prefix_of_another(tmp_path):
+    patterns = [(True, 'ab'), (True, 'abc'), (True, 'abcd')]
+    assert matches(tmp_path, patterns, "xx abc yy\n") == [0, 1]
+
+
+def test_literal_that_is_a_prefix_of_another(tmp_path):
+    patterns = [(False, 'foo'), (False, 'foobar'), (False, 'bar')]
+    assert matches(tmp_path, patterns, "a foobar b\n") == [0, 1, 2]
+
+
+def test_regexes_that_cannot_be_combined(tmp_path):
+    patterns = [(True, r'(a)\1'), (True, r'(?i)XY'), (True, r'(b)\1')]
+    assert matches(tmp_path, patterns, "aa and xy\n") == [0, 1]
+
+
+def test_mixed_literals_and_regexes(tmp_path):
+    patterns = [(False, 'needle'), (True, r'\d{3}'), (True, 'absent')]
+    assert matches(tmp_path, patterns, "a needle and 123\n") == [0, 1]